@@ -0,0 +1,188 @@
+"""Замеры производительности свернутых произведений Мунермана
+
+Прогоняет все 5 методов умножения по типам размерностей (square, 4d, 3d_4d, 4d_3d)
+на сетке размеров и плотностей. Каждый случай сначала прогревается, затем
+повторяется несколько раз; в отчёт попадают время (лучшее и медиана), пропускная
+способность (перемноженных пар элементов в секунду) и пиковая память.
+Результаты сохраняются в JSON и могут сравниваться с прошлым прогоном; по ним же
+калибруется модель стоимости для режима auto (CostModel.from_benchmark).
+
+Примеры:
+    python benchmark.py --sizes 4 8 --densities 1 0.1 --output before.json
+    python benchmark.py --sizes 4 8 --densities 1 0.1 --output after.json --compare before.json
+    python benchmark.py --backends sparse dense blocked --storages dict coo --output calibration.json
+    python benchmark.py --sizes 12 --dimension-types 4d --dtypes float64 float32 int64 --backends dense
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from itertools import product
+
+from multiplication_matrix import CostModel, MunermanTensorMultiplier, Tensor, TensorOperations, np
+
+# Размерности A и B для каждого типа
+DIMENSION_TYPES = {
+    'square': (3, 3),
+    '4d': (4, 4),
+    '3d_4d': (3, 4),
+    '4d_3d': (4, 3),
+}
+FORMAT_VERSION = 1
+
+
+def case_key(case):
+    """Ключ случая для сопоставления прогонов (тип float64 в ключ не входит - как в прогонах до --dtypes)"""
+    key = (f"m{case['method']}:{case['dimension_type']}:n{case['size']}:d{case['density']}:"
+           f"{case['backend']}:{case['storage']}:w{case['workers']}")
+    dtype = case.get('dtype', 'float64')
+    return key if dtype == 'float64' else f"{key}:{dtype}"
+
+
+def run_case(method, dimension_type, size, density, backend, storage, workers, repeats, warmup, seed,
+             dtype='float64'):
+    """Замер одного случая: прогрев, repeats повторов и отдельный прогон для пиковой памяти"""
+    dim_a, dim_b = DIMENSION_TYPES[dimension_type]
+    tensor_a = Tensor.random((size,) * dim_a, density, seed, storage, dtype=dtype)
+    tensor_b = Tensor.random((size,) * dim_b, density, seed + 1, storage, dtype=dtype)
+    features = CostModel.estimate(tensor_a, tensor_b, method)
+    pairs = features['pairs']
+
+    def multiply():
+        return TensorOperations.multiply_tensors(tensor_a, tensor_b, method, dimension_type,
+                                                 backend=backend, workers=workers)
+
+    for _ in range(warmup):
+        multiply()
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = multiply()
+        times.append(time.perf_counter() - start)
+
+    # tracemalloc замедляет расчёт, поэтому память меряем отдельным прогоном
+    # (при workers > 1 учитывается только память основного процесса)
+    tracemalloc.start()
+    multiply()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    return {
+        'method': method,
+        'dimension_type': dimension_type,
+        'size': size,
+        'density': density,
+        'backend': backend,
+        'storage': storage,
+        'workers': workers,
+        'dtype': dtype,
+        'accumulation_dtype': result.accumulation_dtype,
+        'nnz_a': tensor_a.nnz(),
+        'nnz_b': tensor_b.nnz(),
+        'pairs': pairs,
+        'result_nnz': result.nnz(),
+        'times': times,
+        'best': best,
+        'median': statistics.median(times),
+        'pairs_per_second': pairs / best if best > 0 else None,
+        'peak_memory': peak_memory,
+        'features': features,
+    }
+
+
+def run_suite(args):
+    """Прогон всей сетки случаев с выводом строки отчёта по каждому"""
+    cases = []
+    grid = product(args.methods, args.dimension_types, args.sizes, args.densities,
+                   args.backends, args.storages, args.dtypes)
+    for method, dimension_type, size, density, backend, storage, dtype in grid:
+        case = run_case(method, dimension_type, size, density, backend, storage, args.workers,
+                        args.repeats, args.warmup, args.seed, dtype)
+        cases.append(case)
+        throughput = case['pairs_per_second'] or 0.0
+        print(f"{case_key(case):45} {case['best'] * 1000:10.2f} мс {throughput:14.0f} пар/с "
+              f"{case['peak_memory'] / 2 ** 20:9.1f} МБ", flush=True)
+
+    return {
+        'format': FORMAT_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__ if np is not None else None,
+        'settings': {'repeats': args.repeats, 'warmup': args.warmup, 'seed': args.seed},
+        'cases': cases,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Сравнение медианного времени с прошлым прогоном; возвращает число регрессий"""
+    previous = {case_key(case): case for case in baseline['cases']}
+    regressions = 0
+    print(f"\nСравнение с прошлым прогоном ({baseline.get('created', '?')}), порог {threshold:.0%}:")
+    for case in report['cases']:
+        key = case_key(case)
+        if key not in previous:
+            print(f"{key:45} нет в прошлом прогоне")
+            continue
+        old_time = previous[key]['median']
+        ratio = case['median'] / old_time if old_time > 0 else float('inf')
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  РЕГРЕССИЯ"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            mark = "  ускорение"
+        print(f"{key:45} {old_time * 1000:10.2f} -> {case['median'] * 1000:10.2f} мс  x{ratio:.2f}{mark}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры свернутых произведений Мунермана")
+    parser.add_argument('--methods', type=int, nargs='+', default=[1, 2, 3, 4, 5],
+                        choices=sorted(MunermanTensorMultiplier.METHOD_SIGNATURES))
+    parser.add_argument('--dimension-types', nargs='+', default=list(DIMENSION_TYPES),
+                        choices=list(DIMENSION_TYPES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 8],
+                        help="длина каждой оси тензоров")
+    parser.add_argument('--densities', type=float, nargs='+', default=[1.0, 0.1],
+                        help="доля хранимых элементов")
+    parser.add_argument('--backends', nargs='+', default=['sparse'], choices=['sparse', 'dense', 'blocked', 'auto'])
+    parser.add_argument('--storages', nargs='+', default=['dict'], choices=['dict', 'coo', 'dense'])
+    parser.add_argument('--dtypes', nargs='+', default=['float64'], choices=list(Tensor.DTYPES),
+                        help="типы значений тензоров")
+    parser.add_argument('--workers', type=int, default=1, help="число процессов для режима sparse")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json', help="файл для результатов (JSON)")
+    parser.add_argument('--compare', help="JSON прошлого прогона для сравнения")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="допустимое замедление при сравнении (0.1 = 10%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.repeats < 1:
+        raise SystemExit("Число повторов должно быть не меньше 1")
+
+    report = run_suite(args)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
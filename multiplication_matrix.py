@@ -1,19 +1,817 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, scrolledtext
+import argparse
+import asyncio
+import cProfile
+import hashlib
+import json
+import math
+import mmap
+import os
+import queue
 import random
+import threading
 import time
+import tracemalloc
+import multiprocessing
 import re
+import bisect
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from itertools import chain, islice, product, repeat
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import tkinter as tk
+    from tkinter import ttk, messagebox, scrolledtext, filedialog
+except ImportError:
+    # Без Tk (например, на сервере без дисплея) работает только режим командной строки
+    tk = ttk = messagebox = scrolledtext = filedialog = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def _to_array(buffer, typecode):
+    """Изменяемая копия буфера (например, memoryview поверх файла) в виде array; array - как есть"""
+    if isinstance(buffer, array):
+        return buffer
+    result = array(typecode)
+    result.frombytes(memoryview(buffer).cast('B'))
+    return result
+
+class CooStorage:
+    """Компактное COO-хранилище тензора: массив координат на каждую ось и массив значений
+
+    Поддерживает операции словаря, которые используются для Tensor.data
+    (items, keys, values, get, [], in, len). Элементы хранятся отсортированными
+    лексикографически по индексам; если добавлять их не по порядку, сортировка
+    (с удалением повторов - остаётся последнее значение) откладывается до первого чтения.
+
+    Вместо array можно передать memoryview (например, поверх отображённого в память
+    файла, см. TensorFile) - тогда массивы копируются только при первой записи.
+    """
+    __slots__ = ('coords', 'value_array', '_sorted')
+
+    def __init__(self, dimension, coords=None, value_array=None, typecode='d'):
+        self.coords = coords if coords is not None else [array('q') for _ in range(dimension)]
+        self.value_array = value_array if value_array is not None else array(typecode)
+        self._sorted = True
+
+    def __reduce__(self):
+        # memoryview нельзя передать в другой процесс - отдаём копии массивов
+        coords, values = self.columns()
+        return CooStorage, (len(coords), [_to_array(column, 'q') for column in coords],
+                            _to_array(values, self.typecode))
+
+    @property
+    def typecode(self):
+        """Код типа значений в обозначениях модуля array ('d' - float64, 'f' - float32, 'q' - int64)"""
+        values = self.value_array
+        return values.typecode if isinstance(values, array) else values.format
+
+    def _ensure_writable(self):
+        """Перед записью заменяем буферы только для чтения на изменяемые копии"""
+        if not isinstance(self.value_array, array):
+            self.coords = [_to_array(column, 'q') for column in self.coords]
+            self.value_array = _to_array(self.value_array, self.typecode)
+
+    @classmethod
+    def from_items(cls, dimension, items, typecode='d'):
+        """Создаём хранилище из пар (индексы, значение) в любом порядке (повторы - последнее значение)"""
+        storage = cls(dimension, typecode=typecode)
+        for key, value in items:
+            storage.append(key, value)
+        return storage
+
+    def _row_key(self, row):
+        return tuple(column[row] for column in self.coords)
+
+    def _lower_bound(self, key):
+        """Двоичный поиск первой строки с индексами не меньше key"""
+        low, high = 0, len(self.value_array)
+        while low < high:
+            middle = (low + high) // 2
+            if self._row_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _find(self, key):
+        """Двоичный поиск строки с заданными индексами; -1, если её нет"""
+        row = self._lower_bound(key)
+        if row < len(self.value_array) and self._row_key(row) == key:
+            return row
+        return -1
+
+    def _normalize(self):
+        """Сортируем строки по индексам, из повторов оставляем последнее значение"""
+        if self._sorted:
+            return
+        order = sorted(range(len(self.value_array)), key=self._row_key)
+        kept = []
+        previous = None
+        for row in order:
+            key = self._row_key(row)
+            if key == previous:
+                kept[-1] = row
+            else:
+                kept.append(row)
+                previous = key
+        self.coords = [array('q', (column[row] for row in kept)) for column in self.coords]
+        self.value_array = array(self.value_array.typecode, (self.value_array[row] for row in kept))
+        self._sorted = True
+
+    def columns(self):
+        """Отсортированные массивы координат (по одному на ось) и массив значений"""
+        self._normalize()
+        return self.coords, self.value_array
+
+    def append(self, key, value):
+        """Добавление нового элемента в конец без проверки на повтор"""
+        self._ensure_writable()
+        if self._sorted and self.value_array and key <= self._row_key(len(self.value_array) - 1):
+            self._sorted = False
+        for column, index in zip(self.coords, key):
+            column.append(index)
+        self.value_array.append(value)
+
+    def extend(self, other):
+        """Дописываем в конец все строки другого хранилища той же размерности"""
+        other._normalize()
+        self._ensure_writable()
+        if self._sorted and self.value_array and other.value_array:
+            if other._row_key(0) <= self._row_key(len(self.value_array) - 1):
+                self._sorted = False
+        for column, other_column in zip(self.coords, other.coords):
+            column.extend(other_column)
+        self.value_array.extend(other.value_array)
+
+    def extend_row(self, prefix, values):
+        """Добавление строки values с индексами prefix + (0,), prefix + (1,), ..."""
+        if not values:
+            return
+        self._ensure_writable()
+        if self._sorted and self.value_array and prefix + (0,) <= self._row_key(len(self.value_array) - 1):
+            self._sorted = False
+        count = len(values)
+        for column, index in zip(self.coords, prefix):
+            column.extend(repeat(index, count))
+        self.coords[len(prefix)].extend(range(count))
+        self.value_array.extend(values)
+
+    def items_between(self, low, high):
+        """Элементы с индексами в [low, high) (лексикографически) - границы ищутся двоичным поиском
+
+        Например, low = (i, j), high = (i, j + 1) дают все элементы с первыми индексами i, j.
+        """
+        self._normalize()
+        return self.slice_rows(self._lower_bound(low), self._lower_bound(high)).items()
+
+    def slice_rows(self, start, stop):
+        """Новое хранилище из строк [start, stop) в отсортированном порядке"""
+        self._normalize()
+        return CooStorage(len(self.coords), [column[start:stop] for column in self.coords],
+                          self.value_array[start:stop])
+
+    def __setitem__(self, key, value):
+        """Запись элемента; новый элемент не в конце вставляется на своё место
+
+        Вставка сдвигает массивы (как list.insert), но не ломает порядок строк - для
+        точечной правки это дешевле отложенной сортировки всего хранилища. Много
+        элементов в произвольном порядке быстрее добавлять через append.
+        """
+        self._ensure_writable()
+        if self._sorted and self.value_array:
+            last_key = self._row_key(len(self.value_array) - 1)
+            if key == last_key:
+                self.value_array[-1] = value
+                return
+            if key < last_key:
+                row = self._lower_bound(key)
+                if self._row_key(row) == key:
+                    self.value_array[row] = value
+                    return
+                self.value_array.insert(row, value)
+                for column, index in zip(self.coords, key):
+                    column.insert(row, index)
+                return
+        self.append(key, value)
+
+    def __delitem__(self, key):
+        self._normalize()
+        row = self._find(tuple(key))
+        if row < 0:
+            raise KeyError(key)
+        self._ensure_writable()
+        for column in self.coords:
+            del column[row]
+        del self.value_array[row]
+
+    def get(self, key, default=None):
+        self._normalize()
+        row = self._find(tuple(key))
+        return self.value_array[row] if row >= 0 else default
+
+    def __getitem__(self, key):
+        self._normalize()
+        row = self._find(tuple(key))
+        if row < 0:
+            raise KeyError(key)
+        return self.value_array[row]
+
+    def __contains__(self, key):
+        self._normalize()
+        return self._find(tuple(key)) >= 0
+
+    def __len__(self):
+        self._normalize()
+        return len(self.value_array)
+
+    def __iter__(self):
+        return self.keys()
+
+    def iter_keys(self, axes):
+        """Кортежи индексов по выбранным осям (в заданном порядке) для всех строк"""
+        self._normalize()
+        columns = [self.coords[axis] for axis in axes]
+        return zip(*columns) if columns else repeat((), len(self.value_array))
+
+    def keys(self):
+        return self.iter_keys(range(len(self.coords)))
+
+    def values(self):
+        self._normalize()
+        return iter(self.value_array)
+
+    def items(self):
+        return zip(self.keys(), self.values())
+
+class DenseStorage:
+    """Плотное хранилище тензора: все элементы формы shape подряд в порядке строк
+
+    Последний индекс меняется быстрее всего, как в numpy. Поддерживает те же операции
+    словаря, что и CooStorage; хранимыми считаются все позиции формы (отсутствующие
+    элементы равны 0), записывать можно только внутри формы. Вместо array можно
+    передать memoryview (например, поверх отображённого в память файла) - он
+    копируется только при первой записи.
+    """
+    __slots__ = ('shape', 'value_array', '_strides')
+
+    def __init__(self, shape, value_array=None, typecode='d'):
+        self.shape = tuple(shape)
+        size = math.prod(self.shape)
+        if value_array is None:
+            value_array = array(typecode, bytes(size * array(typecode).itemsize))
+        elif len(value_array) != size:
+            raise ValueError(f"Число значений ({len(value_array)}) не совпадает с формой {self.shape}")
+        self.value_array = value_array
+
+        strides = []
+        stride = 1
+        for axis_size in reversed(self.shape):
+            strides.append(stride)
+            stride *= axis_size
+        self._strides = tuple(reversed(strides))
+
+    def __reduce__(self):
+        # memoryview нельзя передать в другой процесс - отдаём копию массива
+        return DenseStorage, (self.shape, _to_array(self.value_array, self.typecode))
+
+    @classmethod
+    def from_items(cls, dimension, items, shape=None, typecode='d'):
+        """Создаём хранилище из пар (индексы, значение); форма по умолчанию - по индексам"""
+        if shape is None:
+            items = list(items)
+            shape = [0] * dimension
+            for key, _ in items:
+                for axis, index in enumerate(key):
+                    if index >= shape[axis]:
+                        shape[axis] = index + 1
+        storage = cls(shape, typecode=typecode)
+        for key, value in items:
+            storage[key] = value
+        return storage
+
+    @property
+    def typecode(self):
+        """Код типа значений в обозначениях модуля array ('d' - float64, 'f' - float32, 'q' - int64)"""
+        values = self.value_array
+        return values.typecode if isinstance(values, array) else values.format
+
+    def _offset(self, key):
+        """Позиция элемента в value_array; -1, если индексы вне формы"""
+        if len(key) != len(self.shape):
+            return -1
+        offset = 0
+        for index, size, stride in zip(key, self.shape, self._strides):
+            if not 0 <= index < size:
+                return -1
+            offset += index * stride
+        return offset
+
+    def __setitem__(self, key, value):
+        offset = self._offset(key)
+        if offset < 0:
+            raise IndexError(f"Индексы {tuple(key)} вне формы {self.shape}")
+        if not isinstance(self.value_array, array):
+            self.value_array = _to_array(self.value_array, self.typecode)
+        self.value_array[offset] = value
+
+    def get(self, key, default=None):
+        offset = self._offset(key)
+        return self.value_array[offset] if offset >= 0 else default
+
+    def __getitem__(self, key):
+        offset = self._offset(key)
+        if offset < 0:
+            raise KeyError(key)
+        return self.value_array[offset]
+
+    def __contains__(self, key):
+        return self._offset(key) >= 0
+
+    def __len__(self):
+        return len(self.value_array)
+
+    def __iter__(self):
+        return self.keys()
+
+    def keys(self):
+        return product(*[range(size) for size in self.shape])
+
+    def values(self):
+        return iter(self.value_array)
+
+    def items(self):
+        return zip(self.keys(), self.values())
+
+class LazyScottStorage:
+    """Отложенный результат произведения без кэлиевых индексов (методы 3 и 4)
+
+    Каждый элемент такого произведения - одно произведение A[l, s] * B[s, m], поэтому
+    вместо всех пар хранятся только ссылки на A и B: значения, срезы и обход
+    считаются при обращении. A и B нельзя менять, пока результат используется.
+    Поддерживает тот же интерфейс чтения, что словарь; изменять его нельзя -
+    для этого его переводят в обычное хранилище (Tensor.convert_storage).
+    """
+
+    def __init__(self, tensor_a, tensor_b, scott):
+        self.tensor_a = tensor_a
+        self.tensor_b = tensor_b
+        self.scott = scott
+        self.dimension_a = tensor_a.dimension
+        self.scott_start = tensor_a.dimension - scott
+        self._length = None
+
+    def _rest_b(self, key):
+        """Индексы B для элемента результата: скоттовы (общие с A) и свободные B"""
+        return key[self.scott_start:self.dimension_a] + key[self.dimension_a:]
+
+    def get(self, key, default=None):
+        value_a = self.tensor_a.data.get(key[:self.dimension_a])
+        if value_a is None:
+            return default
+        value_b = self.tensor_b.data.get(self._rest_b(key))
+        if value_b is None:
+            return default
+        return value_a * value_b
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        raise TypeError("Отложенный результат нельзя изменять: переведите его в обычное хранилище "
+                        "(convert_storage)")
+
+    def __contains__(self, key):
+        return key[:self.dimension_a] in self.tensor_a.data and self._rest_b(key) in self.tensor_b.data
+
+    def __len__(self):
+        # Число элементов - число пар A и B с общими скоттовыми индексами
+        if self._length is None:
+            self._length = MunermanTensorMultiplier.count_pairs(self.tensor_a, self.tensor_b, self.scott, 0)
+        return self._length
+
+    def __bool__(self):
+        # Проверка пустоты (if not data) ищет первую пару, а не считает все через __len__
+        if self._length is not None:
+            return self._length > 0
+        return next(self.items(), None) is not None
+
+    @property
+    def counted(self):
+        """Посчитано ли уже число элементов (len дальше ничего не стоит)"""
+        return self._length is not None
+
+    def __iter__(self):
+        return self.keys()
+
+    def items(self):
+        """Все элементы по порядку обхода A (как в contracted_product)"""
+        index_b = self.tensor_b.get_leading_index(self.scott)
+        scott_start = self.scott_start
+        for key_a, value_a in self.tensor_a.data.items():
+            for rest_b, value_b in index_b.get(key_a[scott_start:], ()):
+                yield key_a + rest_b, value_a * value_b
+
+    def keys(self):
+        return (key for key, _ in self.items())
+
+    def values(self):
+        return (value for _, value in self.items())
+
+    def get_slice(self, fixed):
+        """Элементы с заданными индексами: перебираются только подходящие элементы A"""
+        fixed_a = {axis: value for axis, value in fixed.items() if axis < self.dimension_a}
+        fixed_b = [(axis - self.dimension_a, value) for axis, value in fixed.items() if axis >= self.dimension_a]
+        index_b = self.tensor_b.get_leading_index(self.scott)
+        if len(fixed_a) == self.dimension_a:
+            # Все индексы A заданы - элемент A ищем напрямую, без индекса осей
+            key_a = tuple(fixed_a[axis] for axis in range(self.dimension_a))
+            value_a = self.tensor_a.data.get(key_a)
+            rows_a = [(key_a, value_a)] if value_a is not None else []
+        else:
+            rows_a = self.tensor_a.get_slice(fixed_a)
+        rows = []
+        for key_a, value_a in rows_a:
+            for rest_b, value_b in index_b.get(key_a[self.scott_start:], ()):
+                if all(rest_b[axis] == value for axis, value in fixed_b):
+                    rows.append((key_a + rest_b, value_a * value_b))
+        return rows
+
+class PatchedStorage:
+    """Правка поверх другого хранилища (копия при записи)
+
+    Хранилище base не меняется: новые значения и удаления его элементов лежат в changes
+    (None - элемент удалён), новые элементы - в added. Так результат, обновлённый по
+    нескольким изменённым элементам (TensorOperations.update_product), не копирует
+    остальные, а base могут в это время читать другие потоки. Поддерживает те же
+    операции словаря, что и CooStorage; для остального кода это словарь
+    (Tensor.storage == 'dict'). У DenseStorage нет пропусков, поэтому удалённый
+    элемент плотного base остаётся нулём.
+    """
+    __slots__ = ('base', 'changes', 'added', '_length')
+
+    def __init__(self, base, changes=None, added=None, length=None):
+        self.base = base
+        self.changes = changes if changes is not None else {}
+        self.added = added if added is not None else {}
+        self._length = len(base) if length is None else length
+
+    @classmethod
+    def over(cls, storage):
+        """Новая правка поверх storage; у правки поверх правки копируются только её словари"""
+        if isinstance(storage, PatchedStorage):
+            return cls(storage.base, dict(storage.changes), dict(storage.added), storage._length)
+        return cls(storage)
+
+    @property
+    def patch_size(self):
+        """Число изменённых, удалённых и добавленных элементов"""
+        return len(self.changes) + len(self.added)
+
+    def __setitem__(self, key, value):
+        key = tuple(key)
+        if key in self.added:
+            self.added[key] = value
+        elif key in self.changes:
+            if self.changes[key] is None:
+                self._length += 1
+            self.changes[key] = value
+        elif key in self.base:
+            self.changes[key] = value
+        else:
+            self.added[key] = value
+            self._length += 1
+
+    def __delitem__(self, key):
+        key = tuple(key)
+        if key in self.added:
+            del self.added[key]
+        elif key not in self:
+            raise KeyError(key)
+        elif isinstance(self.base, DenseStorage):
+            self.changes[key] = 0
+            return
+        else:
+            self.changes[key] = None
+        self._length -= 1
+
+    def get(self, key, default=None):
+        key = tuple(key)
+        if key in self.added:
+            return self.added[key]
+        if key in self.changes:
+            value = self.changes[key]
+            return default if value is None else value
+        return self.base.get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        return self.keys()
+
+    def items(self):
+        changes = self.changes
+        if not changes:
+            yield from self.base.items()
+        else:
+            for key, value in self.base.items():
+                if key in changes:
+                    value = changes[key]
+                    if value is None:
+                        continue
+                yield key, value
+        yield from self.added.items()
+
+    def keys(self):
+        return (key for key, _ in self.items())
+
+    def values(self):
+        return (value for _, value in self.items())
 
 class Tensor:
-    def __init__(self, dimension, data=None):
+    # Тип значений -> код типа модуля array
+    DTYPES = {
+        'float64': 'd',
+        'float32': 'f',
+        'int64': 'q',
+    }
+
+    def __init__(self, dimension, data=None, storage="dict", shape=None, dtype=None):
+        """
+        Args:
+            dimension: число индексов тензора
+            data: словарь {индексы: значение}, CooStorage, DenseStorage, LazyScottStorage
+                или PatchedStorage
+            storage: 'dict' - словарь, 'coo' - компактные массивы CooStorage,
+                'dense' - все элементы формы подряд (DenseStorage)
+            shape: уже известная форма data (тогда она не вычисляется заново)
+            dtype: тип значений ('float64', 'float32' или 'int64'); у CooStorage и DenseStorage
+                он задан кодом типа массива, у словаря хранится отдельно (по умолчанию 'float64')
+
+        Форма и индексы поддерживаются в add_value и remove_value, поэтому после создания
+        тензора элементы нужно менять через них, а не напрямую в data.
+        """
+        if storage not in ("dict", "coo", "dense"):
+            raise ValueError(f"Неизвестный способ хранения: {storage}")
+        if dtype is not None and dtype not in Tensor.DTYPES:
+            raise ValueError(f"Неизвестный тип значений: {dtype}")
         self.dimension = dimension
-        if data is None:
-            self.data = {}
+        typecode = Tensor.DTYPES[dtype or 'float64']
+        if storage == "dense" and not isinstance(data, DenseStorage):
+            # Плотному хранилищу нужна форма: заданная или по индексам элементов
+            data = DenseStorage.from_items(dimension, data.items() if data is not None else (), shape, typecode)
+        elif data is None:
+            data = {} if storage == "dict" else CooStorage(dimension, typecode=typecode)
+        elif storage == "coo" and not isinstance(data, CooStorage):
+            data = CooStorage.from_items(dimension, data.items(), typecode)
+        if isinstance(data, dict) and dtype not in (None, 'float64'):
+            Tensor.fit_values(data, dtype)
+        self.data = data
+        self._dtype = dtype or 'float64'
+        # Тип, в котором ядро умножения накапливало суммы (задаётся у результатов произведений)
+        self.accumulation_dtype = None
+        # Число пар элементов A и B, перемноженных поэлементным ядром (задаётся у его результатов)
+        self.pairs = None
+
+        # Метаданные: форма, индексы по осям (строятся при первом запросе)
+        # и сгруппированные по ведущим индексам элементы для ядер умножения
+        self._shape = list(shape) if shape is not None else self._compute_shape()
+        self._axis_indexes = {}
+        self._leading_indexes = {}
+        self._join_indexes = {}
+        self._content_hash = None
+
+    def __getstate__(self):
+        # Кэши индексов не передаём между процессами: их дешевле построить заново
+        state = self.__dict__.copy()
+        state['_axis_indexes'] = {}
+        state['_leading_indexes'] = {}
+        state['_join_indexes'] = {}
+        return state
+
+    @property
+    def storage(self):
+        if isinstance(self.data, CooStorage):
+            return "coo"
+        if isinstance(self.data, LazyScottStorage):
+            return "lazy"
+        return "dense" if isinstance(self.data, DenseStorage) else "dict"
+
+    @property
+    def dtype(self):
+        """Тип значений: 'float64', 'float32' или 'int64'"""
+        if isinstance(self.data, (CooStorage, DenseStorage)):
+            return Tensor.dtype_of(self.data.typecode)
+        if isinstance(self.data, LazyScottStorage):
+            return Tensor.promote(self.data.tensor_a.dtype, self.data.tensor_b.dtype)
+        return self._dtype
+
+    @staticmethod
+    def dtype_of(typecode):
+        """Тип значений по коду типа модуля array (или формату memoryview)"""
+        for dtype, code in Tensor.DTYPES.items():
+            if code == typecode:
+                return dtype
+        raise ValueError(f"Неподдерживаемый тип значений: {typecode}")
+
+    @staticmethod
+    def typed_array(dtype, values):
+        """Массив значений типа dtype: float32 округляется, целые проверяются на диапазон int64
+
+        Raises:
+            ValueError: значение не помещается в int64 (см. range_error)
+        """
+        try:
+            return array(Tensor.DTYPES[dtype], values)
+        except OverflowError:
+            raise Tensor.range_error(dtype) from None
+
+    @staticmethod
+    def fit_values(data, dtype):
+        """Приведение значений словаря к типу dtype на месте - так же, как при записи в массив этого типа
+
+        Ядра копят суммы в числах Python: без этого словарь float32 хранил бы неокруглённые
+        значения, а словарь int64 - целые за пределами диапазона.
+        """
+        keys = list(data)
+        data.update(zip(keys, Tensor.typed_array(dtype, (data[key] for key in keys))))
+
+    @staticmethod
+    def range_error(dtype):
+        """Ошибка для значения, которое не помещается в тип dtype"""
+        return ValueError(f"Значения не помещаются в тип {dtype}: переведите множители в float64 (astype)")
+
+    @staticmethod
+    def promote(dtype_a, dtype_b):
+        """Тип результата произведения: общий тип множителей, при разных типах - float64 (как в numpy)"""
+        return dtype_a if dtype_a == dtype_b else 'float64'
+
+    def convert_storage(self, storage):
+        """Копия тензора с другим способом хранения ('dict', 'coo' или 'dense')
+
+        Тип значений и форма сохраняются: форма может быть больше, чем по хранимым элементам
+        (например, у Tensor.random с пустыми последними срезами), и не пересчитывается.
+        """
+        dtype = self.dtype
+        typecode = Tensor.DTYPES[dtype]
+        shape = self.get_shape()
+        if storage == "dict":
+            return Tensor(self.dimension, dict(self.data.items()), shape=shape, dtype=dtype)
+        if storage == "dense":
+            return Tensor(self.dimension, DenseStorage.from_items(self.dimension, self.data.items(),
+                                                                  shape or (0,) * self.dimension, typecode))
+        return Tensor(self.dimension, CooStorage.from_items(self.dimension, self.data.items(), typecode), shape=shape)
+
+    def astype(self, dtype):
+        """Копия тензора с другим типом значений в том же хранилище
+
+        Raises:
+            ValueError: неизвестный тип, дробные значения или выход за диапазон при переводе в 'int64'
+        """
+        if dtype not in Tensor.DTYPES:
+            raise ValueError(f"Неизвестный тип значений: {dtype}")
+        if dtype == 'int64':
+            def convert(value):
+                if value != int(value):
+                    raise ValueError(f"Значение {value} нельзя без потерь записать в тип int64")
+                return int(value)
         else:
-            self.data = data
+            convert = float
+
+        if isinstance(self.data, DenseStorage):
+            values = Tensor.typed_array(dtype, map(convert, self.data.value_array))
+            return Tensor(self.dimension, DenseStorage(self.data.shape, values))
+        if isinstance(self.data, CooStorage):
+            coords, values = self.data.columns()
+            return Tensor(self.dimension, CooStorage(self.dimension, [_to_array(column, 'q') for column in coords],
+                                                     Tensor.typed_array(dtype, map(convert, values))),
+                          shape=self.get_shape())
+        if isinstance(self.data, LazyScottStorage):
+            return self.convert_storage("dict").astype(dtype)
+        return Tensor(self.dimension, {key: convert(value) for key, value in self.data.items()},
+                      shape=self.get_shape(), dtype=dtype)
+
+    def copy(self):
+        """Копия тензора в том же хранилище, которую можно менять независимо от исходного
+
+        Массивы копируются целиком, без разбора на элементы; буферы только для чтения
+        (memoryview поверх файла) общие - хранилище заменит их копией при первой записи.
+        """
+        def duplicate(buffer):
+            return buffer[:] if isinstance(buffer, array) else buffer
+
+        if isinstance(self.data, CooStorage):
+            coords, values = self.data.columns()
+            data = CooStorage(self.dimension, [duplicate(column) for column in coords], duplicate(values))
+        elif isinstance(self.data, DenseStorage):
+            data = DenseStorage(self.data.shape, duplicate(self.data.value_array))
+        elif isinstance(self.data, LazyScottStorage):
+            data = self.data   # отложенный результат изменить нельзя
+        elif isinstance(self.data, PatchedStorage):
+            data = PatchedStorage.over(self.data)   # base правки не меняется - он общий
+        else:
+            data = dict(self.data)
+        result = Tensor(self.dimension, data, shape=self.get_shape(), dtype=self.dtype)
+        result.accumulation_dtype = self.accumulation_dtype
+        return result
 
     def add_value(self, indices, value):
-        self.data[tuple(indices)] = value
+        """Запись элемента; форма и построенные индексы обновляются на месте, без перестроения"""
+        key = tuple(indices)
+        is_new = key not in self.data
+        dtype = self.dtype
+        if dtype != 'float64':
+            # Значение в том виде, в каком его хранит массив этого типа (оно же попадёт в индексы)
+            value = Tensor.typed_array(dtype, (value,))[0]
+        try:
+            self.data[key] = value
+        except OverflowError:
+            raise Tensor.range_error(dtype) from None
+        self._content_hash = None
+        self._update_shape(key)
+        if is_new:
+            for axis, (coordinates, keys_by_coordinate) in self._axis_indexes.items():
+                if key[axis] not in keys_by_coordinate:
+                    bisect.insort(coordinates, key[axis])
+                keys_by_coordinate.setdefault(key[axis], []).append(key)
+        self._reindex(key, value, is_new)
+
+    def remove_value(self, indices):
+        """Удаление элемента (в плотном хранилище - запись нуля); форма при этом не уменьшается"""
+        key = tuple(indices)
+        if key not in self.data:
+            return
+        if isinstance(self.data, DenseStorage):
+            self.add_value(key, 0)
+            return
+        del self.data[key]
+        self._content_hash = None
+        for axis, (coordinates, keys_by_coordinate) in self._axis_indexes.items():
+            keys = keys_by_coordinate[key[axis]]
+            keys.remove(key)
+            if not keys:
+                del keys_by_coordinate[key[axis]]
+                del coordinates[bisect.bisect_left(coordinates, key[axis])]
+        self._reindex(key)
+
+    def _reindex(self, key, value=None, is_new=False):
+        """Правка элемента в группировках get_leading_index и get_join_index (value None - удаление)"""
+        ordered = isinstance(self.data, CooStorage)
+        for count, index in self._leading_indexes.items():
+            Tensor._regroup(index, key[:count], key[count:], value, is_new, ordered)
+        for (scott, cayley), index in self._join_indexes.items():
+            kept = self.dimension - cayley
+            Tensor._regroup(index, key[kept:] + key[kept - scott:kept], key[:kept], value, is_new, ordered)
+
+    @staticmethod
+    def _regroup(index, group_key, entry_key, value, is_new, ordered):
+        """Замена, удаление или вставка строки (entry_key, value) в группе group_key
+
+        Новая строка встаёт туда же, где элемент окажется при обходе data: в CooStorage -
+        по порядку индексов, в словаре - в конец.
+        """
+        rows = index.setdefault(group_key, [])
+        if not is_new:
+            for position, (other_key, _) in enumerate(rows):
+                if other_key == entry_key:
+                    if value is not None:
+                        rows[position] = (entry_key, value)
+                    else:
+                        del rows[position]
+                    break
+            if not rows:
+                del index[group_key]
+            return
+        position = bisect.bisect_left([other_key for other_key, _ in rows], entry_key) if ordered else len(rows)
+        rows.insert(position, (entry_key, value))
 
     def get_value(self, indices):
         return self.data.get(tuple(indices), 0)
@@ -21,22 +819,148 @@ class Tensor:
     def get_all_indices(self):
         return list(self.data.keys())
 
+    def nnz(self):
+        """Количество хранимых элементов"""
+        return len(self.data)
+
+    def memory_size(self):
+        """Оценка занимаемой памяти в байтах
+
+        Данные поверх отображённого файла тоже учитываются: прочитанные страницы файла
+        занимают память так же, как обычные массивы.
+        """
+        return Tensor._storage_size(self.data, self.dimension)
+
+    @staticmethod
+    def _storage_size(data, dimension):
+        if isinstance(data, LazyScottStorage):
+            return 0   # только ссылки на множители
+        if isinstance(data, (CooStorage, DenseStorage)):
+            # array, memoryview поверх файла и массивы numpy одинаково дают itemsize и длину
+            values = data.value_array
+            columns = len(data.coords) if isinstance(data, CooStorage) else 0
+            return len(values) * (values.itemsize + 8 * columns)
+        if isinstance(data, PatchedStorage):
+            return Tensor._storage_size(data.base, dimension) + data.patch_size * (100 + 8 * dimension)
+        # Элемент словаря: запись в таблице, кортеж индексов и число
+        return len(data) * (100 + 8 * dimension)
+
+    def content_hash(self):
+        """Хэш содержимого (blake2b): способ хранения, размерность, индексы и значения
+
+        Считается по массивам хранилища без построения копий и запоминается до следующего
+        add_value или remove_value. Одинаковые элементы в разном порядке или в разных хранилищах дают
+        разные хэши - для кэша это лишь лишний промах.
+        """
+        if self._content_hash is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(f"{self.storage}:{self.dimension}:{self.dtype}:".encode('ascii'))
+            if isinstance(self.data, LazyScottStorage):
+                digest.update(f"{self.data.tensor_a.content_hash()}:{self.data.tensor_b.content_hash()}:"
+                              f"{self.data.scott}".encode('ascii'))
+            elif isinstance(self.data, CooStorage):
+                coords, values = self.data.columns()
+                digest.update(self.data.typecode.encode('ascii'))
+                for column in coords:
+                    digest.update(column)
+                digest.update(values)
+            elif isinstance(self.data, DenseStorage):
+                digest.update(self.data.typecode.encode('ascii'))
+                digest.update(struct.pack(f'<{self.dimension}q', *self.data.shape))
+                digest.update(self.data.value_array)
+            else:
+                # Словарь хэшируем порциями, чтобы не копировать все элементы сразу
+                items = iter(self.data.items())
+                while True:
+                    chunk = list(islice(items, 1 << 16))
+                    if not chunk:
+                        break
+                    digest.update(array('q', chain.from_iterable(key for key, _ in chunk)))
+                    digest.update(array(Tensor.DTYPES[self._dtype], [value for _, value in chunk]))
+            self._content_hash = digest.hexdigest()
+        return self._content_hash
+
+    def get_axis_index(self, axis):
+        """Индекс оси: (отсортированный список координат, словарь координата -> индексы элементов)"""
+        if axis not in self._axis_indexes:
+            keys_by_coordinate = {}
+            for key in self.data.keys():
+                keys_by_coordinate.setdefault(key[axis], []).append(key)
+            self._axis_indexes[axis] = (sorted(keys_by_coordinate), keys_by_coordinate)
+        return self._axis_indexes[axis]
+
+    def get_axis_values(self, axis):
+        """Отсортированный список координат, которые встречаются на оси"""
+        return self.get_axis_index(axis)[0]
+
+    def get_slice(self, fixed):
+        """Элементы с заданными значениями индексов
+
+        Args:
+            fixed: словарь {ось: значение}, например {2: k} - все элементы с i3 == k
+
+        Returns:
+            список пар (индексы, значение)
+        """
+        if not fixed:
+            return list(self.data.items())
+        if isinstance(self.data, LazyScottStorage):
+            return self.data.get_slice(fixed)
+
+        # Берём самый короткий список кандидатов среди индексов фиксированных осей
+        candidates = min((self.get_axis_index(axis)[1].get(value, ()) for axis, value in fixed.items()),
+                         key=len)
+        return [(key, self.data[key]) for key in candidates
+                if all(key[axis] == value for axis, value in fixed.items())]
+
+    def get_leading_index(self, count):
+        """Группировка элементов по первым count индексам (строится один раз, дальше её правит add_value)
+
+        Возвращает словарь: ведущие индексы -> список (остальные индексы, значение).
+        Порядок элементов в списках совпадает с порядком обхода data,
+        поэтому суммы в ядрах накапливаются в том же порядке, что и при полном переборе.
+        """
+        if count in self._leading_indexes:
+            return self._leading_indexes[count]
+
+        index = {}
+        if isinstance(self.data, CooStorage):
+            # Ключи группировки собираем прямо из массивов координат
+            rows = zip(self.data.iter_keys(range(count)),
+                       self.data.iter_keys(range(count, self.dimension)),
+                       self.data.values())
+            for lead_key, rest_key, value in rows:
+                index.setdefault(lead_key, []).append((rest_key, value))
+        else:
+            for key, value in self.data.items():
+                index.setdefault(key[:count], []).append((key[count:], value))
+
+        self._leading_indexes[count] = index
+        return index
+
+    def get_join_index(self, scott, cayley):
+        """Группировка элементов левого множителя по индексам, которыми он стыкуется с B
+
+        Возвращает словарь: (кэлиевы, скоттовы индексы) - в порядке ведущих индексов B ->
+        список (индексы, попадающие в результат, значение). Строится один раз, add_value
+        и remove_value её правят.
+        """
+        if (scott, cayley) not in self._join_indexes:
+            kept = self.dimension - cayley
+            scott_start = kept - scott
+            index = {}
+            for key, value in self.data.items():
+                index.setdefault(key[kept:] + key[scott_start:kept], []).append((key[:kept], value))
+            self._join_indexes[scott, cayley] = index
+        return self._join_indexes[scott, cayley]
+
     def to_nested_list(self):
         """Преобразование тензора во вложенное списковое представление"""
         if not self.data:
             return []
 
-        # Найдём форму
-        shape = []
-        for indices in self.data.keys():
-            for i, idx in enumerate(indices):
-                if i >= len(shape):
-                    shape.append(idx + 1)
-                else:
-                    shape[i] = max(shape[i], idx + 1)
-
         # Создание структуры вложенного списка
-        result = self._create_nested_list(shape)
+        result = self._create_nested_list(self.get_shape())
 
         # Заполнить значениями
         for indices, value in self.data.items():
@@ -60,24 +984,273 @@ class Tensor:
 
     def get_shape(self):
         """Получаем форму тензора"""
+        if isinstance(self.data, LazyScottStorage):
+            # Форма отложенного результата задана формами A и B; проверка пустоты посчитала бы все пары
+            return tuple(self._shape)
         if not self.data:
             return ()
+        return tuple(self._shape)
+
+    def _compute_shape(self):
+        """Полный расчёт формы по всем элементам (только при создании тензора)"""
+        if isinstance(self.data, DenseStorage):
+            return list(self.data.shape) if len(self.data) else []
+        if isinstance(self.data, CooStorage):
+            coords, _ = self.data.columns()
+            return [max(column) + 1 for column in coords] if len(self.data) else []
 
         shape = []
         for indices in self.data.keys():
-            for i, idx in enumerate(indices):
-                if i >= len(shape):
-                    shape.append(idx + 1)
-                else:
-                    shape[i] = max(shape[i], idx + 1)
+            self._update_shape(indices, shape)
+        return shape
+
+    def _update_shape(self, indices, shape=None):
+        """Расширяем форму так, чтобы она включала элемент с заданными индексами"""
+        if shape is None:
+            shape = self._shape
+        for i, idx in enumerate(indices):
+            if i >= len(shape):
+                shape.append(idx + 1)
+            elif idx >= shape[i]:
+                shape[i] = idx + 1
+
+    def to_array(self):
+        """Преобразование тензора в плотный массив numpy (отсутствующие элементы = 0)"""
+        if np is None:
+            raise ImportError("Для плотного представления требуется пакет numpy")
+        if isinstance(self.data, DenseStorage):
+            # Плотное хранилище отдаём без копирования, в т.ч. поверх отображённого файла
+            values = np.frombuffer(self.data.value_array, dtype=np.dtype(self.data.typecode))
+            return values.reshape(self.data.shape)
+        if isinstance(self.data, LazyScottStorage):
+            # Отложенное произведение считаем сразу целиком, векторизованно
+            array_a, array_b = self.data.tensor_a.to_array(), self.data.tensor_b.to_array()
+            if self.data.scott == 2:
+                return DenseTensorMultiplier.method3_scott(array_a, array_b)
+            return DenseTensorMultiplier.method4_scott(array_a, array_b)
+
+        dtype = np.dtype(self.dtype)
+        if not self.data:
+            # У пустого тензора формы нет: нулевые оси сохраняют число измерений
+            return np.zeros((0,) * self.dimension, dtype=dtype)
+        result = np.zeros(self.get_shape(), dtype=dtype)
+
+        if isinstance(self.data, CooStorage):
+            # Массивы COO читаем напрямую, без построения кортежей индексов
+            coords, values = self.data.columns()
+            positions = tuple(np.frombuffer(column, dtype=np.int64) for column in coords)
+            result[positions] = np.frombuffer(values, dtype=dtype)
+        else:
+            keys = np.array(list(self.data.keys()), dtype=np.intp)
+            result[tuple(keys.T)] = list(self.data.values())
+        return result
+
+    @classmethod
+    def from_array(cls, dense, storage="dict", dtype=None):
+        """Создаём тензор из плотного массива numpy
+
+        Тип значений по умолчанию - по типу массива: float32 остаётся float32,
+        целые и логические - int64, остальные - float64.
+        """
+        if dtype is None:
+            if dense.dtype == np.float32:
+                dtype = 'float32'
+            elif dense.dtype.kind in 'biu':
+                dtype = 'int64'
+            else:
+                dtype = 'float64'
+        typecode = cls.DTYPES[dtype]
+        if storage == "dense":
+            values = array(typecode)
+            values.frombytes(np.ascontiguousarray(dense, dtype=dtype).tobytes())
+            return cls(dense.ndim, DenseStorage(dense.shape, values))
+
+        if storage == "coo":
+            coords = []
+            for axis_indices in np.indices(dense.shape).reshape(dense.ndim, dense.size):
+                column = array('q')
+                column.frombytes(axis_indices.astype(np.int64).tobytes())
+                coords.append(column)
+            values = array(typecode)
+            values.frombytes(np.ascontiguousarray(dense, dtype=dtype).tobytes())
+            return cls(dense.ndim, CooStorage(dense.ndim, coords, values))
+
+        # Хранятся все элементы массива, поэтому форма известна заранее
+        indices = product(*[range(size) for size in dense.shape])
+        return cls(dense.ndim, dict(zip(indices, dense.astype(dtype, copy=False).ravel().tolist())),
+                   shape=dense.shape if dense.size else None, dtype=dtype)
+
+    @classmethod
+    def from_buffer(cls, buffer, shape=None, dtype=None):
+        """Плотный тензор поверх готового буфера (массив numpy, array, mmap, общая память) без копирования
+
+        Args:
+            buffer: объект с буферным протоколом; значения подряд в порядке строк
+            shape: форма (по умолчанию - форма буфера)
+            dtype: тип значений (по умолчанию - по формату буфера: float64, float32 или int64)
+
+        Тензор читает значения прямо из буфера; запись в тензор (add_value) сначала
+        делает собственную копию, поэтому исходный буфер через тензор не меняется.
+
+        Raises:
+            ValueError: буфер не непрерывный, тип не поддерживается или размер не совпадает с формой
+        """
+        view = memoryview(buffer)
+        if not view.c_contiguous:
+            raise ValueError("Буфер должен быть непрерывным (в порядке строк)")
+        if dtype is None:
+            dtype = cls._buffer_dtype(view)
+        elif dtype not in cls.DTYPES:
+            raise ValueError(f"Неизвестный тип значений: {dtype}")
+        if shape is None:
+            shape = view.shape
+        typecode = cls.DTYPES[dtype]
+        if view.nbytes != math.prod(shape) * array(typecode).itemsize:
+            raise ValueError(f"Размер буфера ({view.nbytes} байт) не совпадает с формой {tuple(shape)} "
+                             f"и типом {dtype}")
+        return cls(len(shape), DenseStorage(shape, view.cast('B').cast(typecode)))
 
-        return tuple(shape)
+    @staticmethod
+    def _buffer_dtype(view):
+        """Тип значений по формату буфера (как в модуле struct)"""
+        code = view.format.lstrip('@=')
+        if code.startswith(('<', '>', '!')):
+            if code[0] != ('<' if sys.byteorder == 'little' else '>'):
+                raise ValueError("Буфер с обратным порядком байт не поддерживается")
+            code = code[1:]
+        if code == 'd':
+            return 'float64'
+        if code == 'f':
+            return 'float32'
+        if code in ('q', 'l', 'n') and view.itemsize == 8:
+            return 'int64'   # numpy отдаёт int64 с форматом 'l' на 64-разрядных Linux и macOS
+        raise ValueError(f"Неподдерживаемый формат значений буфера: {view.format}")
+
+    def as_buffer(self):
+        """memoryview формы shape на значения плотного тензора без копирования
+
+        Raises:
+            TypeError: тензор хранится не в DenseStorage (см. convert_storage)
+        """
+        if not isinstance(self.data, DenseStorage):
+            raise TypeError(f"Буфер без копирования есть только у плотного тензора, а не у хранилища {self.storage}")
+        values = memoryview(self.data.value_array).cast('B')
+        return values.cast(self.data.typecode, self.data.shape) if math.prod(self.data.shape) else values
+
+    def __buffer__(self, flags):
+        # Буферный протокол (Python 3.12+): memoryview(tensor), bytes(tensor) и т.п.
+        return self.as_buffer()
+
+    @property
+    def __array_interface__(self):
+        """Описание данных плотного тензора для numpy (np.asarray(tensor) - без копирования)
+
+        Массив numpy пишет прямо в хранилище тензора: после такой записи запомненный
+        content_hash устаревает, поэтому изменённый так тензор не стоит умножать через кэш.
+        """
+        if not isinstance(self.data, DenseStorage):
+            # Для остальных хранилищ numpy перейдёт к __array__
+            raise AttributeError("__array_interface__")
+        typestr = {'d': 'f8', 'f': 'f4', 'q': 'i8'}[self.data.typecode]
+        return {
+            'version': 3,
+            'shape': self.data.shape,
+            'typestr': ('<' if sys.byteorder == 'little' else '>') + typestr,
+            'data': memoryview(self.data.value_array).cast('B'),
+        }
+
+    def __array__(self, dtype=None, copy=None):
+        """Плотный массив numpy для разреженных тензоров (с копированием, см. to_array)"""
+        result = self.to_array()
+        return result if dtype is None else result.astype(dtype)
+
+    @classmethod
+    def random(cls, shape, density=1.0, seed=None, storage="dict", low=0.0, high=10.0, decimals=2,
+               dtype='float64'):
+        """Случайный тензор формы shape, все значения создаются одним блоком
+
+        Args:
+            shape: форма тензора
+            density: доля хранимых элементов (0 < density <= 1); при density < 1 позиции
+                выбираются случайно без повторов, остальные элементы равны 0
+            seed: зерно генератора для воспроизводимых замеров (None - случайное)
+            storage: 'dict', 'coo' или 'dense'
+            low, high, decimals: значения равномерно из [low, high), округлённые до decimals знаков
+            dtype: 'float64', 'float32' или 'int64' (целые значения из [low, high), decimals не нужен)
+
+        С numpy значения и позиции генерируются векторизованно, без него - модулем random.
+        """
+        if not 0 < density <= 1:
+            raise ValueError("Плотность должна быть в интервале (0, 1]")
+        if dtype not in cls.DTYPES:
+            raise ValueError(f"Неизвестный тип значений: {dtype}")
+        integer = dtype == 'int64'
+        if integer and math.ceil(low) >= math.ceil(high):
+            raise ValueError(f"В интервале [{low}, {high}) нет целых значений")
+        shape = tuple(shape)
+        dimension = len(shape)
+        size = math.prod(shape)
+        count = size if density == 1 else round(size * density)
+
+        values = array(cls.DTYPES[dtype])
+        if np is not None:
+            generator = np.random.default_rng(seed)
+            positions = None if count == size else np.sort(generator.choice(size, count, replace=False))
+            if integer:
+                generated = generator.integers(math.ceil(low), math.ceil(high), count, dtype=np.int64)
+            else:
+                generated = np.round(generator.uniform(low, high, count), decimals).astype(dtype)
+            values.frombytes(generated.tobytes())
+        else:
+            generator = random.Random(seed)
+            positions = None if count == size else sorted(generator.sample(range(size), count))
+            if integer:
+                values.extend(generator.randrange(math.ceil(low), math.ceil(high)) for _ in range(count))
+            else:
+                values.extend(round(generator.uniform(low, high), decimals) for _ in range(count))
+
+        if storage == "dense":
+            if positions is None:
+                return cls(dimension, DenseStorage(shape, values))
+            data = DenseStorage(shape, typecode=values.typecode)
+            if np is not None:
+                np.frombuffer(data.value_array, dtype=dtype)[positions] = np.frombuffer(values, dtype=dtype)
+            else:
+                for position, value in zip(positions, values):
+                    data.value_array[position] = value
+            return cls(dimension, data)
+
+        if positions is None and storage == "dict":
+            return cls(dimension, dict(zip(product(*[range(axis_size) for axis_size in shape]), values)),
+                       shape=shape, dtype=dtype)
+
+        # Позиции отсортированы, поэтому индексы идут в лексикографическом порядке
+        if np is not None:
+            if positions is None:
+                positions = np.arange(size, dtype=np.int64)
+            coords = []
+            for axis_indices in np.unravel_index(positions, shape):
+                column = array('q')
+                column.frombytes(axis_indices.astype(np.int64).tobytes())
+                coords.append(column)
+        else:
+            if positions is None:
+                positions = range(size)
+            coords = []
+            stride = size
+            for axis_size in shape:
+                stride //= axis_size
+                coords.append(array('q', (position // stride % axis_size for position in positions)))
+
+        if storage == "coo":
+            return cls(dimension, CooStorage(dimension, coords, values), shape=shape)
+        return cls(dimension, dict(zip(zip(*coords), values)), storage=storage, shape=shape, dtype=dtype)
 
     @classmethod
-    def from_nested_list(cls, nested_list):
+    def from_nested_list(cls, nested_list, storage="dict"):
         """Создаём тензор из вложенного списка"""
-        data = {}
         dimension = cls._get_dimension(nested_list)
+        data = {} if storage == "dict" else CooStorage(dimension)
         cls._fill_data_from_list(nested_list, (), data)
         return cls(dimension, data)
 
@@ -97,367 +1270,2833 @@ class Tensor:
         else:
             data[current_indices] = lst
 
-class MunermanTensorMultiplier:
+class TensorFile:
+    """Двоичный формат файла тензора с загрузкой через отображение в память
+
+    Файл начинается с заголовка HEADER (little-endian): сигнатура MAGIC, версия формата,
+    раскладка, код типа значений (как в модуле array), размерность и число хранимых
+    элементов; следом идёт форма - по 8 байт на ось. Данные выровнены на 8 байт:
+    - LAYOUT_SPARSE: столбцы индексов int64 (по одному на ось, строки отсортированы
+      лексикографически), затем значения - как в CooStorage;
+    - LAYOUT_DENSE: все значения формы подряд в порядке строк - как в DenseStorage.
+
+    При загрузке данные не читаются: хранилище тензора ссылается на отображённый
+    в память файл, и страницы подгружаются, когда к ним обращается ядро умножения.
+    """
+    MAGIC = b'MUNT'
+    VERSION = 1
+    LAYOUT_SPARSE = 0
+    LAYOUT_DENSE = 1
+    HEADER = struct.Struct('<4sBBcxIQ')
+    ALIGNMENT = 8
+    EXTENSION = ".munt"
+    TYPECODES = ('d', 'f', 'q')
+
+    @staticmethod
+    def save(tensor, path, layout=None):
+        """Запись тензора в файл (раскладку по умолчанию выбирает iter_chunks)"""
+        with open(path, 'wb') as file:
+            for chunk in TensorFile.iter_chunks(tensor, layout):
+                file.write(chunk)
+
+    @staticmethod
+    def to_bytes(tensor, layout=None):
+        """Содержимое файла тензора в виде bytes"""
+        return b''.join(TensorFile.iter_chunks(tensor, layout))
+
+    @staticmethod
+    def iter_chunks(tensor, layout=None):
+        """Части файла тензора (объекты с буферным протоколом) в порядке записи
+
+        Если layout не задан, полностью заполненный тензор пишется плотно (без индексов),
+        остальные - разреженно.
+        """
+        shape = tensor.get_shape() or (0,) * tensor.dimension
+        size = math.prod(shape)
+        if layout is None:
+            dense = isinstance(tensor.data, DenseStorage) or (size and tensor.nnz() == size)
+            layout = TensorFile.LAYOUT_DENSE if dense else TensorFile.LAYOUT_SPARSE
+
+        typecode = Tensor.DTYPES[tensor.dtype]
+        if layout == TensorFile.LAYOUT_DENSE:
+            storage = tensor.data
+            if not isinstance(storage, DenseStorage):
+                storage = DenseStorage.from_items(tensor.dimension, tensor.data.items(), shape, typecode)
+            columns, values = [], storage.value_array
+        elif layout == TensorFile.LAYOUT_SPARSE:
+            storage = tensor.data
+            if not isinstance(storage, CooStorage):
+                storage = CooStorage.from_items(tensor.dimension, tensor.data.items(), typecode)
+            columns, values = storage.columns()
+        else:
+            raise ValueError(f"Неизвестная раскладка файла тензора: {layout}")
+
+        typecode = storage.typecode
+        yield TensorFile.header(layout, typecode, tensor.dimension, len(values), shape)
+        for column in columns:
+            yield TensorFile._little_endian(column, 'q')
+        yield TensorFile._little_endian(values, typecode)
+
+    @staticmethod
+    def header(layout, typecode, dimension, count, shape):
+        """Заголовок файла вместе с формой и выравниванием до начала данных"""
+        header = TensorFile.HEADER.pack(TensorFile.MAGIC, TensorFile.VERSION, layout,
+                                        typecode.encode('ascii'), dimension, count)
+        header += struct.pack(f'<{dimension}Q', *shape)
+        return header + bytes(TensorFile._padding(len(header)))
+
+    @staticmethod
+    def load(path, use_mmap=True):
+        """Загрузка тензора из файла; при use_mmap=True файл отображается в память"""
+        with open(path, 'rb') as file:
+            if not use_mmap or os.fstat(file.fileno()).st_size == 0:
+                return TensorFile.from_bytes(file.read())
+            # Отображение остаётся открытым, пока на него ссылается хранилище тензора
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return TensorFile.from_bytes(mapped)
+
+    @staticmethod
+    def from_bytes(buffer):
+        """Тензор поверх буфера с содержимым файла (bytes, mmap и т.п.) без копирования данных"""
+        view = memoryview(buffer).cast('B')
+        if len(view) < TensorFile.HEADER.size:
+            raise ValueError("Это не файл тензора: слишком короткий заголовок")
+        magic, version, layout, typecode, dimension, count = TensorFile.HEADER.unpack_from(view)
+        if magic != TensorFile.MAGIC:
+            raise ValueError("Это не файл тензора: неверная сигнатура")
+        if version != TensorFile.VERSION:
+            raise ValueError(f"Неподдерживаемая версия формата файла тензора: {version}")
+        typecode = typecode.decode('ascii')
+        if typecode not in TensorFile.TYPECODES:
+            raise ValueError(f"Неподдерживаемый тип значений в файле тензора: {typecode}")
+        if layout not in (TensorFile.LAYOUT_SPARSE, TensorFile.LAYOUT_DENSE):
+            raise ValueError(f"Неизвестная раскладка файла тензора: {layout}")
+
+        offset = TensorFile.HEADER.size
+        if len(view) < offset + 8 * dimension:
+            raise ValueError("Файл тензора повреждён: нет формы")
+        shape = struct.unpack_from(f'<{dimension}Q', view, offset)
+        offset += 8 * dimension
+        offset += TensorFile._padding(offset)
+
+        columns_count = dimension if layout == TensorFile.LAYOUT_SPARSE else 0
+        itemsize = array(typecode).itemsize
+        if len(view) < offset + count * (8 * columns_count + itemsize):
+            raise ValueError("Файл тензора повреждён: данных меньше, чем указано в заголовке")
+
+        columns = []
+        for _ in range(columns_count):
+            columns.append(TensorFile._from_little_endian(view[offset:offset + 8 * count], 'q'))
+            offset += 8 * count
+        values = TensorFile._from_little_endian(view[offset:offset + itemsize * count], typecode)
+
+        if layout == TensorFile.LAYOUT_DENSE:
+            if count != math.prod(shape):
+                raise ValueError("Файл тензора повреждён: число значений не совпадает с формой")
+            return Tensor(dimension, DenseStorage(shape, values))
+        # Строки в файле уже отсортированы (их пишет iter_chunks из CooStorage.columns)
+        return Tensor(dimension, CooStorage(dimension, columns, values), shape=shape if count else [])
+
+    @staticmethod
+    def _padding(length):
+        return -length % TensorFile.ALIGNMENT
+
+    @staticmethod
+    def _little_endian(buffer, typecode):
+        """Буфер в порядке байт файла (на little-endian машинах - без копирования)"""
+        if sys.byteorder == 'little':
+            return buffer
+        result = array(typecode, _to_array(buffer, typecode))
+        result.byteswap()
+        return result
+
+    @staticmethod
+    def _from_little_endian(view, typecode):
+        """Типизированный вид на байты файла (на big-endian машинах - перевёрнутая копия)"""
+        if sys.byteorder == 'little':
+            return view.cast(typecode)
+        result = array(typecode)
+        result.frombytes(view.cast('B'))
+        result.byteswap()
+        return result
+
+class SharedTensor:
+    """Плотный тензор в общей памяти (multiprocessing.shared_memory) для передачи процессам
+
+    Значения копируются в общую память один раз (create), другие процессы получают
+    по descriptor тот же участок памяти (attach) и работают с ним без копирования
+    и без сериализации. Участок удаляет из системы только создавший его процесс (unlink в close).
+
+    Пример:
+        with SharedTensor.create(tensor_b) as shared:
+            executor.submit(work, shared.descriptor)   # в work: SharedTensor.attach(descriptor).tensor
+    """
+
+    def __init__(self, segment, shape, dtype, owner=False):
+        self.segment = segment
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.owner = owner
+        self._unlinked = False
+        nbytes = math.prod(self.shape) * array(Tensor.DTYPES[dtype]).itemsize
+        # Размер участка округляется ОС до страницы, поэтому берём только нужные байты
+        self._view = segment.buf[:nbytes]
+        self.tensor = Tensor.from_buffer(self._view, self.shape, dtype)
+
+    @classmethod
+    def create(cls, tensor):
+        """Копия тензора в новом участке общей памяти (разреженный тензор сначала уплотняется)"""
+        if not isinstance(tensor.data, DenseStorage):
+            tensor = tensor.convert_storage("dense")
+        source = memoryview(tensor.data.value_array).cast('B')
+        segment = shared_memory.SharedMemory(create=True, size=max(1, source.nbytes))
+        segment.buf[:source.nbytes] = source
+        return cls(segment, tensor.data.shape, tensor.dtype, owner=True)
+
+    @classmethod
+    def attach(cls, descriptor):
+        """Тензор из участка, созданного другим процессом (descriptor - из его SharedTensor.descriptor)"""
+        name, shape, dtype = descriptor
+        return cls(shared_memory.SharedMemory(name=name), shape, dtype)
+
+    @property
+    def descriptor(self):
+        """(имя участка, форма, тип) - всё, что нужно передать другому процессу"""
+        return self.segment.name, self.shape, self.dtype
+
+    def close(self):
+        """Отключение от участка; создавший участок процесс заодно удаляет его
+
+        Участок удаляется из системы сразу, даже если тензор или массив numpy поверх него
+        ещё используются: память освободится, когда их не станет. Отключиться от участка
+        в этом случае нельзя - тогда BufferError, и close можно повторить позже.
+        """
+        if self.owner and not self._unlinked:
+            self._unlinked = True
+            self.segment.unlink()
+        self.tensor = None
+        if self._view is not None:
+            # memoryview тензора нужно освободить, иначе участок нельзя закрыть
+            self._view.release()
+            self._view = None
+        self.segment.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class MultiplicationCancelled(Exception):
+    """Умножение остановлено по запросу пользователя"""
+
+class ProgressMonitor:
+    """Связь ядра умножения с вызывающим кодом: прогресс и запрос на отмену
+
+    Ядро вызывает update(доля) по мере обработки элементов A; если отмена уже
+    запрошена (cancel() из другого потока), update бросает MultiplicationCancelled.
+    """
+
+    def __init__(self, callback=None, cancel_event=None):
+        self.callback = callback
+        self.cancel_event = cancel_event if cancel_event is not None else threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def update(self, fraction):
+        if self.cancel_event.is_set():
+            raise MultiplicationCancelled()
+        if self.callback is not None:
+            self.callback(fraction)
+
+class Instrumentation:
+    """Замеры этапов одного расчёта и счётчики работы ядра
+
+    Этапы меряются монотонным таймером time.perf_counter и накапливаются по имени
+    (повторный вход в этап добавляет время). Этапы входных матриц хранятся с
+    префиксом, например 'a.parse'. При profile=True на время этапов включается
+    cProfile; профиль записывается вместе с отчётом (save).
+    """
+    PHASE_NAMES = {
+        'parse': "разбор текста",
+        'build': "построение тензора",
+        'load': "чтение файла",
+        'shape': "определение формы",
+        'cache': "кэш результатов",
+        'estimate': "оценка размеров и подсчёт пар",
+        'multiply': "умножение",
+        'update': "обновление по изменённым элементам",
+        'format': "форматирование",
+        'render': "вывод в окно",
+    }
+    COUNTER_NAMES = {
+        'pairs_examined': "пар рассмотрено",
+        'pairs_matched': "пар совпало по индексам",
+        'result_nnz': "элементов результата",
+        'cache_hits': "взято из кэша",
+    }
+
+    def __init__(self, profile=False):
+        self.phases = {}
+        self.counters = {}
+        self.profiler = cProfile.Profile() if profile else None
+        self._profiling = 0
+
+    @staticmethod
+    def timed(stats, name):
+        """Контекст замера этапа name; при stats=None ничего не меряет"""
+        return stats.phase(name) if stats is not None else nullcontext()
+
+    @contextmanager
+    def phase(self, name):
+        with self.profiling():
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                self.add(name, time.perf_counter() - start)
+
+    @contextmanager
+    def profiling(self):
+        """Включение cProfile (если он задан) без замера времени, например вокруг вывода страниц"""
+        if self.profiler is None:
+            yield
+            return
+        if self._profiling == 0:
+            self.profiler.enable()
+        self._profiling += 1
+        try:
+            yield
+        finally:
+            self._profiling -= 1
+            if self._profiling == 0:
+                self.profiler.disable()
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name, value):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other, prefix):
+        """Добавление этапов другого замера (например, создания матрицы A) с префиксом"""
+        for name, seconds in other.phases.items():
+            self.add(f"{prefix}.{name}", seconds)
+
+    @staticmethod
+    def phase_label(name):
+        prefix, _, phase = name.rpartition('.')
+        label = Instrumentation.PHASE_NAMES.get(phase, phase)
+        return f"матрица {prefix.upper()}: {label}" if prefix else label
+
+    def total(self):
+        return sum(self.phases.values())
+
+    def report(self):
+        """Текстовый отчёт: время и доля каждого этапа, затем счётчики"""
+        total = self.total()
+        width = max([len(self.phase_label(name)) for name in self.phases] + [5])
+        lines = ["=== ПРОФИЛЬ ВЫПОЛНЕНИЯ ==="]
+        for name, seconds in self.phases.items():
+            share = seconds / total if total > 0 else 0.0
+            lines.append(f"{self.phase_label(name):{width}}  {seconds:12.6f} сек  {share:6.1%}")
+        lines.append(f"{'Всего':{width}}  {total:12.6f} сек")
+        for name, value in self.counters.items():
+            lines.append(f"{self.COUNTER_NAMES.get(name, name)}: {value}")
+        if self.profiler is not None:
+            lines.append("Профиль cProfile записан, сохраняется при экспорте отчёта")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {'phases': dict(self.phases), 'total': self.total(), 'counters': dict(self.counters)}
+
+    def save(self, path):
+        """Запись отчёта: JSON для расширения .json, иначе текст; профиль - рядом в <path>.prof
+
+        Returns:
+            список записанных файлов
+        """
+        with open(path, 'w', encoding='utf-8') as file:
+            if path.endswith('.json'):
+                json.dump(self.to_dict(), file, ensure_ascii=False, indent=2)
+            else:
+                file.write(self.report() + "\n")
+        saved = [path]
+        if self.profiler is not None:
+            profile_path = os.path.splitext(path)[0] + ".prof"
+            self.profiler.dump_stats(profile_path)
+            saved.append(profile_path)
+        return saved
+
+class MunermanTensorMultiplier:
+    # Номер метода -> (число скоттовых индексов λ, число кэлиевых индексов μ)
+    METHOD_SIGNATURES = {
+        1: (0, 2),
+        2: (0, 1),
+        3: (2, 0),
+        4: (1, 0),
+        5: (1, 1),
+    }
+
+    @staticmethod
+    def check_signature(tensor_a, tensor_b, scott, cayley):
+        """Проверка, что у тензоров хватает индексов для (λ,μ)-свернутого произведения"""
+        joined = scott + cayley
+        if joined > tensor_a.dimension or joined > tensor_b.dimension:
+            raise ValueError(f"Для ({scott},{cayley})-свернутого произведения нужно не менее {joined} "
+                             f"индексов у каждого тензора: A={tensor_a.dimension}D, B={tensor_b.dimension}D")
+
+    @staticmethod
+    def contracted_product(tensor_a, tensor_b, scott, cayley, monitor=None):
+        """(λ,μ)-свернутое произведение тензоров произвольной размерности
+
+        Индексы A делятся на (свободные l, скоттовы s, кэлиевы c), индексы B - на
+        (кэлиевы c, скоттовы s, свободные m). Результат имеет индексы (l, s, m);
+        по кэлиевым индексам выполняется суммирование, по скоттовым - нет.
+        Если A хранится в CooStorage, результат тоже строится в CooStorage.
+        Тип значений результата - общий тип A и B (Tensor.promote), суммы копятся
+        в типе accumulation_dtype.
+        monitor (ProgressMonitor) получает долю обработанных элементов A и может прервать расчёт.
+        """
+        MunermanTensorMultiplier.check_signature(tensor_a, tensor_b, scott, cayley)
+        dim_a, dim_b = tensor_a.dimension, tensor_b.dimension
+        joined = scott + cayley
+        dtype = Tensor.promote(tensor_a.dtype, tensor_b.dtype)
+
+        # Роли индексов определяем один раз: A[:kept] = (l, s) попадает в результат,
+        # A[scott_start:kept] = s, A[kept:] = c
+        kept = dim_a - cayley
+        scott_start = dim_a - joined
+        result_dimension = dim_a + dim_b - scott - 2 * cayley
+        index_b = tensor_b.get_leading_index(joined)
+
+        if isinstance(tensor_a.data, CooStorage):
+            data, pairs = MunermanTensorMultiplier._contracted_product_coo(
+                tensor_a.data, index_b, result_dimension, kept, scott_start, monitor, Tensor.DTYPES[dtype])
+        else:
+            # B начинается с кэлиевых индексов, за ними идут скоттовы
+            rows_a = MunermanTensorMultiplier._monitored(
+                ((key_a[:kept], key_a[kept:] + key_a[scott_start:kept], value_a)
+                 for key_a, value_a in tensor_a.data.items()), len(tensor_a.data), monitor)
+            data, pairs = MunermanTensorMultiplier.join_rows(rows_a, index_b, result_dimension, cayley > 0)
+        result = Tensor(result_dimension, data, dtype=dtype)
+        result.accumulation_dtype = MunermanTensorMultiplier.accumulation_dtype(dtype)
+        result.pairs = pairs
+        return result
+
+    @staticmethod
+    def accumulation_dtype(dtype):
+        """Тип, в котором поэлементные ядра копят суммы для результата типа dtype
+
+        Ядра работают с числами Python: целые складываются точно (в int64 результата
+        они записываются без округления), дробные - в float64, в том числе для float32,
+        который округляется только при записи результата (в массив или Tensor.fit_values).
+        """
+        return 'int64' if dtype == 'int64' else 'float64'
+
+    @staticmethod
+    def split_rows(tensor_a, scott, cayley):
+        """Строки A в виде (индексы, попадающие в результат, ключ стыковки с B, значение)
+
+        Ключ стыковки - (кэлиевы, скоттовы индексы) в порядке ведущих индексов B.
+        Порядок строк совпадает с порядком обхода A в contracted_product.
+        """
+        dimension = tensor_a.dimension
+        kept = dimension - cayley
+        scott_start = kept - scott
+        if isinstance(tensor_a.data, CooStorage):
+            return list(zip(tensor_a.data.iter_keys(range(kept)),
+                            tensor_a.data.iter_keys(list(range(kept, dimension)) + list(range(scott_start, kept))),
+                            tensor_a.data.values()))
+        return [(key[:kept], key[kept:] + key[scott_start:kept], value) for key, value in tensor_a.data.items()]
+
+    @staticmethod
+    def join_rows(rows_a, index_b, result_dimension, summed, coo=False, typecode='d'):
+        """contracted_product по заранее разобранным строкам A (см. split_rows)
+
+        summed - есть ли кэлиевы индексы (суммирование); coo - строить результат в
+        CooStorage с кодом типа typecode (строки A должны идти в отсортированном порядке,
+        как в CooStorage). Словарь результата приводится к типу в Tensor (fit_values).
+
+        Returns:
+            (хранилище результата, число перемноженных пар)
+        """
+        if coo:
+            try:
+                return MunermanTensorMultiplier._join_rows_coo(rows_a, index_b, result_dimension, summed, typecode)
+            except OverflowError:
+                raise Tensor.range_error(Tensor.dtype_of(typecode)) from None
+
+        # Пары считаем по размеру группы B для строки A - без счётчика во внутреннем цикле
+        result_data = {}
+        pairs = 0
+        if not summed:
+            for prefix, join_key, value_a in rows_a:
+                rows_b = index_b.get(join_key, ())
+                pairs += len(rows_b)
+                for rest_b, value_b in rows_b:
+                    result_data[prefix + rest_b] = value_a * value_b
+        else:
+            for prefix, join_key, value_a in rows_a:
+                rows_b = index_b.get(join_key, ())
+                pairs += len(rows_b)
+                for rest_b, value_b in rows_b:
+                    new_key = prefix + rest_b
+                    result_data[new_key] = result_data.get(new_key, 0) + value_a * value_b
+        return result_data, pairs
+
+    @staticmethod
+    def _join_rows_coo(rows_a, index_b, result_dimension, summed, typecode):
+        """Ветвь join_rows, которая сразу строит CooStorage результата"""
+        result = CooStorage(result_dimension, typecode=typecode)
+        pairs = 0
+        if not summed:
+            for prefix, join_key, value_a in rows_a:
+                rows_b = index_b.get(join_key, ())
+                pairs += len(rows_b)
+                for rest_b, value_b in rows_b:
+                    result.append(prefix + rest_b, value_a * value_b)  # Без суммирования!
+            return result, pairs
+
+        group_prefix, group = None, {}
+        for prefix, join_key, value_a in rows_a:
+            if prefix != group_prefix:
+                for rest_b in sorted(group):
+                    result.append(group_prefix + rest_b, group[rest_b])
+                group_prefix, group = prefix, {}
+            rows_b = index_b.get(join_key, ())
+            pairs += len(rows_b)
+            for rest_b, value_b in rows_b:
+                group[rest_b] = group.get(rest_b, 0) + value_a * value_b
+        for rest_b in sorted(group):
+            result.append(group_prefix + rest_b, group[rest_b])
+        return result, pairs
+
+    @staticmethod
+    def lazy_product(tensor_a, tensor_b, scott):
+        """(λ,0)-свернутое произведение в виде отложенного результата (LazyScottStorage)
+
+        Форма берётся по формам A и B (общий диапазон скоттовых индексов), как в плотном режиме.
+        """
+        MunermanTensorMultiplier.check_signature(tensor_a, tensor_b, scott, 0)
+        result_dimension = tensor_a.dimension + tensor_b.dimension - scott
+        shape_a, shape_b = tensor_a.get_shape(), tensor_b.get_shape()
+        if not shape_a or not shape_b:
+            return Tensor(result_dimension)
+        scott_start = tensor_a.dimension - scott
+        shape = shape_a[:scott_start] + tuple(map(min, shape_a[scott_start:], shape_b[:scott])) + shape_b[scott:]
+        result = Tensor(result_dimension, LazyScottStorage(tensor_a, tensor_b, scott), shape=shape)
+        result.accumulation_dtype = MunermanTensorMultiplier.accumulation_dtype(result.dtype)
+        return result
+
+    @staticmethod
+    def delta_product_b(tensor_a, delta_b, scott, cayley):
+        """Произведение A на тензор изменений B: обход идёт по элементам delta_b, а не A
+
+        A группируется по стыкуемым индексам один раз (Tensor.get_join_index),
+        поэтому время пропорционально числу изменённых элементов B.
+        """
+        MunermanTensorMultiplier.check_signature(tensor_a, delta_b, scott, cayley)
+        joined = scott + cayley
+        index_a = tensor_a.get_join_index(scott, cayley)
+        result_data = {}
+        for key_b, value_b in delta_b.data.items():
+            rest_b = key_b[joined:]
+            for prefix, value_a in index_a.get(key_b[:joined], ()):
+                new_key = prefix + rest_b
+                result_data[new_key] = result_data.get(new_key, 0) + value_a * value_b
+        return Tensor(tensor_a.dimension + delta_b.dimension - scott - 2 * cayley, result_data,
+                      dtype=Tensor.promote(tensor_a.dtype, delta_b.dtype))
+
+    @staticmethod
+    def count_pairs(tensor_a, tensor_b, scott, cayley):
+        """Число пар элементов (a, b), которые перемножаются в (scott, cayley)-свернутом произведении"""
+        MunermanTensorMultiplier.check_signature(tensor_a, tensor_b, scott, cayley)
+        dim_a = tensor_a.dimension
+        kept = dim_a - cayley
+        scott_start = dim_a - scott - cayley
+        group_sizes = {key: len(rows) for key, rows in tensor_b.get_leading_index(scott + cayley).items()}
+
+        axes = list(range(kept, dim_a)) + list(range(scott_start, kept))
+        if isinstance(tensor_a.data, CooStorage):
+            join_keys = tensor_a.data.iter_keys(axes)
+        else:
+            join_keys = (tuple(key[axis] for axis in axes) for key in tensor_a.data.keys())
+        return sum(group_sizes.get(join_key, 0) for join_key in join_keys)
+
+    @staticmethod
+    def _contracted_product_coo(storage_a, index_b, result_dimension, kept, scott_start, monitor=None,
+                                typecode='d'):
+        """Ядро contracted_product, читающее A прямо из массивов CooStorage
+
+        Строки A отсортированы, поэтому все вклады в элементы результата с общими
+        индексами A[:kept] идут подряд: суммы копятся в небольшом словаре группы
+        и сразу выгружаются в отсортированном виде в CooStorage результата.
+        Возвращает то же, что join_rows: (CooStorage, число пар).
+        """
+        dimension = len(storage_a.coords)
+        prefixes = storage_a.iter_keys(range(kept))
+        join_keys = storage_a.iter_keys(list(range(kept, dimension)) + list(range(scott_start, kept)))
+        rows_a = MunermanTensorMultiplier._monitored(
+            zip(prefixes, join_keys, storage_a.values()), len(storage_a), monitor)
+        return MunermanTensorMultiplier.join_rows(rows_a, index_b, result_dimension, kept < dimension, coo=True,
+                                                  typecode=typecode)
+
+    @staticmethod
+    def _monitored(rows, total, monitor):
+        """Обход строк A с отчётом о прогрессе (без накладных расходов, если monitor не задан)"""
+        if monitor is None:
+            return rows
+        return MunermanTensorMultiplier._iter_with_progress(rows, total, monitor)
+
+    @staticmethod
+    def _iter_with_progress(rows, total, monitor):
+        step = max(1, total // 100)
+        for row, item in enumerate(rows):
+            if row % step == 0:
+                monitor.update(row / total)
+            yield item
+        monitor.update(1.0)
+
+    @staticmethod
+    def _check_dimensions(tensor_a, tensor_b, dim_a, dim_b):
+        """Проверка размерностей тензоров для методов с фиксированной формой"""
+        if tensor_a.dimension != dim_a or tensor_b.dimension != dim_b:
+            raise ValueError(f"Ожидались тензоры {dim_a}D и {dim_b}D: "
+                             f"A={tensor_a.dimension}D, B={tensor_b.dimension}D")
+
+    @staticmethod
+    def method1_cayley_square(tensor_a, tensor_b):
+        """(0,2)-свернутое произведение для 3D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 3, 3)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 0, 2)
+
+    @staticmethod
+    def method1_cayley_4d(tensor_a, tensor_b):
+        """(0,2)-свернутое произведение для 4D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 4, 4)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 0, 2)
+
+    @staticmethod
+    def method1_cayley_3d_4d(tensor_a, tensor_b):
+        """(0,2)-свернутое произведение для 3D×4D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 3, 4)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 0, 2)
+
+    @staticmethod
+    def method1_cayley_4d_3d(tensor_a, tensor_b):
+        """(0,2)-свернутое произведение для 4D×3D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 4, 3)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 0, 2)
+
+    @staticmethod
+    def method2_cayley_square(tensor_a, tensor_b):
+        """(0,1)-свернутое произведение для 3D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 3, 3)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 0, 1)
+
+    @staticmethod
+    def method2_cayley_4d(tensor_a, tensor_b):
+        """(0,1)-свернутое произведение для 4D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 4, 4)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 0, 1)
+
+    @staticmethod
+    def method2_cayley_3d_4d(tensor_a, tensor_b):
+        """(0,1)-свернутое произведение для 3D×4D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 3, 4)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 0, 1)
+
+    @staticmethod
+    def method2_cayley_4d_3d(tensor_a, tensor_b):
+        """(0,1)-свернутое произведение для 4D×3D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 4, 3)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 0, 1)
+
+    @staticmethod
+    def method3_scott_square(tensor_a, tensor_b):
+        """(2,0)-свернутое произведение для 3D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 3, 3)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 2, 0)
+
+    @staticmethod
+    def method3_scott_4d(tensor_a, tensor_b):
+        """(2,0)-свернутое произведение для 4D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 4, 4)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 2, 0)
+
+    @staticmethod
+    def method3_scott_3d_4d(tensor_a, tensor_b):
+        """(2,0)-свернутое произведение для 3D×4D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 3, 4)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 2, 0)
+
+    @staticmethod
+    def method3_scott_4d_3d(tensor_a, tensor_b):
+        """(2,0)-свернутое произведение для 4D×3D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 4, 3)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 2, 0)
+
+    @staticmethod
+    def method4_scott_square(tensor_a, tensor_b):
+        """(1,0)-свернутое произведение для 3D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 3, 3)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 1, 0)
+
+    @staticmethod
+    def method4_scott_4d(tensor_a, tensor_b):
+        """(1,0)-свернутое произведение для 4D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 4, 4)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 1, 0)
+
+    @staticmethod
+    def method4_scott_3d_4d(tensor_a, tensor_b):
+        """(1,0)-свернутое произведение для 3D×4D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 3, 4)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 1, 0)
+
+    @staticmethod
+    def method4_scott_4d_3d(tensor_a, tensor_b):
+        """(1,0)-свернутое произведение для 4D×3D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 4, 3)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 1, 0)
+
+    @staticmethod
+    def method5_combined_square(tensor_a, tensor_b):
+        """(1,1)-свернутое произведение для 3D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 3, 3)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 1, 1)
+
+    @staticmethod
+    def method5_combined_4d(tensor_a, tensor_b):
+        """(1,1)-свернутое произведение для 4D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 4, 4)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 1, 1)
+
+    @staticmethod
+    def method5_combined_3d_4d(tensor_a, tensor_b):
+        """(1,1)-свернутое произведение для 3D×4D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 3, 4)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 1, 1)
+
+    @staticmethod
+    def method5_combined_4d_3d(tensor_a, tensor_b):
+        """(1,1)-свернутое произведение для 4D×3D тензоров"""
+        MunermanTensorMultiplier._check_dimensions(tensor_a, tensor_b, 4, 3)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, 1, 1)
+
+class ParallelTensorMultiplier:
+    """(λ,μ)-свернутое произведение в пуле процессов
+
+    A делится на части по значениям первого индекса. Этот индекс входит в индексы
+    результата, поэтому части дают непересекающиеся наборы элементов результата,
+    и частичные результаты достаточно объединить. Внутри части элементы A идут
+    в исходном порядке, так что суммы совпадают с последовательным расчётом.
+    """
+    # Тензор B и флаг отмены в процессе-исполнителе: передаются один раз при запуске процесса
+    _worker_tensor_b = None
+    _worker_cancel_event = None
+
+    @staticmethod
+    def _init_worker(tensor_b, cancel_event):
+        ParallelTensorMultiplier._worker_tensor_b = tensor_b
+        ParallelTensorMultiplier._worker_cancel_event = cancel_event
+
+    @staticmethod
+    def _multiply_part(part_a, scott, cayley):
+        tensor_b = ParallelTensorMultiplier._worker_tensor_b
+        monitor = ProgressMonitor(cancel_event=ParallelTensorMultiplier._worker_cancel_event)
+        result = MunermanTensorMultiplier.contracted_product(part_a, tensor_b, scott, cayley, monitor)
+        return result.data, result.pairs
+
+    @staticmethod
+    def split_by_leading_index(tensor, parts):
+        """Делим тензор не более чем на parts частей с непересекающимися значениями первого индекса"""
+        if isinstance(tensor.data, CooStorage):
+            # Строки COO отсортированы: одинаковые первые индексы идут подряд
+            coords, _ = tensor.data.columns()
+            first = coords[0]
+            bounds = [0]
+            target = len(first) / parts
+            while bounds[-1] < len(first) and len(bounds) <= parts:
+                # Граница части не должна разрывать группу с одинаковым первым индексом
+                stop = max(bounds[-1] + 1, round(len(bounds) * target))
+                stop = bisect.bisect_right(first, first[stop - 1], lo=bounds[-1])
+                bounds.append(stop)
+            bounds[-1] = len(first)
+            return [Tensor(tensor.dimension, tensor.data.slice_rows(start, stop))
+                    for start, stop in zip(bounds, bounds[1:]) if stop > start]
+
+        groups = {}
+        for key, value in tensor.data.items():
+            groups.setdefault(key[0], []).append((key, value))
+
+        result, current = [], {}
+        target = len(tensor.data) / parts
+        for first in sorted(groups):
+            current.update(groups[first])
+            if len(current) >= target and len(result) < parts - 1:
+                result.append(Tensor(tensor.dimension, current))
+                current = {}
+        if current:
+            result.append(Tensor(tensor.dimension, current))
+        return result
+
+    @staticmethod
+    def contracted_product(tensor_a, tensor_b, scott, cayley, workers, monitor=None):
+        """(λ,μ)-свернутое произведение, распределённое по workers процессам
+
+        Прогресс в monitor - доля готовых частей A; при отмене процессы-исполнители
+        прекращают расчёт своих частей, а ещё не начатые части снимаются с очереди.
+        """
+        MunermanTensorMultiplier.check_signature(tensor_a, tensor_b, scott, cayley)
+        # Если все индексы A кэлиевы, делить A по результату нельзя - считаем последовательно
+        if workers <= 1 or tensor_a.dimension == cayley or tensor_a.nnz() < 2:
+            return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, scott, cayley, monitor)
+
+        # Частей больше, чем процессов, чтобы выровнять нагрузку
+        parts = ParallelTensorMultiplier.split_by_leading_index(tensor_a, workers * 4)
+        result_dimension = tensor_a.dimension + tensor_b.dimension - scott - 2 * cayley
+        dtype = Tensor.promote(tensor_a.dtype, tensor_b.dtype)
+
+        cancel_event = multiprocessing.Event()
+        with ProcessPoolExecutor(max_workers=min(workers, len(parts)),
+                                 initializer=ParallelTensorMultiplier._init_worker,
+                                 initargs=(tensor_b, cancel_event)) as executor:
+            futures = [executor.submit(ParallelTensorMultiplier._multiply_part, part, scott, cayley)
+                       for part in parts]
+
+            pending = set(futures)
+            while pending:
+                _, pending = wait(pending, timeout=0.1)
+                if monitor is None:
+                    continue
+                try:
+                    monitor.update(1 - len(pending) / len(futures))
+                except MultiplicationCancelled:
+                    cancel_event.set()
+                    for future in pending:
+                        future.cancel()
+                    raise
+
+            if isinstance(tensor_a.data, CooStorage):
+                result_data = CooStorage(result_dimension, typecode=Tensor.DTYPES[dtype])
+                merge = result_data.extend
+            else:
+                result_data = {}
+                merge = result_data.update
+            pairs = 0
+            for future in futures:
+                part_data, part_pairs = future.result()
+                merge(part_data)
+                pairs += part_pairs
+
+        result = Tensor(result_dimension, result_data, dtype=dtype)
+        result.accumulation_dtype = MunermanTensorMultiplier.accumulation_dtype(dtype)
+        result.pairs = pairs
+        return result
+
+class BlockedTensorMultiplier:
+    """Блочное умножение с выгрузкой на диск для результатов, которые не помещаются в память
+
+    Строки A (отсортированные, как в CooStorage) делятся на блоки по границам
+    индексов A[:kept]: блоки с разными A[:kept] дают непересекающиеся части результата,
+    идущие по возрастанию индексов. Блоки подбираются так, чтобы оценка числа элементов
+    результата блока укладывалась в memory_budget; готовый блок сразу дописывается
+    на диск (по временному файлу на столбец), а в конце столбцы собираются в файл
+    тензора (TensorFile), который открывается через отображение в память.
+
+    В память при этом должны помещаться только A, B и один блок результата.
+    """
+    DEFAULT_MEMORY_BUDGET = 1 << 30
+
+    @staticmethod
+    def contracted_product(tensor_a, tensor_b, scott, cayley, memory_budget=None, path=None, monitor=None):
+        """(λ,μ)-свернутое произведение с результатом на диске
+
+        Args:
+            memory_budget: байт на блок результата (по умолчанию DEFAULT_MEMORY_BUDGET)
+            path: файл для результата; по умолчанию - временный файл, который удаляется
+                сразу после отображения в память
+            monitor: ProgressMonitor - прогресс и отмена проверяются между блоками
+        """
+        MunermanTensorMultiplier.check_signature(tensor_a, tensor_b, scott, cayley)
+        if memory_budget is None:
+            memory_budget = BlockedTensorMultiplier.DEFAULT_MEMORY_BUDGET
+        if monitor is None:
+            monitor = ProgressMonitor()
+        dim_a, dim_b = tensor_a.dimension, tensor_b.dimension
+        kept = dim_a - cayley
+        scott_start = dim_a - scott - cayley
+        result_dimension = dim_a + dim_b - scott - 2 * cayley
+        index_b = tensor_b.get_leading_index(scott + cayley)
+        dtype = Tensor.promote(tensor_a.dtype, tensor_b.dtype)
+        typecode = Tensor.DTYPES[dtype]
+
+        storage_a = tensor_a.data
+        if not isinstance(storage_a, CooStorage):
+            storage_a = CooStorage.from_items(dim_a, storage_a.items(), Tensor.DTYPES[tensor_a.dtype])
+        # Элемент результата в CooStorage - индексы int64 и значение
+        max_rows = max(1, memory_budget // (8 * result_dimension + array(typecode).itemsize))
+        # При свёртке элементов результата группы A[:kept] не больше, чем строк у B
+        unit_limit = len(tensor_b.data) if cayley else None
+        blocks = BlockedTensorMultiplier.plan_blocks(storage_a, index_b, kept, scott_start, max_rows, unit_limit)
+
+        directory = os.path.dirname(os.path.abspath(path)) if path is not None else None
+        spill = [tempfile.TemporaryFile(dir=directory) for _ in range(result_dimension + 1)]
+        shape = [0] * result_dimension
+        count = pairs = 0
+        try:
+            total = max(len(storage_a), 1)
+            for start, stop in blocks:
+                monitor.update(start / total)
+                block, block_pairs = MunermanTensorMultiplier._contracted_product_coo(
+                    storage_a.slice_rows(start, stop), index_b, result_dimension, kept, scott_start,
+                    typecode=typecode)
+                pairs += block_pairs
+                coords, values = block.columns()
+                for axis, column in enumerate(coords):
+                    if column:
+                        shape[axis] = max(shape[axis], max(column) + 1)
+                    spill[axis].write(TensorFile._little_endian(column, 'q'))
+                spill[-1].write(TensorFile._little_endian(values, typecode))
+                count += len(values)
+                del block, coords, values
+            monitor.update(1.0)
+
+            if path is None:
+                handle, target = tempfile.mkstemp(suffix=TensorFile.EXTENSION)
+                os.close(handle)
+            else:
+                target = path
+            with open(target, 'wb') as file:
+                file.write(TensorFile.header(TensorFile.LAYOUT_SPARSE, typecode, result_dimension, count, shape))
+                for part in spill:
+                    part.seek(0)
+                    shutil.copyfileobj(part, file, 1 << 20)
+        finally:
+            for part in spill:
+                part.close()
+
+        result = TensorFile.load(target)
+        result.accumulation_dtype = MunermanTensorMultiplier.accumulation_dtype(dtype)
+        result.pairs = pairs
+        if path is None:
+            try:
+                os.remove(target)
+            except OSError:
+                pass  # Windows не даёт удалить отображённый файл - он останется во временном каталоге
+        return result
+
+    @staticmethod
+    def plan_blocks(storage_a, index_b, kept, scott_start, max_rows, unit_limit=None):
+        """Разбиение строк A на блоки [start, stop) с оценкой результата не более max_rows элементов
+
+        Оценка для группы строк с общими A[:kept] - число перемножаемых пар (не больше unit_limit);
+        группа, которая одна превышает max_rows, становится отдельным блоком.
+        """
+        group_sizes = {key: len(rows) for key, rows in index_b.items()}
+        dimension = len(storage_a.coords)
+        prefixes = storage_a.iter_keys(range(kept))
+        join_keys = storage_a.iter_keys(list(range(kept, dimension)) + list(range(scott_start, kept)))
+
+        blocks = []
+        block_start, block_rows = 0, 0
+        unit_start, unit_rows = 0, 0
+        previous = None
+        for row, (prefix, join_key) in enumerate(zip(prefixes, join_keys)):
+            if prefix != previous:
+                # Закончилась группа строк с общими A[:kept] - здесь можно разрезать
+                if unit_limit is not None:
+                    unit_rows = min(unit_rows, unit_limit)
+                if block_rows and block_rows + unit_rows > max_rows:
+                    blocks.append((block_start, unit_start))
+                    block_start, block_rows = unit_start, 0
+                block_rows += unit_rows
+                unit_start, unit_rows, previous = row, 0, prefix
+            unit_rows += group_sizes.get(join_key, 0)
+
+        if unit_limit is not None:
+            unit_rows = min(unit_rows, unit_limit)
+        if block_rows and block_rows + unit_rows > max_rows:
+            blocks.append((block_start, unit_start))
+            block_start = unit_start
+        blocks.append((block_start, len(storage_a)))
+        return blocks
+
+class DenseTensorMultiplier:
+    """Векторизованные версии методов Мунермана для плотных массивов numpy
+
+    A имеет вид (свободные, скоттовы, кэлиевы), B - (кэлиевы, скоттовы, свободные),
+    поэтому каждый метод работает одинаково для 3D и 4D тензоров.
+    """
+
+    @staticmethod
+    def _crop(array_a, array_b, scott, cayley):
+        """Обрезаем скоттовы и кэлиевы оси A и B до общего диапазона индексов"""
+        slices_a = [slice(None)] * array_a.ndim
+        slices_b = [slice(None)] * array_b.ndim
+        joined = scott + cayley
+        for k in range(joined):
+            # Ось A и соответствующая ей ось B: кэлиевы идут в B первыми, скоттовы - за ними
+            axis_a = array_a.ndim - joined + k
+            axis_b = k - scott if k >= scott else cayley + k
+            size = min(array_a.shape[axis_a], array_b.shape[axis_b])
+            slices_a[axis_a] = slice(0, size)
+            slices_b[axis_b] = slice(0, size)
+        return array_a[tuple(slices_a)], array_b[tuple(slices_b)]
+
+    @staticmethod
+    def method1_cayley(array_a, array_b):
+        """(0,2)-свернутое произведение: свертка последних двух осей A с первыми двумя осями B"""
+        a, b = DenseTensorMultiplier._crop(array_a, array_b, 0, 2)
+        return np.tensordot(a, b, axes=([-2, -1], [0, 1]))
+
+    @staticmethod
+    def method2_cayley(array_a, array_b):
+        """(0,1)-свернутое произведение: свертка последней оси A с первой осью B"""
+        a, b = DenseTensorMultiplier._crop(array_a, array_b, 0, 1)
+        return np.tensordot(a, b, axes=([-1], [0]))
+
+    @staticmethod
+    def method3_scott(array_a, array_b):
+        """(2,0)-свернутое произведение: поэлементное произведение по двум скоттовым осям"""
+        a, b = DenseTensorMultiplier._crop(array_a, array_b, 2, 0)
+        # Добавляем A единичные оси под свободные индексы B и перемножаем с broadcasting
+        return a.reshape(a.shape + (1,) * (b.ndim - 2)) * b
+
+    @staticmethod
+    def method4_scott(array_a, array_b):
+        """(1,0)-свернутое произведение: поэлементное произведение по одной скоттовой оси"""
+        a, b = DenseTensorMultiplier._crop(array_a, array_b, 1, 0)
+        return a.reshape(a.shape + (1,) * (b.ndim - 1)) * b
+
+    @staticmethod
+    def method5_combined(array_a, array_b):
+        """(1,1)-свернутое произведение: скоттова ось сохраняется, кэлиева суммируется"""
+        a, b = DenseTensorMultiplier._crop(array_a, array_b, 1, 1)
+        # Оси: 0 - скоттова, 1 - кэлиева, 2.. - свободные оси B
+        free_b = list(range(2, b.ndim))
+        return np.einsum(a, [Ellipsis, 0, 1], b, [1, 0] + free_b, [Ellipsis, 0] + free_b, optimize=True)
+
+    @staticmethod
+    def batched(array_a, stacked_b, scott, cayley):
+        """(λ,μ)-свернутое произведение A на стопку B одной формы (ось 0 - номер B) одним einsum"""
+        a, b = DenseTensorMultiplier._crop(array_a, stacked_b[0], scott, cayley)
+        stacked_b = stacked_b[(slice(None),) + tuple(slice(0, size) for size in b.shape)]
+        joined = scott + cayley
+        # Оси einsum: 0 - номер B, затем свободные A, скоттовы, кэлиевы, свободные B
+        labels = iter(range(1, a.ndim + b.ndim - joined + 1))
+        free_a = [next(labels) for _ in range(a.ndim - joined)]
+        scott_axes = [next(labels) for _ in range(scott)]
+        cayley_axes = [next(labels) for _ in range(cayley)]
+        free_b = [next(labels) for _ in range(b.ndim - joined)]
+        return np.einsum(a, free_a + scott_axes + cayley_axes,
+                         stacked_b, [0] + cayley_axes + scott_axes + free_b,
+                         [0] + free_a + scott_axes + free_b, optimize=True)
+
+class BatchTensorMultiplier:
+    """Произведения одного A на много B одним методом
+
+    A готовится один раз: для разреженного режима - строки, уже разобранные на
+    индексы результата и ключ стыковки (MunermanTensorMultiplier.split_rows),
+    для плотного - массив numpy. Подряд идущие B одной формы в плотном режиме
+    складываются в стопку и умножаются одной операцией einsum.
+    """
+    # Предел памяти под стопку результатов плотного режима
+    STACK_BYTES = 256 << 20
+
+    def __init__(self, tensor_a, method, backend="sparse"):
+        if method not in MunermanTensorMultiplier.METHOD_SIGNATURES:
+            raise ValueError(f"Неизвестный метод: {method}")
+        if backend not in ("sparse", "dense"):
+            raise ValueError(f"Пакетное умножение поддерживает режимы 'sparse' и 'dense', а не {backend}")
+        if backend == "dense" and np is None:
+            raise ImportError("Для плотного режима требуется пакет numpy")
+
+        self.tensor_a = tensor_a
+        self.method = method
+        self.backend = backend
+        self.scott, self.cayley = MunermanTensorMultiplier.METHOD_SIGNATURES[method]
+        if backend == "dense":
+            self.array_a = tensor_a.to_array()
+        else:
+            self.rows_a = MunermanTensorMultiplier.split_rows(tensor_a, self.scott, self.cayley)
+
+    def multiply(self, tensor_b):
+        """Произведение подготовленного A на один B"""
+        return next(self.iter_products([tensor_b]))
+
+    def iter_products(self, tensors_b, monitor=None):
+        """Произведения A на каждый B по порядку; результаты выдаются по мере готовности
+
+        monitor (ProgressMonitor) получает долю обработанных B и может прервать расчёт.
+        """
+        tensors_b = list(tensors_b)
+        if monitor is None:
+            monitor = ProgressMonitor()
+        monitor.update(0.0)
+        done = 0
+        for group in self._groups(tensors_b):
+            for tensor_b in group:
+                MunermanTensorMultiplier.check_signature(self.tensor_a, tensor_b, self.scott, self.cayley)
+            results = self._dense_group(group) if self.backend == "dense" else map(self._sparse_product, group)
+            for result in results:
+                done += 1
+                monitor.update(done / len(tensors_b))
+                yield result
+
+    def _groups(self, tensors_b):
+        """Подряд идущие B одной формы (для плотного режима - в пределах STACK_BYTES)"""
+        if self.backend != "dense":
+            for tensor_b in tensors_b:
+                yield [tensor_b]
+            return
+
+        # Пустые тензоры формы не имеют: как в to_array, у них нулевые оси
+        shape_a = self.tensor_a.get_shape() or (0,) * self.tensor_a.dimension
+        group, shape, limit = [], None, 1
+        for tensor_b in tensors_b:
+            shape_b = tensor_b.get_shape() or (0,) * tensor_b.dimension
+            if group and (shape_b != shape or len(group) >= limit):
+                yield group
+                group = []
+            if not group:
+                shape = shape_b
+                result_size, _ = CostModel.dense_sizes(shape_a, shape, self.scott, self.cayley)
+                limit = max(1, self.STACK_BYTES // max(1, 8 * result_size))
+            group.append(tensor_b)
+        if group:
+            yield group
+
+    def _sparse_product(self, tensor_b):
+        joined = self.scott + self.cayley
+        result_dimension = self.tensor_a.dimension + tensor_b.dimension - self.scott - 2 * self.cayley
+        dtype = Tensor.promote(self.tensor_a.dtype, tensor_b.dtype)
+        data, pairs = MunermanTensorMultiplier.join_rows(self.rows_a, tensor_b.get_leading_index(joined),
+                                                         result_dimension, self.cayley > 0,
+                                                         coo=isinstance(self.tensor_a.data, CooStorage),
+                                                         typecode=Tensor.DTYPES[dtype])
+        result = Tensor(result_dimension, data, dtype=dtype)
+        result.accumulation_dtype = MunermanTensorMultiplier.accumulation_dtype(dtype)
+        result.pairs = pairs
+        return result
+
+    def _dense_group(self, group):
+        stacked = np.stack([tensor_b.to_array() for tensor_b in group])
+        products = DenseTensorMultiplier.batched(self.array_a, stacked, self.scott, self.cayley)
+        results = [Tensor.from_array(np.asarray(product, order='C')) for product in products]
+        for result in results:
+            result.accumulation_dtype = result.dtype   # einsum считает в типе результата
+        return results
+
+class CostModel:
+    """Оценка времени и памяти произведения для каждого режима и выбор самого быстрого
+
+    Время ядра - линейная функция двух величин работы (см. _work), например
+    k1 * (перемноженные пары) + k2 * (строки A + элементы результата) для разреженных
+    ядер. Коэффициенты по умолчанию сняты прогоном
+    benchmark.py --sizes 4 7 --densities 1 0.2 --backends sparse dense blocked --storages dict coo;
+    from_benchmark подбирает их по своему отчёту (наименьшие относительные квадраты).
+
+    Ядра: 'dict' - хэш-соединение по словарям, 'coo' - ядро по массивам CooStorage,
+    'dense' - векторизованно через numpy, 'blocked' - по блокам с результатом на диске.
+    """
+    KERNEL_NAMES = {
+        'dict': "разреженный (словари)",
+        'coo': "разреженный (массивы COO)",
+        'dense': "плотный (numpy)",
+        'blocked': "блочный (результат на диске)",
+    }
+    DEFAULT_COEFFICIENTS = {
+        'dict': (3.5e-7, 5.3e-7),
+        'coo': (1.5e-7, 2.1e-6),
+        'dense': (2.0e-9, 3.9e-7),
+        'blocked': (2.2e-7, 3.2e-6),
+    }
+    # Перевод A в другое хранилище, секунд на элемент
+    CONVERSION_COST = 1.0e-6
+
+    def __init__(self, coefficients=None):
+        self.coefficients = dict(self.DEFAULT_COEFFICIENTS)
+        if coefficients:
+            self.coefficients.update(coefficients)
+
+    @staticmethod
+    def estimate(tensor_a, tensor_b, method):
+        """Характеристики произведения: число элементов, плотности, формы и размер результата"""
+        scott, cayley = MunermanTensorMultiplier.METHOD_SIGNATURES[method]
+        MunermanTensorMultiplier.check_signature(tensor_a, tensor_b, scott, cayley)
+        shape_a = tensor_a.get_shape() or (0,) * tensor_a.dimension
+        shape_b = tensor_b.get_shape() or (0,) * tensor_b.dimension
+        size_a, size_b = math.prod(shape_a), math.prod(shape_b)
+        dense_result_size, dense_ops = CostModel.dense_sizes(shape_a, shape_b, scott, cayley)
+
+        nnz_a, nnz_b = tensor_a.nnz(), tensor_b.nnz()
+        pairs = MunermanTensorMultiplier.count_pairs(tensor_a, tensor_b, scott, cayley)
+        return {
+            'nnz_a': nnz_a,
+            'nnz_b': nnz_b,
+            'size_a': size_a,
+            'size_b': size_b,
+            'density_a': nnz_a / size_a if size_a else 0.0,
+            'density_b': nnz_b / size_b if size_b else 0.0,
+            'pairs': pairs,
+            # Без свёртки каждая пара - отдельный элемент результата
+            'result_nnz': pairs if cayley == 0 else min(pairs, dense_result_size),
+            'result_dimension': tensor_a.dimension + tensor_b.dimension - scott - 2 * cayley,
+            'dense_ops': dense_ops,
+            'dense_result_size': dense_result_size,
+        }
+
+    @staticmethod
+    def dense_sizes(shape_a, shape_b, scott, cayley):
+        """Число элементов плотного результата и умножений плотного расчёта
+
+        Плотный расчёт идёт по общему диапазону скоттовых и кэлиевых осей (см. DenseTensorMultiplier._crop).
+        """
+        joined = scott + cayley
+        kept = len(shape_a) - cayley
+        scott_start = kept - scott
+        scott_size = math.prod(min(a, b) for a, b in zip(shape_a[scott_start:kept], shape_b[cayley:joined]))
+        cayley_size = math.prod(min(a, b) for a, b in zip(shape_a[kept:], shape_b[:cayley]))
+        result_size = math.prod(shape_a[:scott_start]) * scott_size * math.prod(shape_b[joined:])
+        return result_size, result_size * cayley_size
+
+    @staticmethod
+    def _work(kernel, features):
+        """Две величины работы ядра, которым пропорционально время"""
+        if kernel == 'dense':
+            return (features['dense_ops'],
+                    features['size_a'] + features['size_b'] + features['dense_result_size'])
+        return features['pairs'], features['nnz_a'] + features['result_nnz']
+
+    @staticmethod
+    def memory(kernel, features):
+        """Оценка памяти под результат (и плотные копии входов) в байтах"""
+        dimension = features['result_dimension']
+        if kernel == 'coo':
+            return features['result_nnz'] * 8 * (dimension + 1)
+        if kernel == 'dense':
+            # Плотные массивы входов и результата плюс словарь со всеми элементами результата
+            arrays = 8 * (features['size_a'] + features['size_b'] + features['dense_result_size'])
+            return arrays + features['dense_result_size'] * (100 + 8 * dimension)
+        if kernel == 'blocked':
+            return 0
+        return features['result_nnz'] * (100 + 8 * dimension)
+
+    def predict(self, kernel, features, storage_a=None):
+        """Прогноз времени ядра в секундах (с переводом A в нужное хранилище)"""
+        k1, k2 = self.coefficients[kernel]
+        x1, x2 = self._work(kernel, features)
+        seconds = k1 * x1 + k2 * x2
+        if (kernel == 'coo') != (storage_a == 'coo') and kernel in ('dict', 'coo'):
+            seconds += self.CONVERSION_COST * features['nnz_a']
+        return seconds
+
+    def choose(self, features, storage_a="dict", memory_limit=None):
+        """Самое быстрое ядро, результат которого помещается в memory_limit
+
+        Returns:
+            (ядро, прогноз времени, словарь ядро -> прогноз для всех подходящих ядер)
+        """
+        if memory_limit is None:
+            memory_limit = self.default_memory_limit()
+        candidates = {}
+        for kernel in self.coefficients:
+            if kernel == 'dense' and np is None:
+                continue
+            if self.memory(kernel, features) > memory_limit:
+                continue
+            candidates[kernel] = self.predict(kernel, features, storage_a)
+        kernel = min(candidates, key=candidates.get)
+        return kernel, candidates[kernel], candidates
+
+    @staticmethod
+    def default_memory_limit():
+        """Половина физической памяти (если ОС её сообщает), иначе 1 ГБ"""
+        try:
+            return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 2
+        except (AttributeError, ValueError, OSError):
+            return 1 << 30
+
+    @staticmethod
+    def kernel_of(backend, storage):
+        """Ядро, которым считался случай замера (None - не моделируется)"""
+        if backend == 'sparse':
+            return 'coo' if storage == 'coo' else 'dict'
+        if backend in ('dense', 'blocked'):
+            return backend
+        return None
+
+    @classmethod
+    def from_benchmark(cls, path):
+        """Модель с коэффициентами, подобранными по JSON-отчёту benchmark.py
+
+        Учитываются однопроцессные случаи с характеристиками (поле features);
+        для ядер без замеров остаются коэффициенты по умолчанию.
+        """
+        with open(path, encoding='utf-8') as file:
+            report = json.load(file)
+        rows = {}
+        for case in report.get('cases', []):
+            features = case.get('features')
+            kernel = cls.kernel_of(case.get('backend'), case.get('storage'))
+            if not features or kernel is None or case.get('workers', 1) != 1 or case['best'] <= 0:
+                continue
+            rows.setdefault(kernel, []).append((cls._work(kernel, features), case['best']))
+
+        coefficients = {}
+        for kernel, kernel_rows in rows.items():
+            fitted = cls._fit(kernel_rows)
+            if fitted is not None:
+                coefficients[kernel] = fitted
+        return cls(coefficients)
+
+    @staticmethod
+    def _fit(rows):
+        """Неотрицательные k1, k2 с минимальной относительной ошибкой k1*x1 + k2*x2 ≈ t"""
+        scaled = [(x1 / seconds, x2 / seconds) for (x1, x2), seconds in rows]
+        suu = sum(u * u for u, _ in scaled)
+        svv = sum(v * v for _, v in scaled)
+        suv = sum(u * v for u, v in scaled)
+        su = sum(u for u, _ in scaled)
+        sv = sum(v for _, v in scaled)
+
+        determinant = suu * svv - suv * suv
+        if determinant > 1e-12 * suu * svv:
+            k1 = (su * svv - sv * suv) / determinant
+            k2 = (sv * suu - su * suv) / determinant
+            if k1 >= 0 and k2 >= 0:
+                return k1, k2
+        # Два коэффициента не различить - оставляем тот, что лучше описывает замеры
+        options = []
+        if suu > 0:
+            options.append((su / suu, 0.0))
+        if svv > 0:
+            options.append((0.0, sv / svv))
+        if not options:
+            return None
+        return min(options, key=lambda k: sum((k[0] * u + k[1] * v - 1) ** 2 for u, v in scaled))
+
+class ContractionChain:
+    """Цепочка свернутых произведений ((T0 ∘m1 T1) ∘m2 T2) ... с выбором порядка вычисления
+
+    Порядок допустим, если он даёт тот же результат, что и вычисление слева направо.
+    Это проверяется символически (см. _combine): для каждого порядка отслеживается,
+    какие исходные индексы свёрнуты (кэлиевы), какие объединены (скоттовы) и в каком
+    порядке идут индексы результата. Стоимость порядков оценивается по формам и
+    плотностям (динамика по отрезкам цепочки), промежуточные результаты
+    освобождаются сразу после использования.
+    """
+
+    def __init__(self, tensors, methods):
+        if len(tensors) < 2 or len(methods) != len(tensors) - 1:
+            raise ValueError("Цепочке нужно не менее двух тензоров и на один метод меньше, чем тензоров")
+        for method in methods:
+            if method not in MunermanTensorMultiplier.METHOD_SIGNATURES:
+                raise ValueError(f"Неизвестный метод: {method}")
+        self.tensors = list(tensors)
+        self.methods = list(methods)
+
+    @staticmethod
+    def _combine(signature_a, signature_b, method):
+        """Символическое произведение: индексы результата и множество свёрток
+
+        Индекс - frozenset исходных индексов (номер тензора, ось), которые он объединяет.
+        Возвращает None, если у множителей не хватает индексов для метода.
+        """
+        (labels_a, sums_a), (labels_b, sums_b) = signature_a, signature_b
+        scott, cayley = MunermanTensorMultiplier.METHOD_SIGNATURES[method]
+        joined = scott + cayley
+        if len(labels_a) < joined or len(labels_b) < joined:
+            return None
+        kept = len(labels_a) - cayley
+        scott_start = kept - scott
+        merged = tuple(labels_a[scott_start + t] | labels_b[cayley + t] for t in range(scott))
+        summed = frozenset(labels_a[kept + t] | labels_b[t] for t in range(cayley))
+        return labels_a[:scott_start] + merged + labels_b[joined:], sums_a | sums_b | summed
+
+    def _leaf_signature(self, position):
+        labels = tuple(frozenset({(position, axis)}) for axis in range(self.tensors[position].dimension))
+        return labels, frozenset()
+
+    @staticmethod
+    def estimate_product(shape_a, density_a, shape_b, density_b, method):
+        """Форма, плотность и оценка работы произведения по формам и плотностям множителей"""
+        scott, cayley = MunermanTensorMultiplier.METHOD_SIGNATURES[method]
+        joined = scott + cayley
+        kept = len(shape_a) - cayley
+        scott_start = kept - scott
+        dense_result_size, dense_ops = CostModel.dense_sizes(shape_a, shape_b, scott, cayley)
+        shape = (tuple(shape_a[:scott_start])
+                 + tuple(min(a, b) for a, b in zip(shape_a[scott_start:kept], shape_b[cayley:joined]))
+                 + tuple(shape_b[joined:]))
+
+        # Элементы считаем независимыми: пара совпадает с вероятностью density_a * density_b
+        pair_density = density_a * density_b
+        cayley_size = dense_ops // dense_result_size if dense_result_size else 0
+        density = 1 - (1 - pair_density) ** cayley_size if cayley_size else 0.0
+        size_a, size_b = math.prod(shape_a), math.prod(shape_b)
+        features = {
+            'nnz_a': size_a * density_a,
+            'nnz_b': size_b * density_b,
+            'size_a': size_a,
+            'size_b': size_b,
+            'pairs': dense_ops * pair_density,
+            'result_nnz': dense_result_size * density,
+            'result_dimension': len(shape),
+            'dense_ops': dense_ops,
+            'dense_result_size': dense_result_size,
+        }
+        return shape, density, features
+
+    def plan(self, backend="sparse", cost_model=None):
+        """Самый дешёвый допустимый порядок вычисления
+
+        Returns:
+            (дерево, прогноз времени в секундах); дерево - номер тензора или
+            (левое поддерево, метод, правое поддерево)
+        """
+        model = cost_model if cost_model is not None else TensorOperations.cost_model
+        count = len(self.tensors)
+
+        # Результат, который должен получиться: вычисление слева направо
+        target = self._leaf_signature(0)
+        for position, method in enumerate(self.methods, 1):
+            target = self._combine(target, self._leaf_signature(position), method)
+            if target is None:
+                raise ValueError(f"Цепочку нельзя вычислить: для метода {method} не хватает индексов")
+
+        # best[i, j] - для произведения T[i..j]: сигнатура -> (стоимость, дерево, форма, плотность).
+        # Разные порядки одного отрезка могут давать разные тензоры, поэтому храним лучший для каждого
+        best = {}
+        for i in range(count):
+            best[i, i] = {self._leaf_signature(i): (0.0, i) + self._leaf(i)}
+
+        for length in range(2, count + 1):
+            for i in range(count - length + 1):
+                j = i + length - 1
+                options = {}
+                for k in range(i, j):
+                    method = self.methods[k]
+                    for signature_left, (cost_left, tree_left, shape_left, density_left) in best[i, k].items():
+                        for signature_right, (cost_right, tree_right, shape_right,
+                                              density_right) in best[k + 1, j].items():
+                            signature = self._combine(signature_left, signature_right, method)
+                            if signature is None:
+                                continue
+                            shape, density, features = self.estimate_product(shape_left, density_left, shape_right,
+                                                                              density_right, method)
+                            cost = cost_left + cost_right + self._predict(model, backend, features)
+                            if signature not in options or cost < options[signature][0]:
+                                options[signature] = (cost, (tree_left, method, tree_right), shape, density)
+                best[i, j] = options
+
+        cost, tree, _, _ = best[0, count - 1][target]
+        return tree, cost
+
+    def cost(self, tree, backend="sparse", cost_model=None):
+        """Прогноз времени вычисления цепочки по заданному дереву"""
+        model = cost_model if cost_model is not None else TensorOperations.cost_model
+
+        def estimate(node):
+            if isinstance(node, int):
+                return (0.0,) + self._leaf(node)
+            left, method, right = node
+            cost_left, shape_left, density_left = estimate(left)
+            cost_right, shape_right, density_right = estimate(right)
+            shape, density, features = self.estimate_product(shape_left, density_left, shape_right,
+                                                              density_right, method)
+            return cost_left + cost_right + self._predict(model, backend, features), shape, density
+
+        return estimate(tree)[0]
+
+    def _leaf(self, position):
+        """Форма и плотность исходного тензора цепочки"""
+        tensor = self.tensors[position]
+        shape = tensor.get_shape() or (0,) * tensor.dimension
+        size = math.prod(shape)
+        return shape, tensor.nnz() / size if size else 0.0
+
+    @staticmethod
+    def _predict(model, backend, features):
+        """Прогноз одного произведения: для 'auto' - по самому быстрому ядру"""
+        kernels = {"sparse": ('dict',), "dense": ('dense',), "blocked": ('blocked',)}.get(
+            backend, tuple(model.coefficients))
+        return min(model.predict(kernel, features) for kernel in kernels)
+
+    def left_to_right(self):
+        """Дерево порядка 'как записано': ((T0 ∘ T1) ∘ T2) ..."""
+        tree = 0
+        for position, method in enumerate(self.methods, 1):
+            tree = (tree, method, position)
+        return tree
+
+    @staticmethod
+    def describe(tree, names=None):
+        """Запись порядка со скобками, например ((A ∘1 B) ∘5 (C ∘2 D))"""
+        if isinstance(tree, int):
+            return names[tree] if names else f"T{tree + 1}"
+        left, method, right = tree
+        return f"({ContractionChain.describe(left, names)} ∘{method} {ContractionChain.describe(right, names)})"
+
+    def execute(self, tree=None, **options):
+        """Вычисление цепочки по дереву (по умолчанию - по plan()); options передаются в multiply_tensors"""
+        if tree is None:
+            tree, _ = self.plan(options.get('backend', "sparse"))
+        return self._evaluate(tree, options)
+
+    def _evaluate(self, tree, options):
+        if isinstance(tree, int):
+            return self.tensors[tree]
+        left, method, right = tree
+        tensor_a = self._evaluate(left, options)
+        tensor_b = self._evaluate(right, options)
+        dim_type = TensorOperations.get_dimension_type(tensor_a, tensor_b)
+        # Промежуточные множители не хранятся: после возврата на них нет ссылок
+        return TensorOperations.multiply_tensors(tensor_a, tensor_b, method, dim_type, **options)
+
+class ResultCache:
+    """LRU-кэш результатов умножения по содержимому входных тензоров
+
+    Ключ - хэши содержимого A и B (Tensor.content_hash), номер метода, тип размерности
+    и режим вычислений: режимы дают результат в разном виде (например, плотный хранит
+    и нулевые элементы), поэтому результат одного режима не отдаётся другому.
+    Результаты в памяти ограничены суммарной оценкой max_bytes (Tensor.memory_size):
+    при переполнении вытесняются давно не использованные. Если задан каталог directory,
+    результаты ещё и сохраняются туда файлами тензоров (TensorFile) - этот уровень
+    переживает перезапуск приложения и ограничен max_disk_bytes.
+
+    Тензоры из кэша общие для всех, кто их получил: изменять их нельзя.
+    Методы можно вызывать из разных потоков.
+    """
+    DEFAULT_MAX_BYTES = 256 << 20
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=None, max_disk_bytes=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # ключ -> (тензор, оценка размера)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(tensor_a, tensor_b, method, dimension_type, backend="sparse"):
+        return f"{tensor_a.content_hash()}-{tensor_b.content_hash()}-m{method}-{dimension_type}-{backend}"
+
+    def get(self, key):
+        """Результат по ключу или None; найденный на диске результат открывается через mmap"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+
+        path = self._disk_path(key)
+        if path is not None and os.path.exists(path):
+            try:
+                tensor = TensorFile.load(path)
+                os.utime(path)
+            except (OSError, ValueError):
+                tensor = None   # повреждённый файл считаем промахом, он перезапишется
+            if tensor is not None:
+                self._remember(key, tensor)
+                with self._lock:
+                    self.hits += 1
+                return tensor
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, tensor, persist=True):
+        """Сохранение результата в памяти и (если задан каталог и persist) на диске"""
+        self._remember(key, tensor)
+        path = self._disk_path(key)
+        if path is not None and persist:
+            os.makedirs(self.directory, exist_ok=True)
+            # Пишем во временный файл и переименовываем, чтобы не оставить недописанный результат
+            TensorFile.save(tensor, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            self._trim_disk()
+
+    def discard(self, key):
+        """Удаление результата из обоих уровней кэша"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= entry[1]
+        path = self._disk_path(key)
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+    def clear(self):
+        """Очистка кэша в памяти (файлы на диске остаются)"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remember(self, key, tensor):
+        size = tensor.memory_size()
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (tensor, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def _disk_path(self, key):
+        if self.directory is None:
+            return None
+        return os.path.join(self.directory, key + TensorFile.EXTENSION)
+
+    def _trim_disk(self):
+        """Удаление самых старых файлов кэша сверх max_disk_bytes"""
+        if self.max_disk_bytes is None:
+            return
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(TensorFile.EXTENSION):
+                status = os.stat(os.path.join(self.directory, name))
+                files.append((status.st_mtime, status.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue   # файл ещё отображён в память (Windows)
+            total -= size
+
+class TensorOperations:
+    # Модель стоимости для backend='auto' (можно заменить откалиброванной, см. CostModel.from_benchmark)
+    cost_model = CostModel()
+
+    @staticmethod
+    def multiply_tensors(tensor_a, tensor_b, method, dimension_type, backend="sparse", workers=1,
+                         monitor=None, memory_budget=None, cache=None, log=None, stats=None, lazy=False):
+        """
+        Умножение тензоров с использованием указанного метода
+
+        Args:
+            tensor_a: первый тензор
+            tensor_b: второй тензор
+            method: номер метода (1-5)
+            dimension_type: тип размерности (см. get_dimension_type), сохранён для совместимости -
+                размерности определяются по самим тензорам
+            backend: 'sparse' - поэлементно по словарям, 'dense' - векторизованно через numpy,
+                'blocked' - поэлементно по блокам с результатом на диске,
+                'auto' - режим выбирает TensorOperations.cost_model
+            workers: число процессов для режима 'sparse' (1 - считать в текущем процессе)
+            monitor: ProgressMonitor для отслеживания прогресса и отмены расчёта
+            memory_budget: байт на блок результата для режима 'blocked'; для 'auto' - также
+                предел памяти, при превышении которого выбирается блочный режим
+            cache: ResultCache - готовый результат для тех же A, B, метода, типа размерности
+                и режима возвращается сразу
+            log: функция для сообщений (например, о выборе режима в 'auto')
+            stats: Instrumentation - время этапов (кэш, оценка, умножение) и счётчики пар
+            lazy: вернуть отложенный результат (LazyScottStorage) - только для методов
+                без кэлиевых индексов (3, 4); режим и кэш тогда не используются
+        """
+        if method not in MunermanTensorMultiplier.METHOD_SIGNATURES:
+            raise ValueError(f"Неизвестный метод: {method}")
+        if backend not in ("sparse", "dense", "blocked", "auto"):
+            raise ValueError(f"Неизвестный режим вычислений: {backend}")
+
+        if lazy:
+            scott, cayley = MunermanTensorMultiplier.METHOD_SIGNATURES[method]
+            if cayley:
+                raise ValueError(f"Отложенный результат возможен только для методов без свертки (3, 4), "
+                                 f"а не для метода {method}")
+            with Instrumentation.timed(stats, 'multiply'):
+                return MunermanTensorMultiplier.lazy_product(tensor_a, tensor_b, scott)
+
+        if cache is None:
+            return TensorOperations._multiply(tensor_a, tensor_b, method, backend, workers, monitor,
+                                              memory_budget, log, stats)
+
+        with Instrumentation.timed(stats, 'cache'):
+            key = ResultCache.make_key(tensor_a, tensor_b, method, dimension_type, backend)
+            result = cache.get(key)
+        if result is None:
+            result = TensorOperations._multiply(tensor_a, tensor_b, method, backend, workers, monitor,
+                                                memory_budget, log, stats)
+            with Instrumentation.timed(stats, 'cache'):
+                cache.put(key, result)
+        else:
+            if stats is not None:
+                stats.count('cache_hits', 1)
+                stats.count('result_nnz', result.nnz())
+            if monitor is not None:
+                monitor.update(1.0)
+        return result
+
+    @staticmethod
+    def multiply_chain(tensors, methods, backend="sparse", log=None, **options):
+        """Цепочка ((T1 ∘m1 T2) ∘m2 T3) ... в самом дешёвом допустимом порядке (см. ContractionChain)
+
+        options (workers, monitor, memory_budget, cache) передаются в каждое умножение.
+        """
+        chain = ContractionChain(tensors, methods)
+        tree, cost = chain.plan(backend)
+        if log is not None:
+            written = chain.left_to_right()
+            log(f"Порядок цепочки: {ContractionChain.describe(tree)}, прогноз {cost:.3g} сек "
+                f"(слева направо {ContractionChain.describe(written)}: {chain.cost(written, backend):.3g} сек)")
+        return chain.execute(tree, backend=backend, log=log, **options)
+
+    @staticmethod
+    def multiply_batch(tensor_a, tensors_b, method, backend="sparse", monitor=None):
+        """Произведения одного A на каждый из tensors_b одним методом (см. BatchTensorMultiplier)
+
+        A готовится один раз на весь список, поэтому это быстрее цикла из multiply_tensors.
+        backend - 'sparse' или 'dense'; monitor получает долю обработанных B.
+        Returns:
+            список результатов в порядке tensors_b
+        """
+        return list(BatchTensorMultiplier(tensor_a, method, backend).iter_products(tensors_b, monitor))
+
+    @staticmethod
+    def update_product(result, tensor_a, tensor_b, delta_a, delta_b, method, monitor=None, max_fraction=0.25):
+        """Произведение A·B после правки нескольких элементов, полученное из прошлого результата
+
+        tensor_a, tensor_b - множители уже после правки; delta_a, delta_b - тензоры изменений
+        их элементов (новое значение минус прежнее, None - множитель не менялся), которые
+        копит тот, кто правит элементы (например, окно приложения). Произведение линейно
+        по каждому множителю:
+        A'·B' = A·B + ΔA·B' + A'·ΔB - ΔA·ΔB,
+        поэтому перемножаются только изменения - по группировкам A' и B', которые add_value
+        и remove_value правят на месте, - и время пропорционально правке, а не размеру тензоров.
+        Поправки записываются в PatchedStorage поверх result: сам result не меняется и не
+        копируется (его могут в это время читать другие потоки, он может быть общим объектом
+        из кэша). Элементы, ставшие нулём, удаляются. Кэш не обновляется: ключ нового
+        результата - хэш всего содержимого A' и B'. Суммы копятся в другом порядке, чем при
+        полном расчёте, поэтому значения могут отличаться в последних знаках.
+
+        Returns:
+            обновлённый тензор; None - обновление невозможно или изменений больше
+            max_fraction от числа элементов (тогда нужен полный расчёт)
+        """
+        if result is None or result is tensor_a or result is tensor_b:
+            return None
+        if result.storage == "lazy":
+            return None  # отложенный результат дешевле создать заново
+        deltas = [delta for delta in (delta_a, delta_b) if delta is not None]
+        if (delta_a is not None and delta_a.dimension != tensor_a.dimension
+                or delta_b is not None and delta_b.dimension != tensor_b.dimension):
+            return None
+        if sum(delta.nnz() for delta in deltas) > max_fraction * (tensor_a.nnz() + tensor_b.nnz()):
+            return None
+
+        if monitor is None:
+            monitor = ProgressMonitor()
+        monitor.update(0.0)
+        # Сначала считаем все поправки (расчёт можно отменить), потом применяем их разом
+        scott, cayley = MunermanTensorMultiplier.METHOD_SIGNATURES[method]
+        corrections = []
+        if delta_a is not None and delta_a.nnz():
+            corrections.append((1, MunermanTensorMultiplier.contracted_product(delta_a, tensor_b, scott, cayley)))
+        monitor.update(0.3)
+        if delta_b is not None and delta_b.nnz():
+            corrections.append((1, MunermanTensorMultiplier.delta_product_b(tensor_a, delta_b, scott, cayley)))
+            if delta_a is not None and delta_a.nnz():
+                # ΔA·ΔB вошло в обе поправки выше
+                corrections.append((-1, MunermanTensorMultiplier.contracted_product(delta_a, delta_b,
+                                                                                    scott, cayley)))
+        monitor.update(0.6)
+
+        total = {}
+        for sign, correction in corrections:
+            for key, value in correction.data.items():
+                total[key] = total.get(key, 0) + sign * value
+        storage = PatchedStorage.over(result.data)
+        keys = list(total)
+        values = Tensor.typed_array(result.dtype, (storage.get(key, 0) + total[key] for key in keys))
+        monitor.update(0.9)
+
+        updated = Tensor(result.dimension, storage, shape=result.get_shape(), dtype=result.dtype)
+        updated.accumulation_dtype = result.accumulation_dtype
+        for key, value in zip(keys, values):
+            if value:
+                storage[key] = value
+                updated._update_shape(key)
+            elif key in storage:
+                del storage[key]
+        if storage.patch_size > max_fraction * len(storage.base):
+            # Правок накопилось много: переносим их в обычное хранилище, чтобы чтение
+            # не шло через словари правки (копия по-прежнему не чаще раза на max_fraction правок)
+            updated = Tensor(result.dimension, dict(storage.items()), shape=updated.get_shape(), dtype=result.dtype)
+            if isinstance(storage.base, (CooStorage, DenseStorage)):
+                updated = updated.convert_storage("coo" if isinstance(storage.base, CooStorage) else "dense")
+            updated.accumulation_dtype = result.accumulation_dtype
+        monitor.update(1.0)
+        return updated
+
+    @staticmethod
+    def _multiply(tensor_a, tensor_b, method, backend, workers, monitor, memory_budget, log=None, stats=None):
+        """Расчёт произведения выбранным режимом (без кэша)"""
+        # Оценка (полный подсчёт пар) нужна только для выбора режима: счётчики дают сами ядра
+        features = None
+        if backend == "auto":
+            with Instrumentation.timed(stats, 'estimate'):
+                features = CostModel.estimate(tensor_a, tensor_b, method)
+            tensor_a, backend = TensorOperations._choose_backend(tensor_a, tensor_b, method, features,
+                                                                 memory_budget, log)
+
+        with Instrumentation.timed(stats, 'multiply'):
+            result = TensorOperations._run_backend(tensor_a, tensor_b, method, backend, workers, monitor,
+                                                   memory_budget)
+
+        if stats is not None:
+            if result.pairs is not None:
+                # Разреженные ядра перемножают только совпавшие пары
+                stats.count('pairs_examined', result.pairs)
+                stats.count('pairs_matched', result.pairs)
+            else:
+                # Плотное - все пары общего диапазона индексов (число совпавших известно лишь из оценки)
+                scott, cayley = MunermanTensorMultiplier.METHOD_SIGNATURES[method]
+                shape_a = tensor_a.get_shape() or (0,) * tensor_a.dimension
+                shape_b = tensor_b.get_shape() or (0,) * tensor_b.dimension
+                stats.count('pairs_examined', CostModel.dense_sizes(shape_a, shape_b, scott, cayley)[1])
+                if features is not None:
+                    stats.count('pairs_matched', features['pairs'])
+            stats.count('result_nnz', result.nnz())
+        return result
+
+    @staticmethod
+    def _run_backend(tensor_a, tensor_b, method, backend, workers, monitor, memory_budget):
+        if backend == "dense":
+            return TensorOperations._multiply_dense(tensor_a, tensor_b, method, monitor)
+        elif backend == "blocked":
+            scott, cayley = MunermanTensorMultiplier.METHOD_SIGNATURES[method]
+            return BlockedTensorMultiplier.contracted_product(tensor_a, tensor_b, scott, cayley,
+                                                              memory_budget, monitor=monitor)
+
+        # Один общий движок для любых размерностей, в т.ч. для результатов прошлых умножений
+        scott, cayley = MunermanTensorMultiplier.METHOD_SIGNATURES[method]
+        if workers > 1:
+            return ParallelTensorMultiplier.contracted_product(tensor_a, tensor_b, scott, cayley, workers, monitor)
+        return MunermanTensorMultiplier.contracted_product(tensor_a, tensor_b, scott, cayley, monitor)
+
+    @staticmethod
+    def _choose_backend(tensor_a, tensor_b, method, features, memory_limit, log=None):
+        """Выбор режима по модели стоимости; при необходимости A переводится в нужное хранилище
+
+        features - характеристики произведения из CostModel.estimate.
+
+        Returns:
+            (тензор A для расчёта, режим)
+        """
+        model = TensorOperations.cost_model
+        kernel, seconds, candidates = model.choose(features, tensor_a.storage, memory_limit)
+        if log is not None:
+            others = ", ".join(f"{CostModel.KERNEL_NAMES[name]} {value:.3g}"
+                               for name, value in sorted(candidates.items(), key=lambda item: item[1])
+                               if name != kernel)
+            log(f"Автовыбор режима для метода {method}: {CostModel.KERNEL_NAMES[kernel]}, "
+                f"прогноз {seconds:.3g} сек (пар {features['pairs']}, элементов результата "
+                f"~{features['result_nnz']}; другие режимы, сек: {others or 'нет'})")
+
+        if kernel == 'coo' and tensor_a.storage != 'coo':
+            tensor_a = tensor_a.convert_storage('coo')
+        elif kernel == 'dict' and tensor_a.storage == 'coo':
+            tensor_a = tensor_a.convert_storage('dict')
+        return tensor_a, 'sparse' if kernel in ('dict', 'coo') else kernel
+
+    @staticmethod
+    def get_dimension_type(tensor_a, tensor_b):
+        """Тип размерности пары тензоров: 'square', '4d', '3d_4d', '4d_3d' или, например, '5d_3d'"""
+        if tensor_a.dimension == 3 and tensor_b.dimension == 3:
+            return 'square'
+        elif tensor_a.dimension == 4 and tensor_b.dimension == 4:
+            return '4d'
+        return f"{tensor_a.dimension}d_{tensor_b.dimension}d"
+
+    @staticmethod
+    def _multiply_dense(tensor_a, tensor_b, method, monitor=None):
+        """Умножение через плотные массивы: в Tensor преобразуем только вход и результат
+
+        Векторизованную операцию прервать нельзя, поэтому прогресс и отмена
+        проверяются только между этапами расчёта.
+        """
+        if np is None:
+            raise ImportError("Для плотного режима требуется пакет numpy")
+
+        dense_methods = {
+            1: DenseTensorMultiplier.method1_cayley,
+            2: DenseTensorMultiplier.method2_cayley,
+            3: DenseTensorMultiplier.method3_scott,
+            4: DenseTensorMultiplier.method4_scott,
+            5: DenseTensorMultiplier.method5_combined,
+        }
+        scott, cayley = MunermanTensorMultiplier.METHOD_SIGNATURES[method]
+        MunermanTensorMultiplier.check_signature(tensor_a, tensor_b, scott, cayley)
+
+        if monitor is None:
+            monitor = ProgressMonitor()
+        monitor.update(0.0)
+        array_a, array_b = tensor_a.to_array(), tensor_b.to_array()
+        monitor.update(0.1)
+        result = dense_methods[method](array_a, array_b)
+        monitor.update(0.5)
+        # asarray, а не ascontiguousarray: тот превращает скаляр полной свертки в массив из одного элемента
+        result_tensor = Tensor.from_array(np.asarray(result, order='C'))
+        # numpy считает в общем типе массивов: float32 - в float32, int64 - в int64
+        result_tensor.accumulation_dtype = result_tensor.dtype
+        monitor.update(1.0)
+        return result_tensor
+
+class SokolovFormatter:
+    """Потоковое форматирование тензора по частичному методу Соколова
+
+    Текст выдаётся частями (двумерная грань за раз) прямо из хранилища тензора,
+    без вложенного списка и без построения всей строки. Для полного тензора
+    результат совпадает с MatrixApp.matrix_to_string_sokolov(tensor.to_nested_list()).
+    Значения типа int64 выводятся целыми числами, остальные - с двумя знаками;
+    тензор размерности 0 (результат полной свертки) выводится одним числом.
+    """
+
+    @staticmethod
+    def format_tensor(tensor, prefix=(), first_range=None):
+        """Текст тензора (или его части, см. iter_chunks) одной строкой"""
+        return "".join(SokolovFormatter.iter_chunks(tensor, prefix, first_range))
+
+    @staticmethod
+    def iter_chunks(tensor, prefix=(), first_range=None):
+        """Части текста подтензора tensor[prefix..., start:stop, ...]
+
+        Args:
+            tensor: тензор
+            prefix: фиксированные значения первых индексов
+            first_range: (start, stop) - диапазон следующего индекса, по умолчанию весь
+        """
+        spec = "d" if tensor.dtype == 'int64' else ".2f"
+        if tensor.dimension == 0:
+            # Результат полной свертки - одно значение без скобок
+            yield format(tensor.data.get((), 0), spec)
+            return
+        shape = tensor.get_shape()
+        axis = len(prefix)
+        if axis >= len(shape):
+            yield "[]"
+            return
+
+        start, stop = first_range if first_range is not None else (0, shape[axis])
+        sub_shape = (stop - start,) + shape[axis + 1:]
+        get = tensor.data.get
+
+        if len(sub_shape) == 1:
+            yield SokolovFormatter._format_row(get, prefix, range(start, stop), spec)
+        elif len(sub_shape) == 2:
+            yield SokolovFormatter._format_face(get, prefix, range(start, stop), shape[-1], spec)
+        else:
+            yield from SokolovFormatter._iter_level(get, prefix, range(start, stop), shape[axis + 1:], 0, spec)
+
     @staticmethod
-    def method1_cayley_square(tensor_a, tensor_b):
-        """(0,2)-свернутое произведение для 3D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3 = key_b
-                # Кэлиевы индексы: A(i2,i3) = B(i1,i2)
-                if i2 == j1 and i3 == j2:
-                    new_key = (i1, j3)  # Свободные: A(i1), B(i3)
-                    result_data[new_key] = result_data.get(new_key, 0) + value_a * value_b
-        return Tensor(2, result_data)
+    def _format_row(get, key_prefix, positions, spec=".2f"):
+        """Самый внутренний уровень - элементы через запятую"""
+        return "[" + ", ".join(format(get(key_prefix + (j,), 0), spec) for j in positions) + "]"
 
     @staticmethod
-    def method1_cayley_4d(tensor_a, tensor_b):
-        """(0,2)-свернутое произведение для 4D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3, i4 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3, j4 = key_b
-                # Кэлиевы индексы: A(i3,i4) = B(i1,i2)
-                if i3 == j1 and i4 == j2:
-                    new_key = (i1, i2, j3, j4)  # Свободные: A(i1,i2), B(i3,i4)
-                    result_data[new_key] = result_data.get(new_key, 0) + value_a * value_b
-        return Tensor(4, result_data)
+    def _format_face(get, key_prefix, rows, row_length, spec=".2f"):
+        """Двумерная грань - строки через точку с запятой"""
+        columns = range(row_length)
+        return "[" + "; ".join(SokolovFormatter._format_row(get, key_prefix + (i,), columns, spec)
+                               for i in rows) + "]"
 
     @staticmethod
-    def method1_cayley_3d_4d(tensor_a, tensor_b):
-        """(0,2)-свернутое произведение для 3D×4D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3, j4 = key_b
-                # Кэлиевы индексы: A(i2,i3) = B(i1,i2)
-                if i2 == j1 and i3 == j2:
-                    new_key = (i1, j3, j4)  # Свободные: A(i1), B(i3,i4)
-                    result_data[new_key] = result_data.get(new_key, 0) + value_a * value_b
-        return Tensor(3, result_data)
+    def _iter_level(get, key_prefix, positions, inner_shape, level, spec=".2f"):
+        """Внешние уровни - элементы через запятую с переносами строк"""
+        indent = "  " * (level + 1)
+        yield "[\n" + indent
+        for number, i in enumerate(positions):
+            if number:
+                yield ",\n" + indent
+            if len(inner_shape) == 2:
+                yield SokolovFormatter._format_face(get, key_prefix + (i,), range(inner_shape[0]), inner_shape[1],
+                                                    spec)
+            else:
+                yield from SokolovFormatter._iter_level(get, key_prefix + (i,), range(inner_shape[0]),
+                                                        inner_shape[1:], level + 1, spec)
+        yield "\n" + "  " * level + "]"
+
+class SokolovParser:
+    """Разбор текста в формате Соколова за один проход
+
+    Понимает разделители ',' и ';', десятичную запятую (1,5 без пробела),
+    комментарии '#' до конца строки. Значения сразу записываются в хранилище
+    тензора, форма проверяется по мере чтения. eval не используется.
+    """
+    NUMBER = r"[-+]?(?:\d+(?:[.,]\d+)?|\.\d+)(?:[eE][-+]?\d+)?"
+    NUMBER_PATTERN = re.compile(NUMBER)
+    # Признак дробного числа в строке: точка, экспонента или десятичная запятая
+    FRACTION_PATTERN = re.compile(r"[.eE]|\d,\d")
+    # Самый внутренний список чисел целиком разбирается одним совпадением (быстрый путь),
+    # всё остальное - по отдельным лексемам
+    TOKEN_PATTERN = re.compile(r"""
+        (?P<row>\[\s*{number}(?:\s*[,;]\s*{number})*\s*\])
+        | (?P<number>{number})
+        | (?P<open>\[)
+        | (?P<close>\])
+        | (?P<separator>[,;])
+        | (?P<skip>\s+|\#[^\n]*)
+        | (?P<error>.)
+    """.format(number=NUMBER), re.VERBOSE)
 
     @staticmethod
-    def method1_cayley_4d_3d(tensor_a, tensor_b):
-        """(0,2)-свернутое произведение для 4D×3D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3, i4 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3 = key_b
-                # Кэлиевы индексы: A(i3,i4) = B(i1,i2)
-                if i3 == j1 and i4 == j2:
-                    new_key = (i1, i2, j3)  # Свободные: A(i1,i2), B(i3)
-                    result_data[new_key] = result_data.get(new_key, 0) + value_a * value_b
-        return Tensor(3, result_data)
+    def parse(text, storage="dict", dtype='float64'):
+        """Создаём тензор из текста в формате Соколова
+
+        dtype - тип значений тензора; для 'int64' все числа должны быть целыми.
+
+        Raises:
+            ValueError: текст не является прямоугольной матрицей или содержит дробь при dtype='int64'
+        """
+        if dtype not in Tensor.DTYPES:
+            raise ValueError(f"Неизвестный тип значений: {dtype}")
+        typecode = Tensor.DTYPES[dtype]
+        integer = dtype == 'int64'
+        data = {} if storage == "dict" else CooStorage(0, typecode=typecode)
+        counts = []          # номер текущего элемента на каждом уровне вложенности
+        shape = {}           # длины списков на каждом уровне (по первому законченному списку)
+        leaf_depth = None    # уровень, на котором находятся числа
+        expect_element = False
+        finished = False
+
+        for match in SokolovParser.TOKEN_PATTERN.finditer(text):
+            kind = match.lastgroup
+            if kind == 'skip':
+                continue
+            if finished:
+                SokolovParser._fail(text, match, "лишние данные после матрицы")
+
+            if kind == 'row':
+                depth = len(counts)
+                if depth and not expect_element and counts[-1]:
+                    SokolovParser._fail(text, match, "пропущен разделитель")
+                if leaf_depth is None:
+                    leaf_depth = depth + 1
+                    if storage != "dict":
+                        data = CooStorage(leaf_depth, typecode=typecode)
+                elif depth + 1 != leaf_depth:
+                    SokolovParser._fail(text, match, "список чисел на неверном уровне вложенности")
+
+                row = match.group()
+                tokens = SokolovParser.NUMBER_PATTERN.findall(row)
+                expected = shape.setdefault(depth, len(tokens))
+                if expected != len(tokens):
+                    SokolovParser._fail(text, match,
+                                        f"на уровне {depth + 1} ожидалось {expected} элементов, получено {len(tokens)}")
+                if SokolovParser.FRACTION_PATTERN.search(row):
+                    if integer:
+                        SokolovParser._fail(text, match, "дробное число в целочисленной матрице (int64)")
+                    values = [int(token) if token.lstrip('+-').isdigit() else float(token.replace(',', '.'))
+                              for token in tokens]
+                else:
+                    values = list(map(int, tokens))
+
+                prefix = tuple(counts)
+                if isinstance(data, CooStorage):
+                    data.extend_row(prefix, values)
+                else:
+                    data.update(zip([prefix + (j,) for j in range(len(values))], values))
+
+                if counts:
+                    counts[-1] += 1
+                else:
+                    finished = True
+                expect_element = False
+
+            elif kind == 'number':
+                depth = len(counts)
+                if depth == 0:
+                    SokolovParser._fail(text, match, "введенные данные не являются матрицей")
+                if leaf_depth is None:
+                    leaf_depth = depth
+                    if storage != "dict":
+                        data = CooStorage(depth, typecode=typecode)
+                elif depth != leaf_depth:
+                    SokolovParser._fail(text, match, "число на неверном уровне вложенности")
+                if not expect_element and counts[-1]:
+                    SokolovParser._fail(text, match, "пропущен разделитель")
+
+                token = match.group().replace(',', '.')
+                is_integer = '.' not in token and 'e' not in token and 'E' not in token
+                if integer and not is_integer:
+                    SokolovParser._fail(text, match, "дробное число в целочисленной матрице (int64)")
+                data[tuple(counts)] = int(token) if is_integer else float(token)
+                counts[-1] += 1
+                expect_element = False
+
+            elif kind == 'open':
+                depth = len(counts)
+                if depth and not expect_element and counts[-1]:
+                    SokolovParser._fail(text, match, "пропущен разделитель")
+                if leaf_depth is not None and depth >= leaf_depth:
+                    SokolovParser._fail(text, match, "список на уровне чисел")
+                counts.append(0)
+                expect_element = False
+
+            elif kind == 'close':
+                if not counts:
+                    SokolovParser._fail(text, match, "лишняя закрывающая скобка")
+                if expect_element:
+                    SokolovParser._fail(text, match, "пропущен элемент после разделителя")
+                depth = len(counts) - 1
+                length = counts.pop()
+                if length == 0:
+                    SokolovParser._fail(text, match, "пустой список")
+                expected = shape.setdefault(depth, length)
+                if expected != length:
+                    SokolovParser._fail(text, match,
+                                        f"на уровне {depth + 1} ожидалось {expected} элементов, получено {length}")
+                if counts:
+                    counts[-1] += 1
+                else:
+                    finished = True
+                expect_element = False
+
+            elif kind == 'separator':
+                if not counts or expect_element or counts[-1] == 0:
+                    SokolovParser._fail(text, match, "неожиданный разделитель")
+                expect_element = True
+
+            else:
+                SokolovParser._fail(text, match, f"недопустимый символ {match.group()!r}")
+
+        if counts:
+            raise ValueError("не закрыта квадратная скобка")
+        if not finished:
+            raise ValueError("матрица не найдена")
+        if leaf_depth is None or len(shape) != leaf_depth:
+            raise ValueError("введенные данные не являются матрицей")
+        shape = [shape[depth] for depth in range(leaf_depth)]
+        if storage == "dense":
+            # Прямоугольная матрица прочитана подряд в порядке строк - это и есть плотный массив
+            return Tensor(leaf_depth, DenseStorage(shape, data.value_array))
+        return Tensor(leaf_depth, data, shape=shape, dtype=dtype)
 
     @staticmethod
-    def method2_cayley_square(tensor_a, tensor_b):
-        """(0,1)-свернутое произведение для 3D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3 = key_b
-                # Кэлиев индекс: A(i3) = B(i1)
-                if i3 == j1:
-                    new_key = (i1, i2, j2, j3)  # Свободные: A(i1,i2), B(i2,i3)
-                    result_data[new_key] = result_data.get(new_key, 0) + value_a * value_b
-        return Tensor(4, result_data)
+    def _fail(text, match, message):
+        position = match.start()
+        line = text.count('\n', 0, position) + 1
+        column = position - (text.rfind('\n', 0, position) + 1) + 1
+        raise ValueError(f"{message} (строка {line}, позиция {column})")
+
+class BatchRunner:
+    """Умножение тензоров без графического интерфейса: одно задание или манифест заданий
+
+    Входные файлы - текст в формате Соколова или двоичный файл тензора (TensorFile,
+    определяется по сигнатуре). Результат пишется в двоичном формате, если у файла
+    расширение TensorFile.EXTENSION, иначе - текстом Соколова (2 знака после запятой, int64 - целыми).
+    По каждому заданию в отчёт (JSON) попадают формы, число элементов, время этапов
+    и (с --trace-memory) пиковая память задания; пиковая память всего процесса
+    (ru_maxrss) записывается один раз на весь запуск - process_peak_rss.
+
+    Манифест - JSON-объект {"defaults": {...}, "jobs": [{...}, ...]} или просто список
+    заданий. Поля задания: a, b, method, output и необязательные name, backend, workers,
+    storage, memory_budget (МБ), dtype (тип значений: float64, float32, int64; по умолчанию
+    текст читается как float64, а двоичный файл - в своём типе); относительные пути
+    отсчитываются от каталога манифеста.
+
+    С --server задания умножаются на сервере заданий (JobServer), команда serve
+    запускает такой сервер.
+    """
+    JOB_DEFAULTS = {'backend': 'sparse', 'workers': 1, 'storage': 'dict', 'output': None,
+                    'memory_budget': None, 'dtype': None}
 
     @staticmethod
-    def method2_cayley_4d(tensor_a, tensor_b):
-        """(0,1)-свернутое произведение для 4D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3, i4 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3, j4 = key_b
-                # Кэлиев индекс: A(i4) = B(i1)
-                if i4 == j1:
-                    new_key = (i1, i2, i3, j2, j3, j4)  # Свободные: A(i1,i2,i3), B(i2,i3,i4)
-                    result_data[new_key] = result_data.get(new_key, 0) + value_a * value_b
-        return Tensor(6, result_data)
+    def main(argv):
+        """Разбор аргументов командной строки; возвращает код завершения"""
+        parser = argparse.ArgumentParser(
+            prog="multiplication_matrix.py",
+            description="Свернутые произведения многомерных матриц без графического интерфейса "
+                        "(без аргументов запускается окно приложения)")
+        parser.add_argument('--trace-memory', action='store_true',
+                            help="замерять пиковую память заданий через tracemalloc (замедляет расчёт)")
+        parser.add_argument('--cache-dir',
+                            help="каталог кэша результатов: повторные произведения берутся оттуда")
+        parser.add_argument('--cost-model',
+                            help="JSON-отчёт benchmark.py для калибровки режима auto")
+        parser.add_argument('--server',
+                            help="адрес сервера заданий (хост:порт или unix:путь): умножать на нём, а не локально")
+        commands = parser.add_subparsers(dest='command', required=True)
+
+        multiply = commands.add_parser('multiply', help="одно умножение")
+        multiply.add_argument('a', help="файл матрицы A")
+        multiply.add_argument('b', help="файл матрицы B")
+        multiply.add_argument('-m', '--method', type=int, required=True,
+                              choices=sorted(MunermanTensorMultiplier.METHOD_SIGNATURES))
+        multiply.add_argument('-o', '--output', required=True, help="файл результата")
+        multiply.add_argument('--backend', default='sparse', choices=['sparse', 'dense', 'blocked', 'auto'])
+        multiply.add_argument('--workers', type=int, default=1)
+        multiply.add_argument('--memory-budget', type=float,
+                              help="память на блок результата в МБ для режима blocked")
+        multiply.add_argument('--storage', default='dict', choices=['dict', 'coo', 'dense'],
+                              help="хранение матриц, прочитанных из текста")
+        multiply.add_argument('--dtype', choices=list(Tensor.DTYPES),
+                              help="тип значений матриц (по умолчанию float64 для текста, тип файла - для двоичных)")
+        multiply.add_argument('--report', help="файл отчёта (по умолчанию <output>.report.json)")
+
+        batch = commands.add_parser('batch', help="задания из манифеста в одном процессе")
+        batch.add_argument('manifest', help="JSON-манифест заданий")
+        batch.add_argument('--report', help="файл отчёта (по умолчанию <manifest>.report.json)")
+
+        serve = commands.add_parser('serve', help="сервер заданий для окна приложения и скриптов (JobServer)")
+        serve.add_argument('--address', default=JobServer.DEFAULT_ADDRESS,
+                           help=f"хост:порт или unix:путь (по умолчанию {JobServer.DEFAULT_ADDRESS})")
+        serve.add_argument('--max-jobs', type=int, default=2, help="число одновременно выполняемых заданий")
+        serve.add_argument('--memory-budget', type=float, help="предел памяти одного задания в МБ")
+        serve.add_argument('--spool-dir', help="каталог для входов и результатов заданий")
+        serve.add_argument('--max-upload', type=float,
+                           help=f"предел размера одной матрицы задания в МБ (по умолчанию "
+                                f"{JobServer.MAX_UPLOAD_BYTES >> 20})")
+
+        args = parser.parse_args(argv)
+        if args.cost_model:
+            TensorOperations.cost_model = CostModel.from_benchmark(args.cost_model)
+        if args.command == 'serve':
+            memory_budget = int(args.memory_budget * (1 << 20)) if args.memory_budget else None
+            max_upload = int(args.max_upload * (1 << 20)) if args.max_upload else None
+            JobServer(args.max_jobs, memory_budget, args.spool_dir, max_upload=max_upload).run(args.address)
+            return 0
+        if args.command == 'multiply':
+            jobs = [{'name': os.path.basename(args.output), 'a': args.a, 'b': args.b,
+                     'method': args.method, 'output': args.output, 'backend': args.backend,
+                     'workers': args.workers, 'storage': args.storage, 'memory_budget': args.memory_budget,
+                     'dtype': args.dtype}]
+            report_path = args.report or args.output + ".report.json"
+        else:
+            jobs = BatchRunner.read_manifest(args.manifest)
+            report_path = args.report or os.path.splitext(args.manifest)[0] + ".report.json"
+
+        cache = ResultCache(directory=args.cache_dir)
+        results = BatchRunner.run_jobs(jobs, trace_memory=args.trace_memory, cache=cache, server=args.server)
+        with open(report_path, 'w', encoding='utf-8') as file:
+            json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'process_peak_rss': BatchRunner._peak_rss(),
+                       'jobs': results}, file, ensure_ascii=False, indent=2)
+
+        failed = 0
+        for result in results:
+            if result['status'] == 'ok':
+                print(f"{result['name']}: {result['multiply_seconds']:.6f} сек, "
+                      f"форма {result['result_shape']}, элементов {result['result_nnz']}")
+            else:
+                failed += 1
+                print(f"{result['name']}: ошибка - {result['error']}", file=sys.stderr)
+        print(f"Отчёт сохранён в {report_path}")
+        return 1 if failed else 0
 
     @staticmethod
-    def method2_cayley_3d_4d(tensor_a, tensor_b):
-        """(0,1)-свернутое произведение для 3D×4D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3, j4 = key_b
-                # Кэлиев индекс: A(i3) = B(i1)
-                if i3 == j1:
-                    new_key = (i1, i2, j2, j3, j4)  # Свободные: A(i1,i2), B(i2,i3,i4)
-                    result_data[new_key] = result_data.get(new_key, 0) + value_a * value_b
-        return Tensor(5, result_data)
+    def read_manifest(path):
+        """Список заданий из манифеста с подставленными значениями по умолчанию"""
+        with open(path, encoding='utf-8') as file:
+            manifest = json.load(file)
+        if isinstance(manifest, list):
+            manifest = {'jobs': manifest}
+        defaults = dict(BatchRunner.JOB_DEFAULTS, **manifest.get('defaults', {}))
+        base = os.path.dirname(os.path.abspath(path))
+
+        jobs = []
+        for number, entry in enumerate(manifest.get('jobs', []), 1):
+            job = dict(defaults, **entry)
+            missing = [field for field in ('a', 'b', 'method', 'output') if job.get(field) is None]
+            if missing:
+                raise ValueError(f"Задание {number}: не заданы поля {', '.join(missing)}")
+            for field in ('a', 'b', 'output'):
+                job[field] = os.path.join(base, job[field])
+            job.setdefault('name', f"job{number}")
+            jobs.append(job)
+        return jobs
 
     @staticmethod
-    def method2_cayley_4d_3d(tensor_a, tensor_b):
-        """(0,1)-свернутое произведение для 4D×3D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3, i4 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3 = key_b
-                # Кэлиев индекс: A(i4) = B(i1)
-                if i4 == j1:
-                    new_key = (i1, i2, i3, j2, j3)  # Свободные: A(i1,i2,i3), B(i2,i3)
-                    result_data[new_key] = result_data.get(new_key, 0) + value_a * value_b
-        return Tensor(5, result_data)
+    def run_jobs(jobs, trace_memory=False, cache=None, server=None):
+        """Выполнение заданий по очереди; ошибка одного задания не останавливает остальные
+
+        Одинаковые входные файлы читаются один раз на весь запуск, одинаковые
+        произведения берутся из cache (ResultCache), если он задан.
+        server - адрес JobServer: умножение выполняется на нём (кэш тогда не используется).
+        """
+        tensors = {}
+        return [BatchRunner.run_job(job, tensors, trace_memory, cache, server) for job in jobs]
 
     @staticmethod
-    def method3_scott_square(tensor_a, tensor_b):
-        """(2,0)-свернутое произведение для 3D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3 = key_b
-                # Скоттовы индексы: A(i2,i3) = B(i1,i2)
-                if i2 == j1 and i3 == j2:
-                    new_key = (i1, i2, i3, j3)  # Свободные: A(i1,i2,i3), B(i3)
-                    result_data[new_key] = value_a * value_b  # Без суммирования!
-        return Tensor(4, result_data)
+    def run_job(job, tensors=None, trace_memory=False, cache=None, server=None):
+        """Одно задание: чтение A и B, умножение, запись результата; возвращает строку отчёта"""
+        if tensors is None:
+            tensors = {}
+        report = {'name': job.get('name', os.path.basename(job['output'])), 'a': job['a'], 'b': job['b'],
+                  'method': job['method'], 'backend': job['backend'], 'workers': job['workers'],
+                  'output': job['output']}
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            start = time.perf_counter()
+            tensor_a = BatchRunner._load_cached(job['a'], job['storage'], tensors, job.get('dtype'))
+            tensor_b = BatchRunner._load_cached(job['b'], job['storage'], tensors, job.get('dtype'))
+            report['load_seconds'] = time.perf_counter() - start
+            report.update(shape_a=list(tensor_a.get_shape()), shape_b=list(tensor_b.get_shape()),
+                          nnz_a=tensor_a.nnz(), nnz_b=tensor_b.nnz())
+
+            start = time.perf_counter()
+            dim_type = TensorOperations.get_dimension_type(tensor_a, tensor_b)
+            memory_budget = job.get('memory_budget')
+            if memory_budget is not None:
+                memory_budget = int(float(memory_budget) * (1 << 20))
+            hits = cache.hits if cache is not None else 0
+            messages = []
+            if server is not None:
+                cache = None
+                result = JobClient(server).multiply(tensor_a, tensor_b, int(job['method']), backend=job['backend'],
+                                                    memory_budget=memory_budget, log=messages.append)
+            else:
+                result = TensorOperations.multiply_tensors(tensor_a, tensor_b, int(job['method']), dim_type,
+                                                           backend=job['backend'], workers=int(job['workers']),
+                                                           memory_budget=memory_budget, cache=cache,
+                                                           log=messages.append)
+            if messages:
+                report['messages'] = messages
+            report['multiply_seconds'] = time.perf_counter() - start
+            report['cached'] = cache is not None and cache.hits > hits
+            report.update(result_shape=list(result.get_shape()), result_nnz=result.nnz(), dtype=result.dtype,
+                          accumulation_dtype=result.accumulation_dtype)
+
+            start = time.perf_counter()
+            BatchRunner.save_tensor(result, job['output'])
+            report['save_seconds'] = time.perf_counter() - start
+            report['status'] = 'ok'
+        except (OSError, ValueError, ImportError) as e:
+            report.update(status='error', error=str(e))
+        except Exception as e:
+            # Любая ошибка задания (например, неверное поле манифеста) попадает в отчёт
+            report.update(status='error', error=f"{type(e).__name__}: {e}")
+        finally:
+            if trace_memory:
+                report['peak_memory'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        return report
 
     @staticmethod
-    def method3_scott_4d(tensor_a, tensor_b):
-        """(2,0)-свернутое произведение для 4D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3, i4 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3, j4 = key_b
-                # Скоттовы индексы: A(i3,i4) = B(i1,i2)
-                if i3 == j1 and i4 == j2:
-                    new_key = (i1, i2, i3, i4, j3, j4)  # Свободные: A(i1,i2,i3,i4), B(i3,i4)
-                    result_data[new_key] = value_a * value_b  # Без суммирования!
-        return Tensor(6, result_data)
+    def load_tensor(path, storage="dict", dtype=None):
+        """Чтение тензора из двоичного файла (через отображение в память) или из текста Соколова
+
+        dtype - тип значений; двоичный файл другого типа преобразуется (Tensor.astype).
+        """
+        with open(path, 'rb') as file:
+            magic = file.read(len(TensorFile.MAGIC))
+        if magic == TensorFile.MAGIC:
+            tensor = TensorFile.load(path)
+            return tensor if dtype is None or tensor.dtype == dtype else tensor.astype(dtype)
+        with open(path, encoding='utf-8') as file:
+            return SokolovParser.parse(file.read(), storage=storage, dtype=dtype or 'float64')
 
     @staticmethod
-    def method3_scott_3d_4d(tensor_a, tensor_b):
-        """(2,0)-свернутое произведение для 3D×4D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3, j4 = key_b
-                # Скоттовы индексы: A(i2,i3) = B(i1,i2)
-                if i2 == j1 and i3 == j2:
-                    new_key = (i1, i2, i3, j3, j4)  # Свободные: A(i1,i2,i3), B(i3,i4)
-                    result_data[new_key] = value_a * value_b  # Без суммирования!
-        return Tensor(5, result_data)
+    def save_tensor(tensor, path):
+        """Запись тензора: двоичный формат для расширения TensorFile.EXTENSION, иначе текст Соколова"""
+        if path.endswith(TensorFile.EXTENSION):
+            TensorFile.save(tensor, path)
+            return
+        with open(path, 'w', encoding='utf-8') as file:
+            for chunk in SokolovFormatter.iter_chunks(tensor):
+                file.write(chunk)
+            file.write("\n")
 
     @staticmethod
-    def method3_scott_4d_3d(tensor_a, tensor_b):
-        """(2,0)-свернутое произведение для 4D×3D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3, i4 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3 = key_b
-                # Скоттовы индексы: A(i3,i4) = B(i1,i2)
-                if i3 == j1 and i4 == j2:
-                    new_key = (i1, i2, i3, i4, j3)  # Свободные: A(i1,i2,i3,i4), B(i3)
-                    result_data[new_key] = value_a * value_b  # Без суммирования!
-        return Tensor(5, result_data)
+    def _load_cached(path, storage, tensors, dtype=None):
+        key = (os.path.abspath(path), storage, dtype)
+        if key not in tensors:
+            tensors[key] = BatchRunner.load_tensor(path, storage, dtype)
+        return tensors[key]
 
     @staticmethod
-    def method4_scott_square(tensor_a, tensor_b):
-        """(1,0)-свернутое произведение для 3D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3 = key_b
-                # Скоттов индекс: A(i3) = B(i1)
-                if i3 == j1:
-                    new_key = (i1, i2, i3, j2, j3)  # Свободные: A(i1,i2,i3), B(i2,i3)
-                    result_data[new_key] = value_a * value_b  # Без суммирования!
-        return Tensor(5, result_data)
+    def _peak_rss():
+        """Пиковый объём памяти процесса за всё время работы в байтах (None, если ОС не сообщает его)"""
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux сообщает килобайты, macOS - байты
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+class JobServer:
+    """Локальный сервер заданий умножения с пулом заранее запущенных процессов
+
+    Принимает по TCP (host:port) или Unix-сокету (unix:путь) пары A, B в двоичном формате
+    TensorFile и выполняет TensorOperations.multiply_tensors в ProcessPoolExecutor,
+    процессы которого запускаются при старте сервера. Одновременно считается не более
+    max_jobs заданий, остальные ждут в очереди; у каждого задания свой бюджет памяти
+    (не больше memory_budget сервера): он передаётся ядру как memory_budget, а для режимов
+    sparse и dense задание с оценкой памяти CostModel.memory сверх бюджета отклоняется.
+
+    Протокол: сообщение - длина заголовка (FRAME, 4 байта), заголовок JSON и следом
+    двоичные части, размеры которых перечислены в поле заголовка 'sizes'. Заголовок
+    длиннее MAX_HEADER_BYTES и матрица больше max_upload отклоняются до чтения.
+    Клиент -> сервер: {'type': 'multiply', 'method', 'backend', 'memory_budget'} + A + B,
+    пока задание не закончено - {'type': 'cancel'}; {'type': 'status'} - состояние сервера.
+    Сервер -> клиент: 'queued' (позиция в очереди), 'started', 'progress' (доля), 'log',
+    затем 'result' (+ результат в формате TensorFile), 'cancelled' или 'error'.
+    Входы и результат лежат на время задания во временном каталоге и читаются
+    процессами пула через отображение в память. Обращения к объектам Manager (прогресс,
+    отмена) блокируют поток, поэтому выполняются в потоках, а не в цикле событий.
+    """
+    DEFAULT_ADDRESS = "127.0.0.1:8765"
+    FRAME = struct.Struct('<I')
+    CHUNK_SIZE = 1 << 20
+    BACKENDS = ("sparse", "dense", "blocked", "auto")
+    # Заголовок - небольшой JSON; длина больше этой - испорченный или чужой поток
+    MAX_HEADER_BYTES = 1 << 16
+    MAX_UPLOAD_BYTES = 1 << 32
+
+    def __init__(self, max_jobs=2, memory_budget=None, spool_directory=None, log=None, max_upload=None):
+        """
+        Args:
+            max_jobs: число одновременно выполняемых заданий (и процессов пула)
+            memory_budget: предел памяти одного задания в байтах (по умолчанию - доля
+                CostModel.default_memory_limit() на задание)
+            spool_directory: каталог для входов и результатов заданий (по умолчанию временный)
+            log: функция для сообщений сервера (по умолчанию печать)
+            max_upload: предел размера одной матрицы задания в байтах (по умолчанию MAX_UPLOAD_BYTES)
+        """
+        if max_jobs < 1:
+            raise ValueError("Число одновременных заданий должно быть не меньше 1")
+        self.max_jobs = max_jobs
+        self.memory_budget = memory_budget or CostModel.default_memory_limit() // max_jobs
+        self.spool_directory = spool_directory
+        self.log = log if log is not None else lambda message: print(message, flush=True)
+        self.max_upload = max_upload or JobServer.MAX_UPLOAD_BYTES
+        self.running = 0
+        self.queued = 0
+        self._job_numbers = iter(range(1, sys.maxsize))
+        self._pool = None
+        self._pool_lock = None
+        self._manager = None
+        self._semaphore = None
 
     @staticmethod
-    def method4_scott_4d(tensor_a, tensor_b):
-        """(1,0)-свернутое произведение для 4D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3, i4 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3, j4 = key_b
-                # Скоттов индекс: A(i4) = B(i1)
-                if i4 == j1:
-                    new_key = (i1, i2, i3, i4, j2, j3, j4)  # Свободные: A(i1,i2,i3,i4), B(i2,i3,i4)
-                    result_data[new_key] = value_a * value_b  # Без суммирования!
-        return Tensor(7, result_data)
+    def parse_address(address):
+        """('unix', путь) для 'unix:путь', иначе ('tcp', хост, порт) для 'хост:порт'"""
+        if address.startswith("unix:"):
+            return ('unix', address[len("unix:"):])
+        host, separator, port = address.rpartition(':')
+        if not separator or not port.isdigit():
+            raise ValueError(f"Адрес сервера должен иметь вид хост:порт или unix:путь, а не {address!r}")
+        return ('tcp', host or "127.0.0.1", int(port))
+
+    def run(self, address=DEFAULT_ADDRESS):
+        """Запуск сервера до прерывания (Ctrl+C)"""
+        try:
+            asyncio.run(self.serve(address))
+        except KeyboardInterrupt:
+            pass
+
+    async def serve(self, address=DEFAULT_ADDRESS, started=None):
+        """Приём заданий по address; started (asyncio.Event) отмечает готовность к приёму"""
+        kind, *where = JobServer.parse_address(address)
+        self._manager = multiprocessing.Manager()
+        self._pool = ProcessPoolExecutor(max_workers=self.max_jobs)
+        self._pool_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(self.max_jobs)
+        temporary = self.spool_directory is None
+        if temporary:
+            self.spool_directory = tempfile.mkdtemp(prefix="munt-jobs-")
+        try:
+            await self._warm_up()
+            if kind == 'unix':
+                server = await asyncio.start_unix_server(self._handle, path=where[0])
+            else:
+                server = await asyncio.start_server(self._handle, host=where[0], port=where[1])
+            self.log(f"Сервер заданий слушает {address}: заданий одновременно {self.max_jobs}, "
+                     f"память на задание {self.memory_budget >> 20} МБ, каталог {self.spool_directory}")
+            if started is not None:
+                started.set()
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._pool.shutdown(cancel_futures=True)
+            self._manager.shutdown()
+            if temporary:
+                shutil.rmtree(self.spool_directory, ignore_errors=True)
+                self.spool_directory = None
+
+    async def _warm_up(self):
+        """Запускаем все процессы пула заранее, чтобы первое задание не ждало их старта"""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self._pool, os.getpid) for _ in range(self.max_jobs)])
+
+    async def _replace_pool(self, broken):
+        """Замена пула, в котором аварийно завершился процесс
+
+        Поломку замечают все задания, выполнявшиеся в пуле: новый пул создаёт только
+        первое из них, а старый при этом закрывается.
+        """
+        async with self._pool_lock:
+            if self._pool is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._pool = ProcessPoolExecutor(max_workers=self.max_jobs)
+                await self._warm_up()
+
+    async def _handle(self, reader, writer):
+        """Одно соединение - один запрос"""
+        try:
+            try:
+                header = await JobServer.read_header(reader)
+            except ValueError as e:
+                # Испорченный или слишком длинный заголовок: остаток соединения не читаем
+                await JobServer.write_message(writer, {'type': 'error', 'message': str(e)})
+                return
+            if header.get('type') == 'status':
+                await JobServer.write_message(writer, {
+                    'type': 'status', 'running': self.running, 'queued': self.queued,
+                    'max_jobs': self.max_jobs, 'memory_budget': self.memory_budget})
+            elif header.get('type') == 'multiply':
+                await self._multiply(header, reader, writer)
+            else:
+                await JobServer.write_message(writer, {'type': 'error',
+                                                       'message': f"Неизвестный запрос: {header.get('type')}"})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # клиент отключился - задание уже отменено
+        finally:
+            writer.close()
+
+    async def _multiply(self, header, reader, writer):
+        number = next(self._job_numbers)
+        paths = [os.path.join(self.spool_directory, f"job{number}_{name}{TensorFile.EXTENSION}")
+                 for name in ('a', 'b', 'result')]
+        cancel_event, progress = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: (self._manager.Event(), self._manager.Queue()))
+        try:
+            try:
+                method, backend, memory_budget = self._job_options(header)
+                sizes = header.get('sizes', [])
+                if len(sizes) != 2:
+                    raise ValueError("Заданию нужны две матрицы: A и B")
+                for size in sizes:
+                    JobServer.check_size(size, self.max_upload)
+            except (TypeError, ValueError) as e:
+                await JobServer.write_message(writer, {'type': 'error', 'message': str(e)})
+                return
+            for path, size in zip(paths, sizes):
+                await JobServer._receive_file(reader, size, path, self.max_upload)
+            # Дальше соединение читается только ради отмены (или обрыва связи)
+            watcher = asyncio.create_task(JobServer._watch_cancel(reader, cancel_event))
+            try:
+                await self._run(number, paths, method, backend, memory_budget, progress, cancel_event, writer)
+            finally:
+                watcher.cancel()
+        finally:
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _job_options(self, header):
+        """Метод, режим и бюджет памяти задания (бюджет не больше бюджета сервера)"""
+        method = int(header.get('method', 0))
+        if method not in MunermanTensorMultiplier.METHOD_SIGNATURES:
+            raise ValueError(f"Неизвестный метод: {method}")
+        backend = header.get('backend', "sparse")
+        if backend not in JobServer.BACKENDS:
+            raise ValueError(f"Неизвестный режим вычислений: {backend}")
+        memory_budget = header.get('memory_budget')
+        memory_budget = self.memory_budget if memory_budget is None else min(int(memory_budget), self.memory_budget)
+        return method, backend, memory_budget
+
+    async def _run(self, number, paths, method, backend, memory_budget, progress, cancel_event, writer):
+        """Ожидание места в пуле, расчёт с пересылкой прогресса и отправка результата"""
+        self.queued += 1
+        if self._semaphore.locked():
+            await JobServer.write_message(writer, {'type': 'queued', 'job': number, 'position': self.queued})
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+        started = False
+        error = None
+        loop = asyncio.get_running_loop()
+        try:
+            if await loop.run_in_executor(None, cancel_event.is_set):
+                await JobServer.write_message(writer, {'type': 'cancelled'})
+                return
+            started = True
+            self.running += 1
+            self.log(f"Задание {number}: метод {method}, режим {backend}")
+            await JobServer.write_message(writer, {'type': 'started', 'job': number})
+            pool = self._pool
+            future = loop.run_in_executor(pool, JobServer._run_job, paths[0], paths[1], paths[2],
+                                          method, backend, memory_budget, progress, cancel_event)
+            while True:
+                done, _ = await asyncio.wait({future}, timeout=0.1)
+                fractions = await loop.run_in_executor(None, JobServer._drain, progress)
+                if fractions:
+                    await JobServer.write_message(writer, {'type': 'progress', 'fraction': fractions[-1]})
+                if done:
+                    break
+            try:
+                summary = future.result()
+            except MultiplicationCancelled:
+                self.log(f"Задание {number}: отменено")
+                await JobServer.write_message(writer, {'type': 'cancelled'})
+                return
+            except BrokenProcessPool:
+                # Процесс пула аварийно завершился (например, его убила ОС из-за памяти) - пул пересоздаём
+                await self._replace_pool(pool)
+                raise MemoryError("процесс расчёта аварийно завершился (вероятно, не хватило памяти)")
+            for message in summary.pop('messages'):
+                await JobServer.write_message(writer, {'type': 'log', 'message': message})
+            self.log(f"Задание {number}: готово за {summary['seconds']:.6f} сек, элементов {summary['nnz']}")
+            size = os.path.getsize(paths[2])
+            await JobServer.write_message(writer, dict(summary, type='result', sizes=[size]))
+            await JobServer._send_file(writer, paths[2])
+        except ConnectionError:
+            raise  # клиент отключился - отвечать некому
+        except (ValueError, ImportError, OSError, MemoryError) as e:
+            error = str(e)
+        except Exception as e:
+            # Непредвиденная ошибка ядра не должна обрывать соединение без ответа клиенту
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            if started:
+                self.running -= 1
+            self._semaphore.release()
+        if error is not None:
+            self.log(f"Задание {number}: ошибка - {error}")
+            await JobServer.write_message(writer, {'type': 'error', 'message': error})
 
     @staticmethod
-    def method4_scott_3d_4d(tensor_a, tensor_b):
-        """(1,0)-свернутое произведение для 3D×4D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3, j4 = key_b
-                # Скоттов индекс: A(i3) = B(i1)
-                if i3 == j1:
-                    new_key = (i1, i2, i3, j2, j3, j4)  # Свободные: A(i1,i2,i3), B(i2,i3,i4)
-                    result_data[new_key] = value_a * value_b  # Без суммирования!
-        return Tensor(6, result_data)
+    def _drain(progress):
+        """Все доли, накопившиеся в очереди прогресса задания (без ожидания)"""
+        fractions = []
+        try:
+            while True:
+                fractions.append(progress.get_nowait())
+        except queue.Empty:
+            return fractions
 
     @staticmethod
-    def method4_scott_4d_3d(tensor_a, tensor_b):
-        """(1,0)-свернутое произведение для 4D×3D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3, i4 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3 = key_b
-                # Скоттов индекс: A(i4) = B(i1)
-                if i4 == j1:
-                    new_key = (i1, i2, i3, i4, j2, j3)  # Свободные: A(i1,i2,i3,i4), B(i2,i3)
-                    result_data[new_key] = value_a * value_b  # Без суммирования!
-        return Tensor(6, result_data)
+    def _run_job(path_a, path_b, path_result, method, backend, memory_budget, progress, cancel_event):
+        """Тело задания в процессе пула; результат записывается в path_result"""
+        tensor_a, tensor_b = TensorFile.load(path_a), TensorFile.load(path_b)
+        if backend in ("sparse", "dense"):
+            features = CostModel.estimate(tensor_a, tensor_b, method)
+            needed = CostModel.memory(CostModel.kernel_of(backend, tensor_a.storage), features)
+            if needed > memory_budget:
+                raise ValueError(f"Оценка памяти результата ({needed >> 20} МБ) больше бюджета задания "
+                                 f"({memory_budget >> 20} МБ) - выберите блочный или автоматический режим")
+
+        reported = [-1.0]
+
+        def report(fraction):
+            # Доли пересылаются с шагом в процент, чтобы не перегружать очередь
+            if fraction >= reported[0] + 0.01 or fraction >= 1.0:
+                reported[0] = fraction
+                progress.put(fraction)
+
+        messages = []
+        start = time.perf_counter()
+        result = TensorOperations.multiply_tensors(
+            tensor_a, tensor_b, method, TensorOperations.get_dimension_type(tensor_a, tensor_b), backend=backend,
+            monitor=ProgressMonitor(report, cancel_event), memory_budget=memory_budget, log=messages.append)
+        seconds = time.perf_counter() - start
+        TensorFile.save(result, path_result)
+        return {'seconds': seconds, 'shape': list(result.get_shape()), 'nnz': result.nnz(),
+                'dtype': result.dtype, 'accumulation_dtype': result.accumulation_dtype, 'messages': messages}
 
     @staticmethod
-    def method5_combined_square(tensor_a, tensor_b):
-        """(1,1)-свернутое произведение для 3D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3 = key_b
-                # Кэлиев: A(i3) = B(i1), Скоттов: A(i2) = B(i2)
-                if i3 == j1 and i2 == j2:
-                    new_key = (i1, i2, j3)  # Свободные: A(i1,i2), B(i3)
-                    result_data[new_key] = result_data.get(new_key, 0) + value_a * value_b
-        return Tensor(3, result_data)
+    async def _watch_cancel(reader, cancel_event):
+        """Отмена задания по сообщению клиента или при обрыве соединения"""
+        try:
+            while (await JobServer.read_header(reader)).get('type') != 'cancel':
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        await asyncio.get_running_loop().run_in_executor(None, cancel_event.set)
 
     @staticmethod
-    def method5_combined_4d(tensor_a, tensor_b):
-        """(1,1)-свернутое произведение для 4D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3, i4 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3, j4 = key_b
-                # Кэлиев: A(i4) = B(i1), Скоттов: A(i3) = B(i2)
-                if i4 == j1 and i3 == j2:
-                    new_key = (i1, i2, i3, j3, j4)  # Свободные: A(i1,i2,i3), B(i3,i4)
-                    result_data[new_key] = result_data.get(new_key, 0) + value_a * value_b
-        return Tensor(5, result_data)
+    async def read_header(reader):
+        """Заголовок следующего сообщения (словарь)
+
+        Raises:
+            ValueError: длина больше MAX_HEADER_BYTES или заголовок - не объект JSON
+        """
+        length, = JobServer.FRAME.unpack(await reader.readexactly(JobServer.FRAME.size))
+        if length > JobServer.MAX_HEADER_BYTES:
+            raise ValueError(f"Заголовок сообщения длиной {length} байт больше допустимых "
+                             f"{JobServer.MAX_HEADER_BYTES} байт")
+        header = json.loads(await reader.readexactly(length))
+        if not isinstance(header, dict):
+            raise ValueError("Заголовок сообщения должен быть объектом JSON")
+        return header
 
     @staticmethod
-    def method5_combined_3d_4d(tensor_a, tensor_b):
-        """(1,1)-свернутое произведение для 3D×4D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3, j4 = key_b
-                # Кэлиев: A(i3) = B(i1), Скоттов: A(i2) = B(i2)
-                if i3 == j1 and i2 == j2:
-                    new_key = (i1, i2, j3, j4)  # Свободные: A(i1,i2), B(i3,i4)
-                    result_data[new_key] = result_data.get(new_key, 0) + value_a * value_b
-        return Tensor(4, result_data)
+    async def write_message(writer, header, parts=()):
+        """Отправка заголовка и двоичных частей
+
+        Каждая часть - список объектов с буферным протоколом (например, TensorFile.iter_chunks),
+        которые отправляются подряд без склеивания.
+        """
+        parts = [[memoryview(chunk).cast('B') for chunk in part] for part in parts]
+        if parts:
+            header = dict(header, sizes=[sum(len(chunk) for chunk in part) for part in parts])
+        encoded = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        writer.write(JobServer.FRAME.pack(len(encoded)) + encoded)
+        for part in parts:
+            for chunk in part:
+                writer.write(chunk)
+                await writer.drain()
+        await writer.drain()
 
     @staticmethod
-    def method5_combined_4d_3d(tensor_a, tensor_b):
-        """(1,1)-свернутое произведение для 4D×3D тензоров"""
-        result_data = {}
-        for key_a, value_a in tensor_a.data.items():
-            i1, i2, i3, i4 = key_a
-            for key_b, value_b in tensor_b.data.items():
-                j1, j2, j3 = key_b
-                # Кэлиев: A(i4) = B(i1), Скоттов: A(i3) = B(i2)
-                if i4 == j1 and i3 == j2:
-                    new_key = (i1, i2, i3, j3)  # Свободные: A(i1,i2,i3), B(i3)
-                    result_data[new_key] = result_data.get(new_key, 0) + value_a * value_b
-        return Tensor(4, result_data)
+    def check_size(size, limit=None):
+        """Проверка размера двоичной части из заголовка: целое от 0 до limit байт"""
+        if not isinstance(size, int) or size < 0:
+            raise ValueError(f"Неверный размер части сообщения: {size!r}")
+        if limit is not None and size > limit:
+            raise ValueError(f"Матрица размером {size} байт больше допустимых для задания {limit} байт")
 
-class TensorOperations:
     @staticmethod
-    def multiply_tensors(tensor_a, tensor_b, method, dimension_type):
-        """
-        Умножение тензоров с использованием указанного метода
+    async def _receive_file(reader, size, path, limit=None):
+        """Часть сообщения размером size байт (не больше limit) - в файл path (частями по CHUNK_SIZE)"""
+        JobServer.check_size(size, limit)
+        with open(path, 'wb') as file:
+            while size > 0:
+                chunk = await reader.readexactly(min(size, JobServer.CHUNK_SIZE))
+                file.write(chunk)
+                size -= len(chunk)
 
-        Args:
-            tensor_a: первый тензор
-            tensor_b: второй тензор
-            method: номер метода (1-5)
-            dimension_type: тип размерности ('square' для 3D, '4d' для 4D, 'mixed' для смешанного)
+    @staticmethod
+    async def _send_file(writer, path):
+        with open(path, 'rb') as file:
+            while True:
+                chunk = file.read(JobServer.CHUNK_SIZE)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+
+class JobClient:
+    """Отправка заданий на JobServer из скриптов, командной строки и окна приложения
+
+    Методы синхронные (внутри - собственный цикл asyncio), поэтому их можно вызывать
+    из рабочего потока, но не из уже работающего цикла asyncio.
+    """
+
+    def __init__(self, address=JobServer.DEFAULT_ADDRESS):
+        self.address = address
+        JobServer.parse_address(address)
+
+    def multiply(self, tensor_a, tensor_b, method, backend="sparse", memory_budget=None, monitor=None,
+                 log=None, path=None):
+        """Произведение на сервере; аргументы - как у TensorOperations.multiply_tensors
+
+        monitor (ProgressMonitor) получает прогресс с сервера, его отмена снимает задание;
+        log получает сообщения о ходе задания. Результат читается в память или, если задан
+        path, записывается в этот файл и открывается через отображение в память.
+
+        Raises:
+            MultiplicationCancelled: задание отменено
+            ValueError: сервер отклонил задание или оно завершилось ошибкой
         """
-        multiplier = MunermanTensorMultiplier()
+        return asyncio.run(self._multiply(tensor_a, tensor_b, method, backend, memory_budget, monitor, log, path))
+
+    def status(self):
+        """Состояние сервера: выполняемые и ожидающие задания, их предел и бюджет памяти"""
+        async def request():
+            reader, writer = await self._connect()
+            try:
+                await JobServer.write_message(writer, {'type': 'status'})
+                return await JobServer.read_header(reader)
+            finally:
+                writer.close()
+        return asyncio.run(request())
+
+    async def _connect(self):
+        kind, *where = JobServer.parse_address(self.address)
+        if kind == 'unix':
+            return await asyncio.open_unix_connection(where[0])
+        return await asyncio.open_connection(where[0], where[1])
+
+    async def _multiply(self, tensor_a, tensor_b, method, backend, memory_budget, monitor, log, path):
+        reader, writer = await self._connect()
+        watcher = None
+        try:
+            parts = [list(TensorFile.iter_chunks(tensor)) for tensor in (tensor_a, tensor_b)]
+            await JobServer.write_message(writer, {'type': 'multiply', 'method': method, 'backend': backend,
+                                                   'memory_budget': memory_budget}, parts)
+            if monitor is not None:
+                watcher = asyncio.create_task(JobClient._watch_cancel(writer, monitor))
+            while True:
+                header = await JobServer.read_header(reader)
+                kind = header.get('type')
+                if kind == 'progress':
+                    if monitor is not None and not monitor.cancelled:
+                        monitor.update(header['fraction'])
+                elif kind in ('queued', 'started', 'log'):
+                    if log is not None:
+                        log(JobClient._describe(header))
+                elif kind == 'result':
+                    break
+                elif kind == 'cancelled':
+                    raise MultiplicationCancelled()
+                else:
+                    raise ValueError(f"Сервер заданий: {header.get('message', kind)}")
 
-        # Определяем тип умножения на основе размерностей тензоров
-        if tensor_a.dimension == 3 and tensor_b.dimension == 3:
-            dim_type = 'square'
-        elif tensor_a.dimension == 4 and tensor_b.dimension == 4:
-            dim_type = '4d'
-        elif tensor_a.dimension == 3 and tensor_b.dimension == 4:
-            dim_type = '3d_4d'
-        elif tensor_a.dimension == 4 and tensor_b.dimension == 3:
-            dim_type = '4d_3d'
-        else:
-            raise ValueError(f"Неподдерживаемые тензорные размеры: A={tensor_a.dimension}D, B={tensor_b.dimension}D")
-
-        if method == 1:
-            if dim_type == 'square':
-                return multiplier.method1_cayley_square(tensor_a, tensor_b)
-            elif dim_type == '4d':
-                return multiplier.method1_cayley_4d(tensor_a, tensor_b)
-            elif dim_type == '3d_4d':
-                return multiplier.method1_cayley_3d_4d(tensor_a, tensor_b)
-            elif dim_type == '4d_3d':
-                return multiplier.method1_cayley_4d_3d(tensor_a, tensor_b)
-
-        elif method == 2:
-            if dim_type == 'square':
-                return multiplier.method2_cayley_square(tensor_a, tensor_b)
-            elif dim_type == '4d':
-                return multiplier.method2_cayley_4d(tensor_a, tensor_b)
-            elif dim_type == '3d_4d':
-                return multiplier.method2_cayley_3d_4d(tensor_a, tensor_b)
-            elif dim_type == '4d_3d':
-                return multiplier.method2_cayley_4d_3d(tensor_a, tensor_b)
-
-        elif method == 3:
-            if dim_type == 'square':
-                return multiplier.method3_scott_square(tensor_a, tensor_b)
-            elif dim_type == '4d':
-                return multiplier.method3_scott_4d(tensor_a, tensor_b)
-            elif dim_type == '3d_4d':
-                return multiplier.method3_scott_3d_4d(tensor_a, tensor_b)
-            elif dim_type == '4d_3d':
-                return multiplier.method3_scott_4d_3d(tensor_a, tensor_b)
-
-        elif method == 4:
-            if dim_type == 'square':
-                return multiplier.method4_scott_square(tensor_a, tensor_b)
-            elif dim_type == '4d':
-                return multiplier.method4_scott_4d(tensor_a, tensor_b)
-            elif dim_type == '3d_4d':
-                return multiplier.method4_scott_3d_4d(tensor_a, tensor_b)
-            elif dim_type == '4d_3d':
-                return multiplier.method4_scott_4d_3d(tensor_a, tensor_b)
-
-        elif method == 5:
-            if dim_type == 'square':
-                return multiplier.method5_combined_square(tensor_a, tensor_b)
-            elif dim_type == '4d':
-                return multiplier.method5_combined_4d(tensor_a, tensor_b)
-            elif dim_type == '3d_4d':
-                return multiplier.method5_combined_3d_4d(tensor_a, tensor_b)
-            elif dim_type == '4d_3d':
-                return multiplier.method5_combined_4d_3d(tensor_a, tensor_b)
+            size, = header['sizes']
+            if path is None:
+                result = TensorFile.from_bytes(await reader.readexactly(size))
+            else:
+                await JobServer._receive_file(reader, size, path)
+                result = TensorFile.load(path)
+            result.accumulation_dtype = header.get('accumulation_dtype')
+            if log is not None:
+                log(f"Сервер заданий: расчёт занял {header['seconds']:.6f} сек")
+            return result
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            writer.close()
 
-        else:
-            raise ValueError(f"Неизвестный метод: {method}")
+    @staticmethod
+    def _describe(header):
+        if header['type'] == 'queued':
+            return f"Сервер заданий: задание {header['job']} в очереди, позиция {header['position']}"
+        if header['type'] == 'started':
+            return f"Сервер заданий: задание {header['job']} выполняется"
+        return f"Сервер заданий: {header['message']}"
+
+    @staticmethod
+    async def _watch_cancel(writer, monitor):
+        """Пересылка отмены из monitor на сервер"""
+        while not monitor.cancelled:
+            await asyncio.sleep(0.1)
+        await JobServer.write_message(writer, {'type': 'cancel'})
+
+if tk is not None:
+    _Frame, _Toplevel = ttk.Frame, tk.Toplevel
+else:
+    # Окон без tkinter не создать, но статические методы классов окон
+    # (разбиение на страницы, окно среза) остаются доступны
+    _Frame = _Toplevel = object
 
 class MatrixApp:
+    TENSOR_FILE_TYPES = [("Файлы тензоров", f"*{TensorFile.EXTENSION}"), ("Все файлы", "*.*")]
+
     def __init__(self, root):
         self.root = root
         self.root.title("Многомерные матрицы Спиридонов")
@@ -468,6 +4107,24 @@ class MatrixApp:
         self.tensor_b = None
         self.result_tensor = None
 
+        # Фоновое умножение: монитор прогресса/отмены и очередь сообщений из рабочего потока
+        self.multiplication_monitor = None
+        self.multiplication_queue = None
+
+        # Повторные произведения тех же матриц берутся из кэша
+        self.result_cache = ResultCache()
+
+        # Множители, метод и режим, по которым получен result_tensor, и изменения элементов
+        # этих множителей после расчёта (индексы -> новое значение минус прежнее, см. apply_edits):
+        # после правки нескольких элементов результат обновляется по изменениям, а не считается заново
+        self.result_inputs = None
+        self.multiplication_inputs = None
+        self.pending_deltas = {'A': {}, 'B': {}}
+
+        # Замеры создания матриц A и B (входят в отчёт умножения) и последнего расчёта
+        self.input_stats = {'A': Instrumentation(), 'B': Instrumentation()}
+        self.run_stats = None
+
         self.create_widgets()
 
     def create_widgets(self):
@@ -497,7 +4154,7 @@ class MatrixApp:
         frame_a.grid(row=0, column=0, padx=5, pady=5, sticky='nsew')
 
         ttk.Label(frame_a, text="Размерность:").grid(row=0, column=0, sticky='w')
-        self.dim_a = ttk.Combobox(frame_a, values=["3D", "4D"], state="readonly")
+        self.dim_a = ttk.Combobox(frame_a, values=["3D", "4D", "5D", "6D"], state="readonly")
         self.dim_a.set("3D")
         self.dim_a.grid(row=0, column=1, padx=5, pady=5)
 
@@ -515,15 +4172,20 @@ class MatrixApp:
         ttk.Button(frame_a, text="Показать полную матрицу",
                    command=lambda: self.show_full_tensor('A')).grid(row=4, column=0, columnspan=2, pady=5)
 
+        ttk.Button(frame_a, text="Сохранить в файл",
+                   command=lambda: self.save_tensor_file('A')).grid(row=5, column=0, pady=5)
+        ttk.Button(frame_a, text="Загрузить из файла",
+                   command=lambda: self.load_tensor_file('A')).grid(row=5, column=1, pady=5)
+
         self.tensor_a_info = ttk.Label(frame_a, text="Матрица A не создана")
-        self.tensor_a_info.grid(row=5, column=0, columnspan=2, pady=5)
+        self.tensor_a_info.grid(row=6, column=0, columnspan=2, pady=5)
 
         # Фрейм для матрицы B
         frame_b = ttk.LabelFrame(parent, text="Матрица B", padding=10)
         frame_b.grid(row=0, column=1, padx=5, pady=5, sticky='nsew')
 
         ttk.Label(frame_b, text="Размерность:").grid(row=0, column=0, sticky='w')
-        self.dim_b = ttk.Combobox(frame_b, values=["3D", "4D"], state="readonly")
+        self.dim_b = ttk.Combobox(frame_b, values=["3D", "4D", "5D", "6D"], state="readonly")
         self.dim_b.set("3D")
         self.dim_b.grid(row=0, column=1, padx=5, pady=5)
 
@@ -541,12 +4203,40 @@ class MatrixApp:
         ttk.Button(frame_b, text="Показать полную матрицу",
                    command=lambda: self.show_full_tensor('B')).grid(row=4, column=0, columnspan=2, pady=5)
 
+        ttk.Button(frame_b, text="Сохранить в файл",
+                   command=lambda: self.save_tensor_file('B')).grid(row=5, column=0, pady=5)
+        ttk.Button(frame_b, text="Загрузить из файла",
+                   command=lambda: self.load_tensor_file('B')).grid(row=5, column=1, pady=5)
+
         self.tensor_b_info = ttk.Label(frame_b, text="Матрица B не создана")
-        self.tensor_b_info.grid(row=5, column=0, columnspan=2, pady=5)
+        self.tensor_b_info.grid(row=6, column=0, columnspan=2, pady=5)
+
+        # Способ хранения новых матриц и параметры случайной генерации
+        options_frame = ttk.Frame(parent)
+        options_frame.grid(row=1, column=0, columnspan=2, padx=5, sticky='w')
+
+        ttk.Label(options_frame, text="Хранение новых матриц:").pack(side='left', padx=5)
+        self.storage_var = tk.StringVar(value="dict")
+        for text, value in [("словарь", "dict"), ("массивы COO", "coo"), ("плотный массив", "dense")]:
+            ttk.Radiobutton(options_frame, text=text, variable=self.storage_var,
+                            value=value).pack(side='left', padx=2)
+
+        ttk.Label(options_frame, text="Тип значений:").pack(side='left', padx=(15, 5))
+        self.dtype_var = tk.StringVar(value="float64")
+        for dtype in Tensor.DTYPES:
+            ttk.Radiobutton(options_frame, text=dtype, variable=self.dtype_var,
+                            value=dtype).pack(side='left', padx=2)
+
+        ttk.Label(options_frame, text="Плотность:").pack(side='left', padx=(15, 5))
+        self.density_var = tk.StringVar(value="1.0")
+        ttk.Entry(options_frame, width=6, textvariable=self.density_var).pack(side='left')
+        ttk.Label(options_frame, text="Зерно:").pack(side='left', padx=(15, 5))
+        self.seed_var = tk.StringVar(value="")
+        ttk.Entry(options_frame, width=8, textvariable=self.seed_var).pack(side='left')
 
         # Информационная панель
         info_frame = ttk.LabelFrame(parent, text="Информация", padding=10)
-        info_frame.grid(row=1, column=0, columnspan=2, padx=5, pady=5, sticky='we')
+        info_frame.grid(row=2, column=0, columnspan=2, padx=5, pady=5, sticky='we')
 
         self.info_text = scrolledtext.ScrolledText(info_frame, height=12, width=80)
         self.info_text.pack(fill='both', expand=True)
@@ -564,7 +4254,7 @@ class MatrixApp:
         parent.columnconfigure(0, weight=1)
         parent.columnconfigure(1, weight=1)
         parent.rowconfigure(0, weight=1)
-        parent.rowconfigure(1, weight=1)
+        parent.rowconfigure(2, weight=1)
 
     def setup_multiplication_tab(self, parent):
         ttk.Label(parent, text="Выберите метод умножения:").pack(pady=10)
@@ -586,18 +4276,98 @@ class MatrixApp:
             ttk.Radiobutton(methods_frame, text=text, variable=self.method_var,
                             value=value).pack(anchor='w')
 
-        ttk.Button(parent, text="Выполнить умножение",
-                   command=self.perform_multiplication).pack(pady=20)
+        backend_frame = ttk.Frame(parent)
+        backend_frame.pack(pady=5)
+
+        ttk.Label(backend_frame, text="Режим вычислений:").pack(side='left', padx=5)
+        self.backend_var = tk.StringVar(value="sparse")
+        ttk.Radiobutton(backend_frame, text="Разреженный (словари)", variable=self.backend_var,
+                        value="sparse").pack(side='left', padx=5)
+        ttk.Radiobutton(backend_frame, text="Плотный (numpy)", variable=self.backend_var,
+                        value="dense").pack(side='left', padx=5)
+        ttk.Radiobutton(backend_frame, text="Блочный (результат на диске)", variable=self.backend_var,
+                        value="blocked").pack(side='left', padx=5)
+        ttk.Radiobutton(backend_frame, text="Автоматически", variable=self.backend_var,
+                        value="auto").pack(side='left', padx=5)
+        ttk.Button(backend_frame, text="Калибровать по замерам...",
+                   command=self.load_cost_model).pack(side='left', padx=5)
+
+        workers_frame = ttk.Frame(parent)
+        workers_frame.pack(pady=5)
+
+        ttk.Label(workers_frame, text="Процессов (разреженный режим):").pack(side='left', padx=5)
+        self.workers_var = tk.StringVar(value="1")
+        ttk.Spinbox(workers_frame, from_=1, to=os.cpu_count() or 1, width=5,
+                    textvariable=self.workers_var).pack(side='left', padx=5)
+
+        ttk.Label(workers_frame, text="Память на блок, МБ (блочный режим):").pack(side='left', padx=5)
+        self.memory_budget_var = tk.StringVar(value=str(BlockedTensorMultiplier.DEFAULT_MEMORY_BUDGET >> 20))
+        ttk.Entry(workers_frame, width=8, textvariable=self.memory_budget_var).pack(side='left', padx=5)
+
+        # Пустой адрес - считать в этом процессе, иначе - отправлять задания на JobServer
+        server_frame = ttk.Frame(parent)
+        server_frame.pack(pady=5)
+        ttk.Label(server_frame, text="Сервер заданий (хост:порт, пусто - считать здесь):").pack(side='left', padx=5)
+        self.server_var = tk.StringVar(value="")
+        ttk.Entry(server_frame, width=24, textvariable=self.server_var).pack(side='left', padx=5)
+
+        cache_frame = ttk.Frame(parent)
+        cache_frame.pack(pady=5)
+
+        self.use_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(cache_frame, text="Кэшировать результаты",
+                        variable=self.use_cache_var).pack(side='left', padx=5)
+        ttk.Button(cache_frame, text="Каталог кэша на диске...",
+                   command=self.choose_cache_directory).pack(side='left', padx=5)
+        ttk.Button(cache_frame, text="Очистить кэш",
+                   command=self.clear_result_cache).pack(side='left', padx=5)
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(cache_frame, text="Профилировать (cProfile)",
+                        variable=self.profile_var).pack(side='left', padx=5)
+        self.lazy_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(cache_frame, text="Отложенный результат (методы 3, 4)",
+                        variable=self.lazy_var).pack(side='left', padx=5)
+
+        run_frame = ttk.Frame(parent)
+        run_frame.pack(pady=20)
+
+        self.multiply_button = ttk.Button(run_frame, text="Выполнить умножение",
+                                          command=self.perform_multiplication)
+        self.multiply_button.pack(side='left', padx=5)
+        self.cancel_button = ttk.Button(run_frame, text="Отмена", state='disabled',
+                                        command=self.cancel_multiplication)
+        self.cancel_button.pack(side='left', padx=5)
+
+        # Прогресс умножения: доля обработанных элементов A
+        self.progress_var = tk.DoubleVar(value=0.0)
+        ttk.Progressbar(parent, variable=self.progress_var, maximum=100.0,
+                        length=400, mode='determinate').pack(pady=5)
 
         self.mult_info = ttk.Label(parent, text="")
         self.mult_info.pack(pady=10)
 
     def setup_results_tab(self, parent):
-        self.results_text = scrolledtext.ScrolledText(parent, height=20, width=80)
-        self.results_text.pack(fill='both', expand=True, padx=10, pady=10)
-
-        ttk.Button(parent, text="Очистить результаты",
-                   command=self.clear_results).pack(pady=10)
+        self.results_view = SokolovPager(parent, height=20, width=80)
+        self.results_view.pack(fill='both', expand=True, padx=10, pady=10)
+        self.results_text = self.results_view.text
+
+        # Время этапов и счётчики последнего расчёта
+        self.profile_text = scrolledtext.ScrolledText(parent, height=10, width=80)
+        self.profile_text.pack(fill='x', padx=10)
+
+        button_frame = ttk.Frame(parent)
+        button_frame.pack(pady=10)
+
+        ttk.Button(button_frame, text="Результат → матрица A",
+                   command=lambda: self.use_result_as('A')).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Результат → матрица B",
+                   command=lambda: self.use_result_as('B')).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Сохранить результат в файл",
+                   command=lambda: self.save_tensor_file('result')).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Экспорт профиля...",
+                   command=self.export_profile).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Очистить результаты",
+                   command=self.clear_results).pack(side='left', padx=5)
 
     def create_random_tensor(self, tensor_type):
         try:
@@ -611,56 +4381,171 @@ class MatrixApp:
             shape = tuple(map(int, shape_str.split(',')))
 
             # Проверка размерности
-            if dim == "3D" and len(shape) != 3:
-                raise ValueError("Для 3D матрицы нужно 3 размера")
-            elif dim == "4D" and len(shape) != 4:
-                raise ValueError("Для 4D матрицы нужно 4 размера")
+            dim_count = int(dim[:-1])
+            if len(shape) != dim_count:
+                raise ValueError(f"Для {dim} матрицы число размеров должно быть равно {dim_count}")
+
+            density = float(self.density_var.get().replace(',', '.'))
+            seed_text = self.seed_var.get().strip()
+            seed = int(seed_text) if seed_text else None
 
             # Создаем случайный тензор
-            tensor = self.generate_random_tensor(shape)
+            stats = Instrumentation()
+            with stats.phase('build'):
+                tensor = self.generate_random_tensor(shape, density, seed)
+            with stats.phase('shape'):
+                tensor.get_shape()
+            self.input_stats[tensor_type] = stats
 
             if tensor_type == 'A':
                 self.tensor_a = tensor
                 shape_str = "x".join(map(str, tensor.get_shape()))
                 self.tensor_a_info.config(text=f"Матрица A: {shape_str}")
-                self.log_info(f"Создана случайная матрица A формы {shape_str}")
+                self.log_info(f"Создана случайная матрица A формы {shape_str}, элементов: {tensor.nnz()}, "
+                              f"тип {tensor.dtype}")
             else:
                 self.tensor_b = tensor
                 shape_str = "x".join(map(str, tensor.get_shape()))
                 self.tensor_b_info.config(text=f"Матрица B: {shape_str}")
-                self.log_info(f"Создана случайная матрица B формы {shape_str}")
+                self.log_info(f"Создана случайная матрица B формы {shape_str}, элементов: {tensor.nnz()}, "
+                              f"тип {tensor.dtype}")
 
         except Exception as e:
             messagebox.showerror("Ошибка", f"Неверные параметры: {str(e)}")
 
-    def generate_random_tensor(self, shape):
-        """Создает случайный тензор заданной формы"""
-        tensor = Tensor(len(shape))
+    def generate_random_tensor(self, shape, density=1.0, seed=None):
+        """Создает случайный тензор заданной формы (значения от 0 до 10, доля элементов density)"""
+        return Tensor.random(shape, density, seed, storage=self.get_storage_mode(), dtype=self.get_dtype())
 
-        # Генерируем все возможные комбинации индексов
-        indices = [list(range(dim)) for dim in shape]
-        from itertools import product
-        for idx in product(*indices):
-            value = round(random.uniform(0, 10), 2)
-            tensor.add_value(idx, value)
+    def get_storage_mode(self):
+        """Способ хранения для новых матриц: 'dict', 'coo' или 'dense'"""
+        return self.storage_var.get()
 
-        return tensor
+    def get_dtype(self):
+        """Тип значений новых матриц: 'float64', 'float32' или 'int64'"""
+        return self.dtype_var.get()
 
     def open_matrix_editor(self, matrix_type):
         editor = MatrixEditor(self.root, matrix_type, self)
         self.root.wait_window(editor)
 
-    def set_tensor_from_editor(self, matrix_type, tensor):
+    def set_tensor_from_editor(self, matrix_type, tensor, stats=None):
+        """Подстановка матрицы A или B; stats - замеры её создания (разбор, чтение файла)"""
+        stats = stats if stats is not None else Instrumentation()
+        with stats.phase('shape'):
+            tensor.get_shape()
+        self.input_stats[matrix_type] = stats
+        # Новая матрица - не та, из которой получен результат: следующее умножение считается целиком
+        self.pending_deltas[matrix_type] = {}
+
         if matrix_type == 'A':
             self.tensor_a = tensor
             shape_str = "x".join(map(str, tensor.get_shape()))
             self.tensor_a_info.config(text=f"Матрица A: {shape_str}")
-            self.log_info(f"Создана матрица A формы {shape_str}")
+            self.log_info(f"Создана матрица A формы {shape_str}, тип {tensor.dtype}")
         else:
             self.tensor_b = tensor
             shape_str = "x".join(map(str, tensor.get_shape()))
             self.tensor_b_info.config(text=f"Матрица B: {shape_str}")
-            self.log_info(f"Создана матрица B формы {shape_str}")
+            self.log_info(f"Создана матрица B формы {shape_str}, тип {tensor.dtype}")
+
+    def apply_edits(self, matrix_type, edits):
+        """Правка отдельных элементов матрицы A или B на месте
+
+        edits - словарь {индексы: новое значение или None (удалить элемент)}. Изменения
+        копятся в pending_deltas: следующее умножение тем же методом обновит прошлый результат
+        по ним (TensorOperations.update_product), не пересчитывая всё произведение.
+
+        Returns:
+            True, если правки применены
+        """
+        if self.multiplication_monitor is not None:
+            messagebox.showwarning("Предупреждение", "Дождитесь окончания умножения")
+            return False
+        tensor = self.tensor_a if matrix_type == 'A' else self.tensor_b
+        if tensor is None:
+            messagebox.showwarning("Предупреждение", f"Матрица {matrix_type} не создана!")
+            return False
+        if self.tensor_a is self.tensor_b or (self.result_tensor is not None and self.result_tensor.storage == "lazy"):
+            # Тот же объект - второй множитель или часть отложенного результата: правим копию
+            tensor = tensor.copy()
+            if matrix_type == 'A':
+                self.tensor_a = tensor
+            else:
+                self.tensor_b = tensor
+            self.pending_deltas[matrix_type] = {}
+
+        deltas = self.pending_deltas[matrix_type]
+        try:
+            for key, value in edits.items():
+                old_value = tensor.get_value(key)
+                if value is None:
+                    tensor.remove_value(key)
+                else:
+                    tensor.add_value(key, value)
+                change = tensor.get_value(key) - old_value
+                if change:
+                    deltas[key] = deltas.get(key, 0) + change
+                    if not deltas[key]:
+                        del deltas[key]
+        except (ValueError, IndexError) as e:
+            messagebox.showerror("Ошибка", f"Не удалось изменить элемент {key}: {str(e)}")
+            return False
+        finally:
+            shape_str = "x".join(map(str, tensor.get_shape()))
+            info = self.tensor_a_info if matrix_type == 'A' else self.tensor_b_info
+            info.config(text=f"Матрица {matrix_type}: {shape_str}")
+
+        self.log_info(f"Матрица {matrix_type}: изменено элементов {len(edits)}")
+        return True
+
+    def delta_tensor(self, matrix_type):
+        """Тензор изменений матрицы A или B с последнего расчёта (None - изменений нет)"""
+        deltas = self.pending_deltas[matrix_type]
+        if not deltas:
+            return None
+        tensor = self.tensor_a if matrix_type == 'A' else self.tensor_b
+        return Tensor(tensor.dimension, dict(deltas),
+                      dtype=MunermanTensorMultiplier.accumulation_dtype(tensor.dtype))
+
+    def save_tensor_file(self, tensor_type):
+        """Сохранение матрицы A, B или результата ('result') в двоичный файл тензора"""
+        tensor, title, missing = {
+            'A': (self.tensor_a, "Матрица A", "Матрица A не создана!"),
+            'B': (self.tensor_b, "Матрица B", "Матрица B не создана!"),
+            'result': (self.result_tensor, "Результат умножения", "Сначала выполните умножение!"),
+        }[tensor_type]
+        if tensor is None:
+            messagebox.showwarning("Предупреждение", missing)
+            return
+
+        path = filedialog.asksaveasfilename(parent=self.root, title=f"Сохранить: {title}",
+                                            defaultextension=TensorFile.EXTENSION,
+                                            filetypes=self.TENSOR_FILE_TYPES)
+        if not path:
+            return
+        try:
+            TensorFile.save(tensor, path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Ошибка", f"Не удалось сохранить файл: {str(e)}")
+            return
+        self.log_info(f"{title}: сохранено в файл {path}")
+
+    def load_tensor_file(self, tensor_type):
+        """Загрузка матрицы A или B из двоичного файла тензора (через отображение в память)"""
+        path = filedialog.askopenfilename(parent=self.root, title=f"Загрузить матрицу {tensor_type}",
+                                          filetypes=self.TENSOR_FILE_TYPES)
+        if not path:
+            return
+        stats = Instrumentation()
+        try:
+            with stats.phase('load'):
+                tensor = TensorFile.load(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Ошибка", f"Не удалось загрузить файл: {str(e)}")
+            return
+        self.set_tensor_from_editor(tensor_type, tensor, stats)
+        self.log_info(f"Матрица {tensor_type} загружена из файла {path} ({tensor.nnz()} элементов)")
 
     def show_full_tensor(self, tensor_type):
         if tensor_type == 'A':
@@ -676,7 +4561,7 @@ class MatrixApp:
 
         # Создаем новое окно для отображения матрицы
         tensor_window = tk.Toplevel(self.root)
-        tensor_window.title(f"Полный просмотр {title}")
+        tensor_window.title(f"Просмотр {title}")
         tensor_window.geometry("600x500")
         tensor_window.minsize(400, 300)
 
@@ -689,22 +4574,23 @@ class MatrixApp:
         main_container.rowconfigure(0, weight=1)
         main_container.rowconfigure(1, weight=0)
 
-        # Создаем текстовое поле с прокруткой
-        text_area = scrolledtext.ScrolledText(main_container, wrap=tk.WORD)
-        text_area.grid(row=0, column=0, sticky='nsew', pady=(0, 10))
-
-        # Преобразуем тензор в строку в формате Соколова
-        tensor_text = self.matrix_to_string_sokolov(tensor.to_nested_list())
-        text_area.insert(tk.END, f"{title}:\n\n{tensor_text}")
-        text_area.config(state=tk.DISABLED)
+        # Просмотр по двумерным срезам: выбираются внешние индексы, выводится только окно среза
+        tensor_view = SliceViewer(main_container, tensor)
+        tensor_view.grid(row=0, column=0, sticky='nsew', pady=(0, 10))
 
         # Фрейм для кнопок - компактный, как в редакторе
         button_frame = ttk.Frame(main_container)
         button_frame.grid(row=1, column=0, sticky='')
 
         # Кнопки с естественным размером (не растягиваются)
+        ttk.Button(button_frame, text="Скопировать срез",
+                   command=lambda: self.copy_tensor_to_clipboard(
+                       SokolovFormatter.format_tensor(tensor, tensor_view.get_prefix()), tensor_window)) \
+            .pack(side='left', padx=5)
+
         ttk.Button(button_frame, text="Скопировать матрицу",
-                   command=lambda: self.copy_tensor_to_clipboard(tensor_text, tensor_window)) \
+                   command=lambda: self.copy_tensor_to_clipboard(
+                       SokolovFormatter.format_tensor(tensor), tensor_window)) \
             .pack(side='left', padx=5)
 
         ttk.Button(button_frame, text="Закрыть",
@@ -799,76 +4685,536 @@ class MatrixApp:
         if self.tensor_a is None or self.tensor_b is None:
             messagebox.showwarning("Предупреждение", "Сначала создайте обе матрицы!")
             return
+        if self.multiplication_monitor is not None:
+            return
 
         method = int(self.method_var.get())
 
+        stats = Instrumentation(profile=self.profile_var.get())
+        stats.merge(self.input_stats['A'], 'a')
+        stats.merge(self.input_stats['B'], 'b')
+
         # Определяем тип умножения на основе размерностей тензоров
-        if self.tensor_a.dimension == 3 and self.tensor_b.dimension == 3:
-            dim_type = 'square'
-        elif self.tensor_a.dimension == 4 and self.tensor_b.dimension == 4:
-            dim_type = '4d'
-        elif self.tensor_a.dimension == 3 and self.tensor_b.dimension == 4:
-            dim_type = '3d_4d'
-        elif self.tensor_a.dimension == 4 and self.tensor_b.dimension == 3:
-            dim_type = '4d_3d'
-        else:
-            messagebox.showerror("Ошибка",
-                                 f"Неподдерживаемые размерности: A={self.tensor_a.dimension}D, B={self.tensor_b.dimension}D")
+        with stats.phase('shape'):
+            dim_type = TensorOperations.get_dimension_type(self.tensor_a, self.tensor_b)
+
+        try:
+            workers = int(self.workers_var.get())
+        except ValueError:
+            messagebox.showerror("Ошибка", "Число процессов должно быть целым")
             return
+        try:
+            memory_budget = int(float(self.memory_budget_var.get().replace(',', '.')) * (1 << 20))
+        except ValueError:
+            messagebox.showerror("Ошибка", "Память на блок должна быть числом (в мегабайтах)")
+            return
+        server = self.server_var.get().strip() or None
+        if server is not None:
+            try:
+                JobServer.parse_address(server)
+            except ValueError as e:
+                messagebox.showerror("Ошибка", str(e))
+                return
+
+        # Расчёт идёт в отдельном потоке, окно опрашивает очередь сообщений через after()
+        results = queue.Queue()
+        monitor = ProgressMonitor(callback=lambda fraction: results.put(('progress', fraction)))
+        self.multiplication_queue = results
+        self.multiplication_monitor = monitor
+
+        self.progress_var.set(0.0)
+        self.multiply_button.config(state='disabled')
+        self.cancel_button.config(state='normal')
+        self.mult_info.config(text=f"Метод {method}: умножение выполняется...")
+
+        cache = self.result_cache if self.use_cache_var.get() else None
+        backend = self.backend_var.get()
+        previous = None
+        if self.result_inputs is not None and self.result_inputs[2:] == (method, backend) \
+                and self.result_inputs[0] is self.tensor_a and self.result_inputs[1] is self.tensor_b:
+            previous = (self.result_tensor, self.delta_tensor('A'), self.delta_tensor('B'))
+        self.multiplication_inputs = (self.tensor_a, self.tensor_b, method, backend)
+        self.run_stats = stats
+        # Без кэлиевых индексов элементы результата можно считать при обращении к ним
+        lazy = self.lazy_var.get() and MunermanTensorMultiplier.METHOD_SIGNATURES[method][1] == 0
+        threading.Thread(target=self._multiplication_worker, daemon=True,
+                         args=(self.tensor_a, self.tensor_b, method, dim_type, backend, workers, memory_budget,
+                               cache, previous, monitor, results, stats, lazy, server)).start()
+        self.root.after(100, self._poll_multiplication, method)
 
+    @staticmethod
+    def _multiplication_worker(tensor_a, tensor_b, method, dim_type, backend, workers, memory_budget,
+                               cache, previous, monitor, results, stats=None, lazy=False, server=None):
+        """Тело рабочего потока: умножение и передача итога в очередь
+
+        previous - (прошлый результат, тензор изменений A, тензор изменений B) для тех же
+        матриц и метода: если их правили немного, результат обновляется по изменённым элементам.
+        stats - Instrumentation для замеров этапов расчёта; lazy - вернуть отложенный результат.
+        server - адрес JobServer: умножение выполняется на нём (без кэша и обновления по изменениям).
+        """
         try:
-            start_time = time.time()
+            start_time = time.perf_counter()
+            if server is not None:
+                with Instrumentation.timed(stats, 'multiply'):
+                    result_tensor = JobClient(server).multiply(
+                        tensor_a, tensor_b, method, backend=backend, memory_budget=memory_budget, monitor=monitor,
+                        log=lambda message: results.put(('log', message)))
+                results.put(('done', result_tensor, time.perf_counter() - start_time, False))
+                return
+            if previous is not None:
+                result_tensor, delta_a, delta_b = previous
+                with Instrumentation.timed(stats, 'update'):
+                    updated = TensorOperations.update_product(result_tensor, tensor_a, tensor_b, delta_a, delta_b,
+                                                              method, monitor)
+                if updated is not None:
+                    # Прошлый результат не тронут: окно читает его, пока новый не передан в поток Tk
+                    if stats is not None:
+                        stats.count('result_nnz', updated.nnz())
+                    results.put(('done', updated, time.perf_counter() - start_time, True))
+                    return
             result_tensor = TensorOperations.multiply_tensors(
-                self.tensor_a, self.tensor_b, method, dim_type)
-            end_time = time.time()
-            time_taken = end_time - start_time
+                tensor_a, tensor_b, method, dim_type, backend=backend, workers=workers, monitor=monitor,
+                memory_budget=memory_budget, cache=cache, log=lambda message: results.put(('log', message)),
+                stats=stats, lazy=lazy)
+            results.put(('done', result_tensor, time.perf_counter() - start_time, False))
+        except MultiplicationCancelled:
+            results.put(('cancelled',))
+        except Exception as e:
+            results.put(('error', e))
+
+    def _poll_multiplication(self, method):
+        """Обработка сообщений рабочего потока в потоке Tk"""
+        finished = None
+        try:
+            while finished is None:
+                message = self.multiplication_queue.get_nowait()
+                if message[0] == 'progress':
+                    self.progress_var.set(message[1] * 100)
+                elif message[0] == 'log':
+                    self.log_info(message[1])
+                else:
+                    finished = message
+        except queue.Empty:
+            pass
+
+        if finished is None:
+            self.root.after(100, self._poll_multiplication, method)
+            return
 
+        self.multiplication_monitor = None
+        self.multiplication_queue = None
+        self.multiply_button.config(state='normal')
+        self.cancel_button.config(state='disabled')
+
+        if finished[0] == 'cancelled':
+            self.progress_var.set(0.0)
+            self.mult_info.config(text="Умножение отменено")
+            self.log_info(f"Метод {method}: умножение отменено")
+        elif finished[0] == 'error':
+            error = finished[1]
+            self.mult_info.config(text="")
+            messagebox.showerror("Ошибка", f"Ошибка умножения: {str(error)}")
+            self.log_info(f"Ошибка в методе {method}: {str(error)}")
+        else:
+            _, result_tensor, time_taken, incremental = finished
+            self.progress_var.set(100.0)
             self.result_tensor = result_tensor
+            self.result_inputs = self.multiplication_inputs
+            self.pending_deltas = {'A': {}, 'B': {}}
             result_shape = result_tensor.get_shape()
 
             # Обновляем информацию
-            self.mult_info.config(text=f"Умножение выполнено за {time_taken:.6f} сек")
+            if incremental:
+                self.mult_info.config(text=f"Результат обновлён по изменённым элементам за {time_taken:.6f} сек")
+            else:
+                self.mult_info.config(text=f"Умножение выполнено за {time_taken:.6f} сек")
 
             # Выводим результаты
-            self.show_results(method, time_taken, result_shape)
+            with self.run_stats.profiling():
+                self.show_results(method, time_taken, result_shape)
+            self.show_profile()
+
+            how = "обновлён по изменённым элементам" if incremental else "выполнен"
+            self.log_info(f"Метод {method} {how} за {time_taken:.6f} сек. Результат: {result_shape}")
+
+    def load_cost_model(self):
+        """Калибровка автоматического выбора режима по JSON-отчёту benchmark.py"""
+        path = filedialog.askopenfilename(parent=self.root, title="Результаты замеров",
+                                          filetypes=[("JSON", "*.json"), ("Все файлы", "*.*")])
+        if not path:
+            return
+        try:
+            TensorOperations.cost_model = CostModel.from_benchmark(path)
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Ошибка", f"Не удалось загрузить замеры: {str(e)}")
+            return
+        coefficients = ", ".join(f"{CostModel.KERNEL_NAMES[kernel]} {k1:.3g}/{k2:.3g}"
+                                 for kernel, (k1, k2) in TensorOperations.cost_model.coefficients.items())
+        self.log_info(f"Модель стоимости откалибрована по {path}: {coefficients}")
+
+    def choose_cache_directory(self):
+        """Включение уровня кэша на диске: результаты сохраняются между запусками"""
+        directory = filedialog.askdirectory(parent=self.root, title="Каталог кэша результатов")
+        if not directory:
+            return
+        self.result_cache.directory = directory
+        self.log_info(f"Результаты умножения кэшируются в каталоге {directory}")
 
-            self.log_info(f"Метод {method} выполнен за {time_taken:.6f} сек. Результат: {result_shape}")
+    def clear_result_cache(self):
+        self.result_cache.clear()
+        self.log_info("Кэш результатов в памяти очищен")
 
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Ошибка умножения: {str(e)}")
-            self.log_info(f"Ошибка в методе {method}: {str(e)}")
+    def cancel_multiplication(self):
+        if self.multiplication_monitor is not None:
+            self.multiplication_monitor.cancel()
+            self.cancel_button.config(state='disabled')
+            self.mult_info.config(text="Отмена умножения...")
 
     def show_results(self, method, time_taken, result_shape):
         result_text = f"=== РЕЗУЛЬТАТЫ УМНОЖЕНИЯ ===\n\n"
         result_text += f"Метод: {method}\n"
         result_text += f"Время выполнения: {time_taken:.6f} сек\n"
-        result_text += f"Форма результата: {result_shape}\n\n"
-
-        # Показываем результат по методу Соколова
+        result_text += f"Форма результата: {result_shape}\n"
+        if self.result_tensor is not None:
+            if self.result_tensor.storage == "lazy" and not self.result_tensor.data.counted:
+                # nnz отложенного результата - полный подсчёт пар, его не делаем ради одной строки
+                result_text += "Элементов в результате: считаются при обращении (отложенный результат)\n"
+            else:
+                result_text += f"Элементов в результате: {self.result_tensor.nnz()}\n"
+            result_text += f"Тип значений: {self.result_tensor.dtype}"
+            if self.result_tensor.accumulation_dtype is not None:
+                result_text += f" (суммирование в {self.result_tensor.accumulation_dtype})"
+            result_text += "\n"
+        result_text += "\n"
+
+        # Показываем результат по методу Соколова - постранично
         result_text += "Результат умножения:\n"
-        if self.result_tensor:
-            result_text += self.matrix_to_string_sokolov(self.result_tensor.to_nested_list())
+        self.results_view.stats = self.run_stats
+        self.results_view.show(self.result_tensor, result_text)
+
+    def show_profile(self):
+        """Отчёт о времени этапов и счётчиках последнего расчёта"""
+        self.profile_text.delete('1.0', tk.END)
+        if self.run_stats is not None:
+            self.profile_text.insert(tk.END, self.run_stats.report())
+
+    def export_profile(self):
+        """Сохранение отчёта (JSON или текст) и, если включено профилирование, дампа cProfile"""
+        if self.run_stats is None:
+            messagebox.showwarning("Предупреждение", "Сначала выполните умножение!")
+            return
+        path = filedialog.asksaveasfilename(parent=self.root, title="Экспорт профиля",
+                                            defaultextension=".json",
+                                            filetypes=[("JSON", "*.json"), ("Текст", "*.txt")])
+        if not path:
+            return
+        try:
+            saved = self.run_stats.save(path)
+        except OSError as e:
+            messagebox.showerror("Ошибка", f"Не удалось сохранить отчёт: {str(e)}")
+            return
+        self.log_info(f"Профиль выполнения сохранён: {', '.join(saved)}")
 
-        self.results_text.delete('1.0', tk.END)
-        self.results_text.insert('1.0', result_text)
+    def use_result_as(self, matrix_type):
+        """Подставляем результат умножения как входную матрицу для следующего произведения"""
+        if self.result_tensor is None:
+            messagebox.showwarning("Предупреждение", "Сначала выполните умножение!")
+            return
+        tensor = self.result_tensor
+        if tensor.storage == "lazy":
+            # Входная матрица должна быть независима от множителей, из которых получена
+            tensor = tensor.convert_storage(self.get_storage_mode())
+        else:
+            # Входную матрицу можно править на месте (apply_edits), а результат может лежать в кэше
+            tensor = tensor.copy()
+        self.set_tensor_from_editor(matrix_type, tensor)
 
     def log_info(self, message):
         self.info_text.insert(tk.END, f"{message}\n")
         self.info_text.see(tk.END)
 
     def clear_results(self):
-        self.results_text.delete('1.0', tk.END)
+        self.results_view.clear()
+        self.profile_text.delete('1.0', tk.END)
+
+
+class SokolovPager(_Frame):
+    """Постраничный просмотр тензора в формате Соколова
+
+    На экран выводится только текущая страница: блок подряд идущих значений
+    одного индекса при фиксированных предыдущих, не более PAGE_ELEMENTS элементов.
+    """
+    PAGE_ELEMENTS = 20000
+
+    def __init__(self, parent, **text_options):
+        super().__init__(parent)
+        self.tensor = None
+        self.header = ""
+        self.page = 0
+        self.page_count = 0
+        # Instrumentation, куда добавляется время форматирования и вывода страниц
+        self.stats = None
+
+        self.text = scrolledtext.ScrolledText(self, **text_options)
+        self.text.pack(fill='both', expand=True)
+
+        nav_frame = ttk.Frame(self)
+        nav_frame.pack(pady=5)
+
+        ttk.Button(nav_frame, text="<<", width=4, command=lambda: self.go_to(0)).pack(side='left', padx=2)
+        ttk.Button(nav_frame, text="<", width=4, command=lambda: self.go_to(self.page - 1)).pack(side='left', padx=2)
+        self.page_label = ttk.Label(nav_frame, text="")
+        self.page_label.pack(side='left', padx=10)
+        ttk.Button(nav_frame, text=">", width=4, command=lambda: self.go_to(self.page + 1)).pack(side='left', padx=2)
+        ttk.Button(nav_frame, text=">>", width=4,
+                   command=lambda: self.go_to(self.page_count - 1)).pack(side='left', padx=2)
+
+    def show(self, tensor, header=""):
+        """Показываем тензор с первой страницы; header выводится над каждой страницей"""
+        self.tensor = tensor
+        self.header = header
+        self.plan = SokolovPager.plan_pages(tensor.get_shape() if tensor is not None else ())
+        self.page_count = self.plan[3]
+        self.go_to(0)
+
+    def clear(self):
+        self.tensor = None
+        self.header = ""
+        self.page_count = 0
+        self.text.delete('1.0', tk.END)
+        self.page_label.config(text="")
+
+    @staticmethod
+    def plan_pages(shape, page_elements=PAGE_ELEMENTS):
+        """Разбиение тензора формы shape на страницы
+
+        Листается первая ось, у которой одна "строка" (подтензор по следующим осям)
+        помещается на страницу. Скаляр полной свертки и пустой тензор (shape == ()) -
+        одна страница.
+
+        Returns:
+            (ось листания, строк этой оси на странице, страниц на один набор предыдущих индексов,
+            всего страниц)
+        """
+        if not shape:
+            return 0, 1, 1, 1
+        page_axis = 0
+        while page_axis < len(shape) - 1 and math.prod(shape[page_axis + 1:]) > page_elements:
+            page_axis += 1
+        rows_per_page = max(1, page_elements // math.prod(shape[page_axis + 1:]))
+        pages_per_prefix = -(-shape[page_axis] // rows_per_page)
+        return page_axis, rows_per_page, pages_per_prefix, math.prod(shape[:page_axis]) * pages_per_prefix
+
+    @staticmethod
+    def locate_page(shape, plan, page):
+        """Фиксированные индексы и диапазон листаемой оси для страницы page (plan - из plan_pages)"""
+        page_axis, rows_per_page, pages_per_prefix, _ = plan
+        prefix_number, block = divmod(page, pages_per_prefix)
+        prefix = []
+        for size in reversed(shape[:page_axis]):
+            prefix_number, index = divmod(prefix_number, size)
+            prefix.append(index)
+        start = block * rows_per_page
+        stop = min(start + rows_per_page, shape[page_axis])
+        return tuple(reversed(prefix)), (start, stop)
+
+    @staticmethod
+    def iter_page(tensor, plan, page):
+        """Части текста страницы page: положение фрагмента (если страниц несколько) и значения"""
+        shape = tensor.get_shape()
+        if not shape:
+            # Скаляр выводится значением, пустой тензор - как "[]"
+            yield from SokolovFormatter.iter_chunks(tensor)
+            return
+        prefix, (start, stop) = SokolovPager.locate_page(shape, plan, page)
+        if plan[3] > 1:
+            location = [f"i{axis + 1}={index}" for axis, index in enumerate(prefix)]
+            location.append(f"i{len(prefix) + 1}={start}..{stop - 1}")
+            yield f"Фрагмент: {', '.join(location)} (индексы с 0)\n"
+        yield from SokolovFormatter.iter_chunks(tensor, prefix, (start, stop))
+
+    def go_to(self, page):
+        if self.page_count == 0:
+            return
+        self.page = min(max(page, 0), self.page_count - 1)
+
+        self.text.delete('1.0', tk.END)
+        self.text.insert(tk.END, self.header)
+        if self.tensor is not None:
+            format_seconds = render_seconds = 0.0
+            chunks = SokolovPager.iter_page(self.tensor, self.plan, self.page)
+            while True:
+                start_time = time.perf_counter()
+                chunk = next(chunks, None)
+                format_seconds += time.perf_counter() - start_time
+                if chunk is None:
+                    break
+                start_time = time.perf_counter()
+                self.text.insert(tk.END, chunk)
+                render_seconds += time.perf_counter() - start_time
+            if self.stats is not None:
+                self.stats.add('format', format_seconds)
+                self.stats.add('render', render_seconds)
+        self.page_label.config(text=f"Страница {self.page + 1} из {self.page_count}")
+
+
+class SliceViewer(_Frame):
+    """Просмотр тензора по двумерным срезам
+
+    Внешние индексы (все, кроме двух последних) задаются счётчиками, на экран выводится
+    окно среза - не более WINDOW_ROWS строк и WINDOW_COLUMNS столбцов. Значения окна
+    берутся поиском по индексам в хранилище тензора (data.get), поэтому смена среза
+    стоит работы над одним окном, а не над всем тензором.
+    Соседние срезы листаются кнопками, PageUp/PageDown и Ctrl+колесо мыши.
+    """
+    WINDOW_ROWS = 200
+    WINDOW_COLUMNS = 30
+
+    def __init__(self, parent, tensor, **text_options):
+        super().__init__(parent)
+        self.tensor = tensor
+        self.shape = tuple(tensor.get_shape())
+        self.outer_axes = max(0, len(self.shape) - 2)
+
+        controls = ttk.Frame(self)
+        controls.pack(fill='x', pady=(0, 5))
+        self.index_vars = [self._add_counter(controls, f"i{axis + 1}:", self.shape[axis] - 1, 1)
+                           for axis in range(self.outer_axes)]
+        if self.outer_axes:
+            ttk.Button(controls, text="<", width=3, command=lambda: self.step(-1)).pack(side='left', padx=(10, 2))
+            ttk.Button(controls, text=">", width=3, command=lambda: self.step(1)).pack(side='left', padx=2)
+
+        # Окно строк и столбцов - только если срез в него не помещается
+        self.row_var = self.column_var = None
+        if len(self.shape) >= 2 and self.shape[-2] > self.WINDOW_ROWS:
+            self.row_var = self._add_counter(controls, "строки с:", self.shape[-2] - 1, self.WINDOW_ROWS)
+        if self.shape and self.shape[-1] > self.WINDOW_COLUMNS:
+            self.column_var = self._add_counter(controls, "столбцы с:", self.shape[-1] - 1, self.WINDOW_COLUMNS)
+
+        self.location_label = ttk.Label(self, text="")
+        self.location_label.pack(anchor='w')
+        self.text = scrolledtext.ScrolledText(self, **dict({'wrap': tk.NONE}, **text_options))
+        self.text.pack(fill='both', expand=True)
+        for sequence, delta in (('<Prior>', -1), ('<Next>', 1), ('<Control-Button-4>', -1),
+                                ('<Control-Button-5>', 1)):
+            self.text.bind(sequence, lambda event, delta=delta: self.step(delta) or "break")
+        self.text.bind('<Control-MouseWheel>',
+                       lambda event: self.step(-1 if event.delta > 0 else 1) or "break")
+        self.render()
+
+    def _add_counter(self, parent, label, maximum, increment):
+        """Счётчик индекса: стрелки и Enter сразу перерисовывают срез"""
+        ttk.Label(parent, text=label).pack(side='left', padx=(5, 2))
+        variable = tk.StringVar(value="0")
+        spinbox = ttk.Spinbox(parent, from_=0, to=maximum, increment=increment, width=6,
+                              textvariable=variable, command=self.render)
+        spinbox.pack(side='left')
+        spinbox.bind('<Return>', lambda event: self.render())
+        return variable
+
+    @staticmethod
+    def _read(variable, size):
+        """Значение счётчика в пределах [0, size); неверный ввод заменяется на 0"""
+        if variable is None:
+            return 0
+        try:
+            value = min(max(int(variable.get()), 0), size - 1)
+        except ValueError:
+            value = 0
+        variable.set(str(value))
+        return value
+
+    def get_prefix(self):
+        """Значения внешних индексов текущего среза"""
+        return tuple(self._read(variable, size) for variable, size in zip(self.index_vars, self.shape))
+
+    def step(self, delta):
+        """Переход на delta срезов вперёд или назад (последний внешний индекс меняется быстрее всего)"""
+        if not self.outer_axes:
+            return
+        outer_shape = self.shape[:self.outer_axes]
+        number = 0
+        for index, size in zip(self.get_prefix(), outer_shape):
+            number = number * size + index
+        number = min(max(number + delta, 0), math.prod(outer_shape) - 1)
+        for variable, size in zip(reversed(self.index_vars), reversed(outer_shape)):
+            number, index = divmod(number, size)
+            variable.set(str(index))
+        self.render()
+
+    def render(self):
+        """Вывод окна текущего среза"""
+        self.text.delete('1.0', tk.END)
+        if self.tensor.dimension == 0:
+            # Результат полной свертки - одно значение без таблицы
+            self.location_label.config(text="Скаляр (полная свертка)")
+            self.text.insert(tk.END, SliceViewer.format_window(self.tensor, ())[2])
+            return
+        if not self.shape:
+            self.location_label.config(text="")
+            self.text.insert(tk.END, "[]")
+            return
+        prefix = self.get_prefix()
+        row_start = self._read(self.row_var, self.shape[-2]) if len(self.shape) >= 2 else 0
+        column_start = self._read(self.column_var, self.shape[-1])
+        rows, columns, text = SliceViewer.format_window(self.tensor, prefix, row_start, column_start,
+                                                        self.WINDOW_ROWS, self.WINDOW_COLUMNS)
+        location = [f"i{axis + 1}={index}" for axis, index in enumerate(prefix)]
+        dimension = len(self.shape)
+        if dimension >= 2:
+            location.append(f"i{dimension - 1}={rows.start}..{rows.stop - 1}")
+        location.append(f"i{dimension}={columns.start}..{columns.stop - 1}")
+        self.location_label.config(text=f"Срез: {', '.join(location)} (индексы с 0)")
+        self.text.insert(tk.END, text)
 
+    @staticmethod
+    def format_window(tensor, prefix, row_start=0, column_start=0, max_rows=WINDOW_ROWS,
+                      max_columns=WINDOW_COLUMNS):
+        """Таблица окна среза tensor[prefix..., строки, столбцы] с номерами строк и столбцов
+
+        У скаляра (dimension == 0) строк и столбцов нет, текст - само значение.
 
-class MatrixEditor(tk.Toplevel):
+        Returns:
+            (диапазон строк, диапазон столбцов, текст таблицы)
+        """
+        spec = "d" if tensor.dtype == 'int64' else ".2f"
+        if tensor.dimension == 0:
+            return range(0), range(0), format(tensor.data.get((), 0), spec) + "\n"
+        shape = tensor.get_shape()
+        columns = range(column_start, min(column_start + max_columns, shape[-1]))
+        if len(shape) >= 2:
+            rows = range(row_start, min(row_start + max_rows, shape[-2]))
+            keys = [[prefix + (i, j) for j in columns] for i in rows]
+        else:
+            rows = range(0, 1)
+            keys = [[(j,) for j in columns]]
+
+        get = tensor.data.get
+        if isinstance(tensor.data, CooStorage) and len(shape) >= 2:
+            # Строки COO отсортированы: строки окна идут подряд, их границы находим двоичным поиском
+            get = dict(tensor.data.items_between(prefix + (rows.start,), prefix + (rows.stop,))).get
+        cells = [[format(get(key, 0), spec) for key in row] for row in keys]
+        width = max([len(str(j)) for j in columns] + [len(cell) for row in cells for cell in row])
+        label_width = len(str(rows.stop - 1))
+        lines = [" " * label_width + " | " + " ".join(f"{j:>{width}}" for j in columns)]
+        lines.append("-" * len(lines[0]))
+        for i, row in zip(rows, cells):
+            label = str(i) if len(shape) >= 2 else ""
+            lines.append(f"{label:>{label_width}} | " + " ".join(f"{cell:>{width}}" for cell in row))
+        return rows, columns, "\n".join(lines) + "\n"
+
+
+class MatrixEditor(_Toplevel):
     def __init__(self, parent, matrix_type, app):
         super().__init__(parent)
         self.matrix_type = matrix_type
         self.app = app
         self.tensor = None
+        # Правки элементов текущей матрицы: индексы -> новое значение (None - удалить)
+        self.edits = {}
 
         self.title(f"Редактор матрицы {matrix_type}")
-        self.geometry("600x400")
+        self.geometry("600x480")
 
         self.create_widgets()
 
@@ -887,6 +5233,23 @@ class MatrixEditor(tk.Toplevel):
         example_text += "# Пример для 4D матрицы:\n[[[[1, 2]; [3, 4]], [[5, 6]; [7, 8]]], [[[9, 10]; [11, 12]], [[13, 14]; [15, 16]]]]"
         self.text_area.insert('1.0', example_text)
 
+        # Правка отдельных элементов уже созданной матрицы: результат прошлого умножения
+        # потом обновляется только по изменённым элементам
+        edit_frame = ttk.LabelFrame(main_frame, text="Правка элементов текущей матрицы", padding=5)
+        edit_frame.pack(fill='x')
+        ttk.Label(edit_frame, text="Индексы:").pack(side='left')
+        self.indices_entry = ttk.Entry(edit_frame, width=12)
+        self.indices_entry.pack(side='left', padx=5)
+        ttk.Label(edit_frame, text="Значение:").pack(side='left')
+        self.value_entry = ttk.Entry(edit_frame, width=10)
+        self.value_entry.pack(side='left', padx=5)
+        ttk.Button(edit_frame, text="Изменить",
+                   command=self.record_edit).pack(side='left', padx=2)
+        ttk.Button(edit_frame, text="Удалить",
+                   command=lambda: self.record_edit(remove=True)).pack(side='left', padx=2)
+        self.edits_label = ttk.Label(edit_frame, text="Правок: 0")
+        self.edits_label.pack(side='left', padx=5)
+
         # Кнопки
         button_frame = ttk.Frame(main_frame)
         button_frame.pack(fill='x', pady=10)
@@ -899,43 +5262,52 @@ class MatrixEditor(tk.Toplevel):
                    command=self.clear_text).pack(side='left', padx=5)
         ttk.Button(button_frame, text="Вставить матрицу",
                    command=self.paste_matrix).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Применить правки",
+                   command=self.apply_edits).pack(side='left', padx=5)
 
     def save_matrix(self):
         try:
             text = self.text_area.get('1.0', tk.END).strip()
 
-            # Удаляем комментарии
-            lines = text.split('\n')
-            clean_lines = []
-            for line in lines:
-                if '#' in line:
-                    line = line.split('#')[0]
-                clean_lines.append(line.strip())
-            text = ' '.join(clean_lines)
-
-            # Заменяем запятые в числах на точки (для корректного парсинга)
-            text = re.sub(r'(\d),(\d)', r'\1.\2', text)
-
-            # Преобразуем формат Соколова в стандартный Python формат
-            text = self.convert_sokolov_to_python(text)
-
-            # Парсим матрицу
-            matrix = eval(text)
-
-            # Проверяем, что это действительно список
-            if not isinstance(matrix, list):
-                raise ValueError("Введенные данные не являются матрицей")
-
-            # Преобразуем в тензор
-            tensor = Tensor.from_nested_list(matrix)
+            # Разбираем текст сразу в хранилище тензора
+            stats = Instrumentation()
+            with stats.phase('parse'):
+                tensor = SokolovParser.parse(text, storage=self.app.get_storage_mode(), dtype=self.app.get_dtype())
 
             self.tensor = tensor
-            self.app.set_tensor_from_editor(self.matrix_type, tensor)
+            self.app.set_tensor_from_editor(self.matrix_type, tensor, stats)
             self.destroy()
 
         except Exception as e:
             messagebox.showerror("Ошибка", f"Неверный формат матрицы: {str(e)}")
 
+    def record_edit(self, remove=False):
+        """Запоминаем правку элемента: индексы через запятую или пробел, значение (кроме удаления)"""
+        tensor = self.app.tensor_a if self.matrix_type == 'A' else self.app.tensor_b
+        try:
+            if tensor is None:
+                raise ValueError(f"матрица {self.matrix_type} ещё не создана")
+            key = tuple(int(part) for part in re.split(r"[\s,;]+", self.indices_entry.get().strip()) if part)
+            if len(key) != tensor.dimension or min(key, default=0) < 0:
+                raise ValueError(f"нужно {tensor.dimension} неотрицательных индексов")
+            value = None
+            if not remove:
+                text = self.value_entry.get().strip().replace(',', '.')
+                value = int(text) if tensor.dtype == 'int64' else float(text)
+        except ValueError as e:
+            messagebox.showerror("Ошибка", f"Неверная правка: {str(e)}")
+            return
+        self.edits[key] = value
+        self.edits_label.config(text=f"Правок: {len(self.edits)}")
+
+    def apply_edits(self):
+        """Правки - в матрицу приложения (MatrixApp.apply_edits)"""
+        if not self.edits:
+            messagebox.showwarning("Предупреждение", "Нет правок: задайте индексы и нажмите «Изменить» или «Удалить»")
+            return
+        if self.app.apply_edits(self.matrix_type, self.edits):
+            self.destroy()
+
     def paste_matrix(self):
         try:
             # Получаем текст из буфера обмена
@@ -946,43 +5318,24 @@ class MatrixEditor(tk.Toplevel):
         except Exception as e:
             pass
 
-    def convert_sokolov_to_python(self, text):
-        """Конвертирует формат Соколова в стандартный Python формат"""
-        # Обрабатываем матрицы с квадратными скобками
-        if text.startswith('[') and text.endswith(']'):
-            # Заменяем точки с запятой на '], [' для разделения строк
-            depth = 0
-            result = []
-            i = 0
-
-            while i < len(text):
-                char = text[i]
-
-                if char == '[':
-                    depth += 1
-                    result.append(char)
-                elif char == ']':
-                    depth -= 1
-                    result.append(char)
-                elif char == ';' and depth == 1:
-                    # Заменяем точку с запятой на '], ['
-                    result.append('], [')
-                elif char == ';' and depth > 1:
-                    # Для вложенных уровней просто заменяем на запятую
-                    result.append(',')
-                else:
-                    result.append(char)
-
-                i += 1
-
-            return ''.join(result)
-        return text
-
     def clear_text(self):
         self.text_area.delete('1.0', tk.END)
 
 
-if __name__ == "__main__":
+def main(argv=None):
+    """Без аргументов - окно приложения, иначе - режим командной строки (см. BatchRunner)"""
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        return BatchRunner.main(argv)
+    if tk is None:
+        print("Для окна приложения нужен tkinter; без него доступен режим командной строки "
+              "(см. --help)", file=sys.stderr)
+        return 2
     root = tk.Tk()
     app = MatrixApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
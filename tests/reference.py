@@ -0,0 +1,45 @@
+"""Эталон для тестов: свернутое произведение Мунермана по прямому определению"""
+import pytest
+
+from multiplication_matrix import MunermanTensorMultiplier, Tensor, np
+
+METHODS = sorted(MunermanTensorMultiplier.METHOD_SIGNATURES)
+DIMENSIONS = [(3, 3), (4, 4), (3, 4), (4, 3)]
+needs_numpy = pytest.mark.skipif(np is None, reason="плотный режим требует numpy")
+
+
+def reference_product(tensor_a, tensor_b, method):
+    """(λ,μ)-свернутое произведение перебором всех пар: A = (l, s, c), B = (c, s, m) -> (l, s, m)"""
+    scott, cayley = MunermanTensorMultiplier.METHOD_SIGNATURES[method]
+    kept = tensor_a.dimension - cayley
+    scott_start = kept - scott
+    result = {}
+    for key_a, value_a in tensor_a.data.items():
+        for key_b, value_b in tensor_b.data.items():
+            if key_a[kept:] != key_b[:cayley] or key_a[scott_start:kept] != key_b[cayley:cayley + scott]:
+                continue
+            key = key_a[:kept] + key_b[cayley + scott:]
+            result[key] = result.get(key, 0) + value_a * value_b
+    return result
+
+
+def assert_matches(result, expected, dimension, exact_keys=True):
+    """Сравнение результата с эталоном; плотный результат хранит и нули, поэтому ключи не сравниваются"""
+    assert result.dimension == dimension
+    values = dict(result.data.items())
+    if exact_keys:
+        assert set(values) == set(expected)
+    for key in set(values) | set(expected):
+        # float32 округляет каждое значение результата, эталон считается в числах Python
+        tolerance = 1e-6 if result.dtype == 'float32' else 1e-9
+        assert values.get(key, 0) == pytest.approx(expected.get(key, 0), rel=tolerance, abs=tolerance), key
+
+
+def result_dimension(dimensions, method):
+    scott, cayley = MunermanTensorMultiplier.METHOD_SIGNATURES[method]
+    return sum(dimensions) - scott - 2 * cayley
+
+
+def make_pair(dimensions, storage="dict", density=0.6, dtype='float64'):
+    return (Tensor.random((3,) * dimensions[0], density, 1, storage, dtype=dtype),
+            Tensor.random((3,) * dimensions[1], density, 2, storage, dtype=dtype))
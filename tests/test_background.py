@@ -0,0 +1,45 @@
+"""Рабочий поток умножения окна приложения: прогресс, итог, отмена и ошибки через очередь"""
+import queue
+import threading
+
+from multiplication_matrix import MatrixApp, ProgressMonitor, Tensor
+from reference import assert_matches, make_pair, reference_product
+
+
+def run_worker(tensor_a, tensor_b, method, monitor=None):
+    results = queue.Queue()
+    if monitor is None:
+        monitor = ProgressMonitor(callback=lambda fraction: results.put(('progress', fraction)))
+    thread = threading.Thread(target=MatrixApp._multiplication_worker,
+                              args=(tensor_a, tensor_b, method, "4d", "sparse", 1, None, None, None, monitor,
+                                    results))
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive()
+    messages = []
+    while not results.empty():
+        messages.append(results.get())
+    return messages
+
+
+def test_progress_then_result():
+    tensor_a, tensor_b = make_pair((4, 4))
+    messages = run_worker(tensor_a, tensor_b, 5)
+    progress = [message[1] for message in messages if message[0] == 'progress']
+    assert progress and progress == sorted(progress) and progress[-1] == 1.0
+    kind, result, seconds, incremental = messages[-1]
+    assert kind == 'done' and not incremental and seconds >= 0
+    assert_matches(result, reference_product(tensor_a, tensor_b, 5), 5)
+
+
+def test_cancel():
+    tensor_a, tensor_b = make_pair((4, 4))
+    monitor = ProgressMonitor()
+    monitor.cancel()
+    assert run_worker(tensor_a, tensor_b, 5, monitor) == [('cancelled',)]
+
+
+def test_error_is_reported():
+    # Методу 1 нужно два кэлиевых индекса, у одномерного A их нет
+    messages = run_worker(Tensor(1, {(0,): 1.0}), Tensor(3, {(0, 0, 0): 1.0}), 1)
+    assert messages[-1][0] == 'error' and isinstance(messages[-1][1], ValueError)
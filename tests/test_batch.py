@@ -0,0 +1,57 @@
+"""Пакетное умножение одного A на много B (BatchTensorMultiplier, multiply_batch)"""
+import pytest
+
+from multiplication_matrix import BatchTensorMultiplier, ProgressMonitor, Tensor, TensorOperations
+from reference import METHODS, assert_matches, needs_numpy, reference_product, result_dimension
+
+BACKENDS = ["sparse", pytest.param("dense", marks=needs_numpy)]
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("method", METHODS)
+def test_batch(method, backend):
+    tensor_a = Tensor.random((3,) * 4, 0.6, 1)
+    tensors_b = [Tensor.random((3,) * 4, 0.6, seed) for seed in (2, 3)] + [Tensor.random((2,) * 3, 0.6, 4)]
+    results = TensorOperations.multiply_batch(tensor_a, tensors_b, method, backend)
+    for tensor_b, result in zip(tensors_b, results):
+        dimensions = (tensor_a.dimension, tensor_b.dimension)
+        assert_matches(result, reference_product(tensor_a, tensor_b, method), result_dimension(dimensions, method),
+                       exact_keys=backend == "sparse")
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("method", METHODS)
+def test_empty_b_in_batch(method, backend):
+    # Пустой B формы не имеет и в плотном режиме образует отдельную группу с нулевыми осями
+    tensor_a = Tensor.random((3,) * 4, 0.6, 1)
+    tensors_b = [Tensor.random((3,) * 4, 0.6, 2), Tensor(4), Tensor.random((3,) * 4, 0.6, 3)]
+    results = TensorOperations.multiply_batch(tensor_a, tensors_b, method, backend)
+    assert len(results) == 3
+    assert not any(results[1].data.values())
+    for tensor_b, result in zip(tensors_b, results):
+        assert_matches(result, reference_product(tensor_a, tensor_b, method), result_dimension((4, 4), method),
+                       exact_keys=backend == "sparse")
+
+
+@needs_numpy
+def test_dense_groups_split_by_shape_and_memory(monkeypatch):
+    tensor_a = Tensor.random((3,) * 3, 1.0, 1)
+    tensors_b = [Tensor.random((3,) * 3, 1.0, seed) for seed in (2, 3, 4)] + [Tensor.random((2,) * 3, 1.0, 5)]
+    batch = BatchTensorMultiplier(tensor_a, 5, "dense")
+    assert [len(group) for group in batch._groups(tensors_b)] == [3, 1]
+    # Стопка результатов ограничена STACK_BYTES: по одному результату 3x3x3 на группу
+    monkeypatch.setattr(BatchTensorMultiplier, 'STACK_BYTES', 8 * 27)
+    assert [len(group) for group in batch._groups(tensors_b)] == [1, 1, 1, 1]
+
+
+def test_progress_and_errors():
+    tensor_a = Tensor.random((3,) * 3, 0.6, 1)
+    progress = []
+    monitor = ProgressMonitor(callback=progress.append)
+    TensorOperations.multiply_batch(tensor_a, [Tensor.random((3,) * 3, 0.6, seed) for seed in (2, 3)], 5,
+                                    monitor=monitor)
+    assert progress[0] == 0.0 and progress[-1] == 1.0
+    with pytest.raises(ValueError):
+        BatchTensorMultiplier(tensor_a, 5, "blocked")
+    with pytest.raises(ValueError):
+        BatchTensorMultiplier(tensor_a, 1, "sparse").multiply(Tensor.random((3,), 1.0, 2))
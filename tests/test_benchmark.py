@@ -0,0 +1,43 @@
+"""Набор замеров benchmark.py: сетка случаев, отчёт JSON и сравнение прогонов"""
+import json
+
+import benchmark
+
+
+def run(tmp_path, *arguments):
+    output = tmp_path / "report.json"
+    code = benchmark.main(["--sizes", "3", "--densities", "1", "0.5", "--repeats", "1", "--warmup", "0",
+                           "--output", str(output)] + list(arguments))
+    return code, json.loads(output.read_text(encoding='utf-8'))
+
+
+def test_grid_covers_every_combination(tmp_path):
+    code, report = run(tmp_path, "--methods", "1", "5", "--dimension-types", "square", "4d_3d",
+                       "--storages", "dict", "coo")
+    assert code == 0
+    assert report['format'] == benchmark.FORMAT_VERSION
+    assert len(report['cases']) == 2 * 2 * 2 * 2
+    assert len({benchmark.case_key(case) for case in report['cases']}) == len(report['cases'])
+    for case in report['cases']:
+        assert case['pairs'] == case['features']['pairs']
+        assert len(case['times']) == 1 and case['best'] > 0
+        assert case['peak_memory'] > 0
+
+
+def test_case_key_keeps_old_float64_keys():
+    case = dict(method=1, dimension_type='4d', size=8, density=0.1, backend='sparse', storage='dict', workers=1)
+    assert benchmark.case_key(case) == "m1:4d:n8:d0.1:sparse:dict:w1"
+    assert benchmark.case_key(dict(case, dtype='float32')).endswith(":float32")
+
+
+def test_compare_counts_regressions(tmp_path, capsys):
+    _, report = run(tmp_path, "--methods", "2", "--dimension-types", "square")
+    slower = json.loads(json.dumps(report))
+    faster = json.loads(json.dumps(report))
+    for case in slower['cases']:
+        case['median'] *= 2
+    for case in faster['cases']:
+        case['median'] /= 2
+    assert benchmark.compare(slower, report, 0.1) == len(report['cases'])
+    assert benchmark.compare(faster, report, 0.1) == 0
+    assert "РЕГРЕССИЯ" in capsys.readouterr().out
@@ -0,0 +1,55 @@
+"""Блочный режим: результат собирается по блокам на диске и открывается через отображение в память"""
+import os
+
+import pytest
+
+from multiplication_matrix import (
+    BlockedTensorMultiplier, CooStorage, MultiplicationCancelled, MunermanTensorMultiplier, ProgressMonitor,
+    TensorFile, TensorOperations,
+)
+from reference import METHODS, assert_matches, make_pair, reference_product, result_dimension
+
+
+@pytest.mark.parametrize("memory_budget", [512, 1 << 20])
+@pytest.mark.parametrize("storage", ["dict", "coo"])
+@pytest.mark.parametrize("method", METHODS)
+def test_blocked_backend(method, storage, memory_budget):
+    tensor_a, tensor_b = make_pair((4, 4), storage)
+    # Маленький бюджет: результат собирается из многих блоков
+    result = TensorOperations.multiply_tensors(tensor_a, tensor_b, method, "4d", backend="blocked",
+                                               memory_budget=memory_budget)
+    assert result.storage == "coo"
+    assert_matches(result, reference_product(tensor_a, tensor_b, method), result_dimension((4, 4), method))
+    assert result.pairs == MunermanTensorMultiplier.count_pairs(
+        tensor_a, tensor_b, *MunermanTensorMultiplier.METHOD_SIGNATURES[method])
+
+
+@pytest.mark.parametrize("max_rows", [1, 10, 1000])
+def test_blocks_cover_a_on_group_boundaries(max_rows):
+    tensor_a, tensor_b = make_pair((4, 4), "coo")
+    storage_a = tensor_a.data
+    blocks = BlockedTensorMultiplier.plan_blocks(storage_a, tensor_b.get_leading_index(2), 3, 2, max_rows)
+    assert blocks[0][0] == 0 and blocks[-1][1] == len(storage_a)
+    assert all(stop == start for (_, stop), (start, _) in zip(blocks, blocks[1:]))
+    prefixes = list(storage_a.iter_keys(range(3)))
+    # Блок не разрезает строки с общими A[:kept] - они дают одни и те же элементы результата
+    assert all(prefixes[start - 1] != prefixes[start] for start, _ in blocks[1:])
+    if max_rows == 1000:
+        assert len(blocks) == 1
+
+
+def test_result_written_to_path(tmp_path):
+    tensor_a, tensor_b = make_pair((3, 3), "coo")
+    path = str(tmp_path / f"result{TensorFile.EXTENSION}")
+    result = BlockedTensorMultiplier.contracted_product(tensor_a, tensor_b, 0, 1, memory_budget=256, path=path)
+    assert isinstance(result.data, CooStorage)
+    assert os.path.exists(path)
+    assert dict(TensorFile.load(path).data.items()) == dict(result.data.items())
+
+
+def test_cancel_between_blocks():
+    tensor_a, tensor_b = make_pair((4, 4))
+    monitor = ProgressMonitor()
+    monitor.cancel()
+    with pytest.raises(MultiplicationCancelled):
+        BlockedTensorMultiplier.contracted_product(tensor_a, tensor_b, 1, 1, memory_budget=512, monitor=monitor)
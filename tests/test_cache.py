@@ -0,0 +1,77 @@
+"""Кэш результатов по содержимому тензоров (ResultCache)"""
+import os
+
+from multiplication_matrix import ResultCache, Tensor, TensorFile, TensorOperations
+from reference import assert_matches, make_pair, needs_numpy, reference_product
+
+
+def test_hit_returns_cached_result():
+    tensor_a, tensor_b = make_pair((4, 4))
+    cache = ResultCache()
+    first = TensorOperations.multiply_tensors(tensor_a, tensor_b, 5, "4d", cache=cache)
+    # Другие объекты с тем же содержимым дают тот же ключ
+    copy_a, copy_b = make_pair((4, 4))
+    assert TensorOperations.multiply_tensors(copy_a, copy_b, 5, "4d", cache=cache) is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_key_follows_content_storage_and_method():
+    tensor_a, tensor_b = make_pair((3, 3))
+    key = ResultCache.make_key(tensor_a, tensor_b, 2, "square")
+    assert ResultCache.make_key(tensor_a, tensor_b, 5, "square") != key
+    assert ResultCache.make_key(tensor_a.convert_storage("coo"), tensor_b, 2, "square") != key
+    tensor_a.add_value((0, 0, 0), 123.0)
+    assert ResultCache.make_key(tensor_a, tensor_b, 2, "square") != key
+
+
+@needs_numpy
+def test_cache_keeps_backends_apart():
+    tensor_a, tensor_b = make_pair((4, 4), density=0.2)
+    cache = ResultCache()
+    dense = TensorOperations.multiply_tensors(tensor_a, tensor_b, 5, "4d", backend="dense", cache=cache)
+    sparse = TensorOperations.multiply_tensors(tensor_a, tensor_b, 5, "4d", backend="sparse", cache=cache)
+    assert sparse is not dense
+    assert_matches(sparse, reference_product(tensor_a, tensor_b, 5), 5)
+
+
+def test_lru_eviction_by_size():
+    tensors = [Tensor.random((4, 4), 1.0, seed) for seed in range(3)]
+    size = tensors[0].memory_size()
+    cache = ResultCache(max_bytes=2 * size)
+    for number, tensor in enumerate(tensors[:2]):
+        cache.put(f"k{number}", tensor)
+    cache.get("k0")                      # k0 использован недавно - вытесняется k1
+    cache.put("k2", tensors[2])
+    assert len(cache) == 2
+    assert cache.get("k1") is None and cache.get("k0") is tensors[0]
+    cache.put("huge", Tensor.random((40, 40), 1.0, 1))
+    assert cache.get("huge") is None
+
+
+def test_mapped_result_has_memory_size(tmp_path):
+    path = str(tmp_path / f"t{TensorFile.EXTENSION}")
+    tensor = Tensor.random((4, 4), 0.5, 1, "coo")
+    TensorFile.save(tensor, path)
+    assert TensorFile.load(path).memory_size() == tensor.memory_size() > 0
+
+
+def test_disk_level_survives_restart(tmp_path):
+    tensor_a, tensor_b = make_pair((3, 3))
+    directory = str(tmp_path / "cache")
+    result = TensorOperations.multiply_tensors(tensor_a, tensor_b, 2, "square", cache=ResultCache(directory=directory))
+    restarted = ResultCache(directory=directory)
+    cached = TensorOperations.multiply_tensors(tensor_a, tensor_b, 2, "square", cache=restarted)
+    assert restarted.hits == 1
+    assert dict(cached.data.items()) == dict(result.data.items())
+
+
+def test_disk_level_trimmed(tmp_path):
+    directory = str(tmp_path / "cache")
+    tensor = Tensor.random((8, 8), 1.0, 1)
+    file_size = len(TensorFile.to_bytes(tensor))
+    cache = ResultCache(directory=directory, max_disk_bytes=2 * file_size)
+    for number in range(4):
+        cache.put(f"k{number}", tensor)
+    assert len(os.listdir(directory)) == 2
+    cache.discard("k3")
+    assert len(os.listdir(directory)) == 1
@@ -0,0 +1,63 @@
+"""Цепочки свернутых произведений: выбор порядка (ContractionChain) и результат multiply_chain"""
+import pytest
+
+from multiplication_matrix import ContractionChain, Tensor, TensorOperations
+from reference import METHODS, assert_matches, reference_product
+
+
+def left_to_right(tensors, methods):
+    """Эталон цепочки: произведения по определению в записанном порядке"""
+    result = tensors[0]
+    for tensor, method in zip(tensors[1:], methods):
+        product = reference_product(result, tensor, method)
+        dimension = len(next(iter(product))) if product else 0
+        result = Tensor(dimension, product)
+    return result
+
+
+def test_chain():
+    tensors = [Tensor.random((3,) * 3, 0.6, seed) for seed in (1, 2, 3)]
+    result = TensorOperations.multiply_chain(tensors, [2, 2])
+    first = Tensor(4, reference_product(tensors[0], tensors[1], 2))
+    assert_matches(result, reference_product(first, tensors[2], 2), 5)
+
+
+def test_reorders_matrix_chain():
+    # Метод 2 на матрицах - обычное произведение: (20x20 · 20x20) · 20x1 дороже, чем 20x20 · (20x20 · 20x1)
+    tensors = [Tensor.random((20, 20), 1.0, 1), Tensor.random((20, 20), 1.0, 2), Tensor.random((20, 1), 1.0, 3)]
+    chain = ContractionChain(tensors, [2, 2])
+    tree, cost = chain.plan()
+    assert tree == (0, 2, (1, 2, 2))
+    assert ContractionChain.describe(tree, "ABC") == "(A ∘2 (B ∘2 C))"
+    assert cost == pytest.approx(chain.cost(tree)) and cost < chain.cost(chain.left_to_right())
+
+    messages = []
+    result = TensorOperations.multiply_chain(tensors, [2, 2], log=messages.append)
+    assert "(T1 ∘2 (T2 ∘2 T3))" in messages[0]
+    assert_matches(result, left_to_right(tensors, [2, 2]).data, 2, exact_keys=False)
+
+
+def test_keeps_written_order_when_cheaper():
+    tensors = [Tensor.random((1, 20), 1.0, 1), Tensor.random((20, 20), 1.0, 2), Tensor.random((20, 20), 1.0, 3)]
+    chain = ContractionChain(tensors, [2, 2])
+    assert chain.plan()[0] == chain.left_to_right() == ((0, 2, 1), 2, 2)
+
+
+@pytest.mark.parametrize("second", METHODS)
+@pytest.mark.parametrize("first", METHODS)
+def test_planned_order_gives_written_result(first, second):
+    # Порядок выбирается только среди тех, что дают тот же тензор, что и запись слева направо
+    tensors = [Tensor.random((3,) * 3, 0.6, seed) for seed in (1, 2, 3)]
+    expected = left_to_right(tensors, [first, second])
+    result = ContractionChain(tensors, [first, second]).execute()
+    assert_matches(result, expected.data, expected.dimension or result.dimension)
+
+
+def test_invalid_chain():
+    tensor = Tensor.random((3, 3), 1.0, 1)
+    with pytest.raises(ValueError):
+        ContractionChain([tensor], [])
+    with pytest.raises(ValueError):
+        ContractionChain([tensor, tensor], [7])
+    with pytest.raises(ValueError):
+        ContractionChain([tensor, tensor, tensor], [1, 1]).plan()
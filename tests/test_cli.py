@@ -0,0 +1,80 @@
+"""Режим командной строки (BatchRunner): одно умножение, манифест заданий и отчёт"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from multiplication_matrix import BatchRunner, SokolovFormatter, SokolovParser, Tensor, TensorFile
+from reference import assert_matches, reference_product
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    tensor_a = Tensor.random((3, 3, 3), 0.6, 1)
+    tensor_b = Tensor.random((3, 3, 3), 0.6, 2)
+    (tmp_path / "a.txt").write_text(SokolovFormatter.format_tensor(tensor_a), encoding='utf-8')
+    TensorFile.save(tensor_b, str(tmp_path / f"b{TensorFile.EXTENSION}"))
+    return tensor_a, tensor_b
+
+
+def write_manifest(tmp_path, jobs):
+    path = tmp_path / "jobs.json"
+    path.write_text(json.dumps({"defaults": {"method": 2}, "jobs": jobs}), encoding='utf-8')
+    return str(path)
+
+
+def test_multiply_command(tmp_path, inputs):
+    output = str(tmp_path / f"c{TensorFile.EXTENSION}")
+    code = BatchRunner.main(["multiply", str(tmp_path / "a.txt"), str(tmp_path / f"b{TensorFile.EXTENSION}"),
+                             "-m", "5", "-o", output])
+    assert code == 0
+    # Нули A, записанные в тексте, хранятся явно - сравниваем значения, а не набор ключей
+    assert_matches(TensorFile.load(output), reference_product(*inputs, 5), 3, exact_keys=False)
+    report = json.loads(open(output + ".report.json", encoding='utf-8').read())
+    assert report['jobs'][0]['status'] == 'ok'
+
+
+def test_batch_manifest_and_report(tmp_path, inputs):
+    manifest = write_manifest(tmp_path, [
+        {"name": "text", "a": "a.txt", "b": f"b{TensorFile.EXTENSION}", "output": "c.txt"},
+        {"name": "missing", "a": "nope.txt", "b": "a.txt", "output": "d.txt"},
+        {"name": "bad", "a": "a.txt", "b": "a.txt", "output": "e.txt", "workers": "many"},
+    ])
+    assert BatchRunner.main(["batch", manifest]) == 1       # есть задания с ошибкой
+    # Текст результата - с двумя знаками после запятой
+    result = SokolovParser.parse((tmp_path / "c.txt").read_text(encoding='utf-8'))
+    expected = reference_product(*inputs, 2)
+    assert result.dimension == 4
+    assert all(value == pytest.approx(expected.get(key, 0), abs=0.005) for key, value in result.data.items())
+
+    report = json.loads((tmp_path / "jobs.report.json").read_text(encoding='utf-8'))
+    assert 'process_peak_rss' in report
+    jobs = {job['name']: job for job in report['jobs']}
+    assert jobs['text']['status'] == 'ok' and jobs['text']['result_shape'] == list(result.get_shape())
+    assert jobs['missing']['status'] == 'error'
+    assert jobs['bad']['status'] == 'error' and "many" in jobs['bad']['error']
+
+
+def test_manifest_requires_fields(tmp_path):
+    with pytest.raises(ValueError):
+        BatchRunner.read_manifest(write_manifest(tmp_path, [{"a": "a.txt"}]))
+
+
+def test_runs_without_tkinter(tmp_path, inputs):
+    # Сервер без дисплея: tkinter не установлен, а режим командной строки должен работать
+    manifest = write_manifest(tmp_path, [{"a": "a.txt", "b": f"b{TensorFile.EXTENSION}", "output": "c.txt"}])
+    script = ("import sys; sys.modules['tkinter'] = None; sys.path.insert(0, sys.argv[1]); "
+              "import multiplication_matrix as m; sys.exit(m.main(['batch', sys.argv[2]]))")
+    completed = subprocess.run([sys.executable, "-c", script, ROOT, manifest], capture_output=True, text=True,
+                               timeout=120)
+    assert completed.returncode == 0, completed.stderr
+    assert (tmp_path / "c.txt").exists()
+
+    script = ("import sys; sys.modules['tkinter'] = None; sys.path.insert(0, sys.argv[1]); "
+              "import multiplication_matrix as m; sys.exit(m.main([]))")
+    completed = subprocess.run([sys.executable, "-c", script, ROOT], capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 2 and "tkinter" in completed.stderr
@@ -0,0 +1,57 @@
+"""Модель стоимости режима auto: калибровка по отчёту benchmark.py и выбор ядра"""
+import json
+
+import pytest
+
+from multiplication_matrix import CostModel, Tensor
+from reference import needs_numpy
+
+
+def synthetic_case(backend, storage, pairs, rows, seconds=None, workers=1):
+    features = {'pairs': pairs, 'nnz_a': rows // 2, 'result_nnz': rows - rows // 2}
+    if seconds is None:
+        seconds = 2e-7 * pairs + 1e-6 * rows
+    return {'backend': backend, 'storage': storage, 'workers': workers, 'best': seconds, 'features': features}
+
+
+def test_from_benchmark_fits_coefficients(tmp_path):
+    sizes = [(1000, 100), (5000, 2000), (20000, 300)]
+    cases = [synthetic_case('sparse', 'dict', pairs, rows) for pairs, rows in sizes]
+    cases += [
+        synthetic_case('sparse', 'dict', 1000, 100, seconds=5.0, workers=4),   # многопроцессный - не учитывается
+        synthetic_case('auto', 'dict', 1000, 100, seconds=5.0),               # режим auto не моделируется
+        {'backend': 'sparse', 'storage': 'dict', 'workers': 1, 'best': 5.0},  # нет характеристик
+    ]
+    path = tmp_path / "calibration.json"
+    path.write_text(json.dumps({'format': 1, 'cases': cases}), encoding='utf-8')
+
+    model = CostModel.from_benchmark(path)
+    k1, k2 = model.coefficients['dict']
+    assert k1 == pytest.approx(2e-7) and k2 == pytest.approx(1e-6)
+    # Ядра без замеров сохраняют коэффициенты по умолчанию
+    assert model.coefficients['coo'] == CostModel.DEFAULT_COEFFICIENTS['coo']
+    assert model.coefficients['dense'] == CostModel.DEFAULT_COEFFICIENTS['dense']
+
+
+@needs_numpy
+def test_full_tensors_choose_dense():
+    tensor_a = Tensor.random((8,) * 4, 1.0, 1)
+    tensor_b = Tensor.random((8,) * 4, 1.0, 2)
+    kernel, seconds, candidates = CostModel().choose(CostModel.estimate(tensor_a, tensor_b, 5))
+    assert kernel == 'dense' and seconds == min(candidates.values())
+
+
+def test_very_sparse_tensors_choose_sparse_kernel():
+    tensor_a = Tensor.random((30,) * 4, 0.0005, 1)
+    tensor_b = Tensor.random((30,) * 4, 0.0005, 2)
+    kernel, _, _ = CostModel().choose(CostModel.estimate(tensor_a, tensor_b, 5))
+    assert kernel in ('dict', 'coo')
+
+
+def test_over_budget_chooses_blocked():
+    tensor_a = Tensor.random((8,) * 4, 1.0, 1)
+    tensor_b = Tensor.random((8,) * 4, 1.0, 2)
+    features = CostModel.estimate(tensor_a, tensor_b, 5)
+    kernel, _, candidates = CostModel().choose(features, memory_limit=1000)
+    # Только блочному ядру не нужна память под результат
+    assert kernel == 'blocked' and list(candidates) == ['blocked']
@@ -0,0 +1,49 @@
+"""Плотный режим: numpy-версии методов и преобразования Tensor <-> массив"""
+import pytest
+
+from multiplication_matrix import Tensor, TensorOperations, np
+from reference import (
+    DIMENSIONS, METHODS, assert_matches, make_pair, needs_numpy, reference_product, result_dimension,
+)
+
+pytestmark = needs_numpy
+
+
+@pytest.mark.parametrize("dimensions", DIMENSIONS)
+@pytest.mark.parametrize("method", METHODS)
+def test_dense_backend(method, dimensions):
+    tensor_a, tensor_b = make_pair(dimensions)
+    result = TensorOperations.multiply_tensors(tensor_a, tensor_b, method, "x", backend="dense")
+    assert_matches(result, reference_product(tensor_a, tensor_b, method), result_dimension(dimensions, method),
+                   exact_keys=False)
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo", "dense"])
+def test_array_round_trip(storage):
+    tensor = Tensor.random((2, 3, 4), 0.5, 1, storage)
+    dense = tensor.to_array()
+    assert dense.shape == (2, 3, 4)
+    for key, value in tensor.data.items():
+        assert dense[key] == value
+    back = Tensor.from_array(dense, storage)
+    assert back.storage == storage
+    assert np.array_equal(back.to_array(), dense)
+
+
+@pytest.mark.parametrize("dtype", ['float32', 'int64'])
+def test_from_array_keeps_dtype(dtype):
+    assert Tensor.from_array(np.ones((2, 2), dtype=dtype)).dtype == dtype
+
+
+def test_empty_tensor_to_array_keeps_dimension():
+    assert Tensor(3).to_array().shape == (0, 0, 0)
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_different_index_ranges_are_cropped(method):
+    # Диапазоны стыкуемых индексов A и B различаются - плотный режим берёт общий диапазон
+    tensor_a = Tensor.random((4, 2, 3), 1.0, 1)
+    tensor_b = Tensor.random((2, 4, 3), 1.0, 2)
+    result = TensorOperations.multiply_tensors(tensor_a, tensor_b, method, "square", backend="dense")
+    assert_matches(result, reference_product(tensor_a, tensor_b, method), result_dimension((3, 3), method),
+                   exact_keys=False)
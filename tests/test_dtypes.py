@@ -0,0 +1,64 @@
+"""Типы значений тензоров: float64, float32 и int64 в хранилищах, ядрах и результатах"""
+import pytest
+
+from multiplication_matrix import Tensor, TensorOperations
+from reference import METHODS, assert_matches, make_pair, needs_numpy, reference_product
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo", "dense"])
+def test_astype_round_trip(storage):
+    tensor = Tensor.random((3, 3, 3), 0.6, 1, storage, dtype='int64')
+    back = tensor.astype('float64').astype('float32').astype('int64')
+    assert back.dtype == 'int64'
+    assert dict(back.data.items()) == dict(tensor.data.items())
+    with pytest.raises(ValueError):
+        Tensor.random((3, 3), 1.0, 1, storage).astype('int64')   # дробные значения
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_float32_same_in_every_storage(method):
+    tensor_a, tensor_b = make_pair((4, 4), dtype='float32')
+    results = [TensorOperations.multiply_tensors(tensor_a.convert_storage(storage), tensor_b, method, "4d")
+               for storage in ("dict", "coo")]
+    assert all(result.dtype == 'float32' for result in results)
+    assert dict(results[0].data.items()) == dict(results[1].data.items())
+
+
+@pytest.mark.parametrize("dtypes, expected", [(('int64', 'int64'), 'int64'), (('float32', 'float32'), 'float32'),
+                                              (('float32', 'int64'), 'float64')])
+def test_result_dtype(dtypes, expected):
+    tensor_a = Tensor.random((3,) * 3, 0.6, 1, dtype=dtypes[0])
+    tensor_b = Tensor.random((3,) * 3, 0.6, 2, dtype=dtypes[1])
+    result = TensorOperations.multiply_tensors(tensor_a, tensor_b, 2, "square")
+    assert result.dtype == expected
+    assert_matches(result, reference_product(tensor_a, tensor_b, 2), 4)
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo"])
+def test_int64_overflow(storage):
+    tensor_a = Tensor(2, {(0, 0): 2 ** 62, (0, 1): 2 ** 62}, storage=storage, dtype='int64')
+    tensor_b = Tensor(2, {(0, 0): 4, (1, 0): 4}, storage=storage, dtype='int64')
+    with pytest.raises(ValueError):
+        TensorOperations.multiply_tensors(tensor_a, tensor_b, 2, "square")
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo", "dense"])
+def test_add_value_fits_dtype(storage):
+    tensor = Tensor.random((2, 2), 1.0, 1, storage, dtype='float32')
+    tensor.add_value((0, 0), 0.1)
+    assert tensor.get_value((0, 0)) == pytest.approx(0.1, rel=1e-7) and tensor.get_value((0, 0)) != 0.1
+    integer = Tensor.random((2, 2), 1.0, 1, storage, dtype='int64')
+    with pytest.raises(ValueError):
+        integer.add_value((0, 0), 2 ** 63)
+    assert integer.get_value((0, 0)) < 2 ** 63
+
+
+@needs_numpy
+@pytest.mark.parametrize("dtype", ["float32", "int64"])
+def test_dense_backend_keeps_dtype(dtype):
+    tensor_a, tensor_b = make_pair((3, 3), dtype=dtype)
+    result = TensorOperations.multiply_tensors(tensor_a, tensor_b, 5, "square", backend="dense")
+    sparse = TensorOperations.multiply_tensors(tensor_a, tensor_b, 5, "square")
+    assert result.dtype == sparse.dtype == dtype
+    assert sparse.accumulation_dtype == ('int64' if dtype == 'int64' else 'float64')
+    assert_matches(result, reference_product(tensor_a, tensor_b, 5), 3, exact_keys=False)
@@ -0,0 +1,184 @@
+"""Обновление результата по правке элементов: update_product, PatchedStorage и правка индексов на месте"""
+import queue
+import random
+
+import pytest
+
+from multiplication_matrix import (CooStorage, DenseStorage, MatrixApp, MunermanTensorMultiplier, PatchedStorage,
+                                   ProgressMonitor, Tensor, TensorOperations)
+from reference import DIMENSIONS, METHODS, reference_product
+
+
+def make_inputs(dimensions, storage):
+    # Целые значения от 1: суммы точные и не обращаются в ноль, поэтому ключи сравниваются точно
+    return (Tensor.random((3,) * dimensions[0], 0.6, 1, storage, low=1, dtype='int64'),
+            Tensor.random((3,) * dimensions[1], 0.6, 2, storage, low=1, dtype='int64'))
+
+
+def multiply(tensor_a, tensor_b, method, **options):
+    dimension_type = TensorOperations.get_dimension_type(tensor_a, tensor_b)
+    return TensorOperations.multiply_tensors(tensor_a, tensor_b, method, dimension_type, **options)
+
+
+def edit(tensor, rng, count=3):
+    """count правок по кругу: изменение, вставка нового элемента, удаление; возвращает тензор изменений"""
+    deltas = {}
+    for number in range(count):
+        keys = list(tensor.data.keys())
+        if number % 3 == 1:
+            key = tuple(rng.randrange(size + 1) for size in tensor.get_shape())
+            while key in tensor.data:
+                key = tuple(rng.randrange(size + 1) for size in tensor.get_shape())
+        else:
+            key = rng.choice(keys)
+        old_value = tensor.get_value(key)
+        if number % 3 == 2:
+            tensor.remove_value(key)
+        else:
+            tensor.add_value(key, rng.randint(1, 9))
+        deltas[key] = deltas.get(key, 0) + tensor.get_value(key) - old_value
+    return Tensor(tensor.dimension, deltas, dtype=MunermanTensorMultiplier.accumulation_dtype(tensor.dtype))
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo"])
+@pytest.mark.parametrize("dimensions", DIMENSIONS)
+@pytest.mark.parametrize("method", METHODS)
+def test_update_matches_full_recompute(method, dimensions, storage):
+    tensor_a, tensor_b = make_inputs(dimensions, storage)
+    rng = random.Random(method)
+    result = multiply(tensor_a, tensor_b, method)
+    for _ in range(2):
+        before = dict(result.data.items())
+        delta_a, delta_b = edit(tensor_a, rng), edit(tensor_b, rng)
+        updated = TensorOperations.update_product(result, tensor_a, tensor_b, delta_a, delta_b, method,
+                                                  max_fraction=1.0)
+        assert updated is not None and updated is not result
+        # Ключи совпадают точно: элементы, ставшие нулём, удалены
+        assert dict(updated.data.items()) == reference_product(tensor_a, tensor_b, method)
+        assert updated.nnz() == len(dict(updated.data.items()))
+        assert dict(result.data.items()) == before    # прошлый результат не тронут
+        result = updated
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_update_float_values(method):
+    tensor_a = Tensor.random((3, 3, 3, 3), 0.6, 1)
+    tensor_b = Tensor.random((3, 3, 3, 3), 0.6, 2)
+    result = multiply(tensor_a, tensor_b, method)
+    updated = TensorOperations.update_product(result, tensor_a, tensor_b, edit(tensor_a, random.Random(1)),
+                                              None, method, max_fraction=1.0)
+    expected = reference_product(tensor_a, tensor_b, method)
+    values = dict(updated.data.items())
+    for key in set(values) | set(expected):
+        assert values.get(key, 0) == pytest.approx(expected.get(key, 0), abs=1e-9), key
+
+
+def test_small_update_patches_without_copy():
+    tensor_a = Tensor.random((6, 6, 6), 1.0, 1, "coo", low=1, dtype='int64')
+    tensor_b = Tensor.random((6, 6, 6), 1.0, 2, "coo", low=1, dtype='int64')
+    result = multiply(tensor_a, tensor_b, 5)
+    delta = Tensor(3, {(0, 0, 0): 100 - tensor_a.get_value((0, 0, 0))}, dtype='int64')
+    tensor_a.add_value((0, 0, 0), 100)
+    updated = TensorOperations.update_product(result, tensor_a, tensor_b, delta, None, 5)
+    # Меняется одна строка результата - остальные читаются из прежнего хранилища
+    assert isinstance(updated.data, PatchedStorage) and updated.data.base is result.data
+    assert updated.data.patch_size == 6
+    assert dict(updated.data.items()) == reference_product(tensor_a, tensor_b, 5)
+
+
+def test_fallbacks():
+    tensor_a, tensor_b = make_inputs((3, 3), "dict")
+    result = multiply(tensor_a, tensor_b, 5)
+    everything = Tensor(3, dict(tensor_a.data.items()), dtype='int64')
+    assert TensorOperations.update_product(result, tensor_a, tensor_b, everything, None, 5) is None
+    assert TensorOperations.update_product(tensor_a, tensor_a, tensor_b, None, None, 5) is None
+    lazy = multiply(tensor_a, tensor_b, 4, lazy=True)
+    assert TensorOperations.update_product(lazy, tensor_a, tensor_b, None, None, 4) is None
+    # Без изменений результат тот же по содержимому
+    same = TensorOperations.update_product(result, tensor_a, tensor_b, None, None, 5)
+    assert dict(same.data.items()) == dict(result.data.items())
+
+
+def test_dense_result_keeps_zeros_and_grows():
+    tensor_a, tensor_b = make_inputs((3, 3), "dict")
+    result = multiply(tensor_a, tensor_b, 5).convert_storage("dense")
+    key = next(iter(tensor_a.data))
+    delta = {key: -tensor_a.get_value(key), (3, 0, 0): 5}
+    tensor_a.remove_value(key)
+    tensor_a.add_value((3, 0, 0), 5)
+    updated = TensorOperations.update_product(result, tensor_a, tensor_b, Tensor(3, delta, dtype='int64'), None, 5,
+                                              max_fraction=1.0)
+    expected = reference_product(tensor_a, tensor_b, 5)
+    # Удалённые элементы плотного хранилища остаются нулями, новые вне формы её расширяют
+    assert {key: value for key, value in updated.data.items() if value} == expected
+    assert updated.get_shape()[0] == 4 and len(updated.data.base) == 27
+
+
+def test_patched_storage_copy_on_write():
+    base = CooStorage.from_items(2, [((0, 0), 1.0), ((0, 1), 2.0), ((1, 1), 3.0)])
+    patch = PatchedStorage.over(base)
+    patch[(0, 1)] = 20.0
+    patch[(2, 0)] = 4.0
+    del patch[(1, 1)]
+    assert dict(patch.items()) == {(0, 0): 1.0, (0, 1): 20.0, (2, 0): 4.0}
+    assert len(patch) == 3 and (1, 1) not in patch and patch.get((1, 1), 0) == 0
+    assert dict(base.items()) == {(0, 0): 1.0, (0, 1): 2.0, (1, 1): 3.0}
+
+    # Правка поверх правки не меняет первую
+    second = PatchedStorage.over(patch)
+    second[(1, 1)] = 30.0
+    del second[(2, 0)]
+    assert (1, 1) not in patch and patch[(2, 0)] == 4.0
+    assert dict(second.items()) == {(0, 0): 1.0, (0, 1): 20.0, (1, 1): 30.0}
+    assert second.base is base and len(second) == 3
+
+    dense = PatchedStorage.over(DenseStorage((2,), typecode='d'))
+    dense[(1,)] = 5.0
+    del dense[(1,)]
+    assert dict(dense.items()) == {(0,): 0.0, (1,): 0.0}
+
+
+def test_coo_point_edits_keep_order():
+    storage = CooStorage.from_items(2, [((0, 0), 1.0), ((2, 2), 3.0)])
+    storage[(1, 5)] = 2.0
+    assert storage._sorted
+    del storage[(0, 0)]
+    assert list(storage.items()) == [((1, 5), 2.0), ((2, 2), 3.0)]
+    with pytest.raises(KeyError):
+        del storage[(0, 0)]
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo"])
+def test_indexes_follow_edits(storage):
+    tensor = Tensor.random((3, 3, 3), 0.5, 3, storage)
+    for axis in range(3):
+        tensor.get_axis_index(axis)
+    tensor.get_leading_index(2)
+    tensor.get_join_index(1, 1)
+    rng = random.Random(5)
+    for _ in range(4):
+        edit(tensor, rng)
+    for key in list(tensor.data.keys())[:3]:
+        tensor.remove_value(key)
+
+    fresh = Tensor(3, dict(tensor.data.items())) if storage == "dict" else tensor.copy()
+    assert tensor.get_leading_index(2) == fresh.get_leading_index(2)
+    assert tensor.get_join_index(1, 1) == fresh.get_join_index(1, 1)
+    for axis in range(3):
+        coordinates, keys = tensor.get_axis_index(axis)
+        fresh_coordinates, fresh_keys = fresh.get_axis_index(axis)
+        assert coordinates == fresh_coordinates
+        assert {value: sorted(group) for value, group in keys.items()} == \
+            {value: sorted(group) for value, group in fresh_keys.items()}
+
+
+def test_worker_updates_from_deltas():
+    tensor_a, tensor_b = make_inputs((4, 4), "coo")
+    result = multiply(tensor_a, tensor_b, 5)
+    delta_b = edit(tensor_b, random.Random(2))
+    results = queue.Queue()
+    MatrixApp._multiplication_worker(tensor_a, tensor_b, 5, "4d", "sparse", 1, None, None,
+                                     (result, None, delta_b), ProgressMonitor(), results)
+    kind, updated, _, incremental = results.get_nowait()
+    assert kind == 'done' and incremental
+    assert dict(updated.data.items()) == reference_product(tensor_a, tensor_b, 5)
@@ -0,0 +1,66 @@
+"""Замеры этапов и счётчики умножения (Instrumentation) и отчёт по ним"""
+import json
+
+import pytest
+
+from multiplication_matrix import CostModel, Instrumentation, MunermanTensorMultiplier, ResultCache, TensorOperations
+from reference import METHODS, make_pair, needs_numpy
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_sparse_counters(method):
+    tensor_a, tensor_b = make_pair((4, 4))
+    stats = Instrumentation()
+    result = TensorOperations.multiply_tensors(tensor_a, tensor_b, method, "4d", stats=stats)
+    scott, cayley = MunermanTensorMultiplier.METHOD_SIGNATURES[method]
+    pairs = MunermanTensorMultiplier.count_pairs(tensor_a, tensor_b, scott, cayley)
+    assert stats.counters == {'pairs_examined': pairs, 'pairs_matched': pairs, 'result_nnz': result.nnz()}
+    assert set(stats.phases) == {'multiply'} and stats.phases['multiply'] > 0
+
+
+@needs_numpy
+def test_auto_backend_measures_estimate():
+    tensor_a, tensor_b = make_pair((4, 4), density=1.0)
+    stats = Instrumentation()
+    TensorOperations.multiply_tensors(tensor_a, tensor_b, 5, "4d", backend="auto", stats=stats)
+    assert {'estimate', 'multiply'} <= set(stats.phases)
+    assert stats.counters['pairs_matched'] == CostModel.estimate(tensor_a, tensor_b, 5)['pairs']
+    assert stats.counters['pairs_examined'] >= stats.counters['pairs_matched']
+
+
+def test_cache_phase_and_hits():
+    tensor_a, tensor_b = make_pair((4, 4))
+    cache = ResultCache()
+    TensorOperations.multiply_tensors(tensor_a, tensor_b, 5, "4d", cache=cache)
+    stats = Instrumentation()
+    result = TensorOperations.multiply_tensors(tensor_a, tensor_b, 5, "4d", cache=cache, stats=stats)
+    assert 'cache' in stats.phases and 'multiply' not in stats.phases
+    assert stats.counters == {'cache_hits': 1, 'result_nnz': result.nnz()}
+
+
+def test_report_and_save(tmp_path):
+    tensor_a, tensor_b = make_pair((4, 4))
+    stats = Instrumentation(profile=True)
+    stats.add('parse', 0.5)
+    merged = Instrumentation()
+    merged.merge(stats, 'a')
+    with merged.phase('shape'):
+        pass
+    TensorOperations.multiply_tensors(tensor_a, tensor_b, 2, "4d", stats=merged)
+
+    report = merged.report()
+    assert report.startswith("=== ПРОФИЛЬ ВЫПОЛНЕНИЯ ===")
+    for label in ("матрица A: разбор текста", "определение формы", "умножение", "Всего", "пар рассмотрено"):
+        assert label in report
+    assert merged.total() == pytest.approx(sum(merged.phases.values()))
+
+    saved = json.loads(open(merged.save(str(tmp_path / "run.json"))[0], encoding='utf-8').read())
+    assert saved == json.loads(json.dumps(merged.to_dict()))
+    assert saved['phases']['a.parse'] == 0.5
+
+    # С profile=True рядом с отчётом пишется профиль cProfile
+    with stats.phase('build'):
+        sum(range(1000))
+    text, profile = stats.save(str(tmp_path / "run.txt"))
+    assert open(text, encoding='utf-8').read() == stats.report() + "\n"
+    assert profile.endswith("run.prof") and (tmp_path / "run.prof").stat().st_size > 0
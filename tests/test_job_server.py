@@ -0,0 +1,112 @@
+"""Сервер заданий (JobServer) и клиент (JobClient) через Unix-сокет"""
+import asyncio
+import json
+import threading
+
+import pytest
+
+from multiplication_matrix import JobClient, JobServer, MultiplicationCancelled, ProgressMonitor, Tensor
+from reference import assert_matches, make_pair, reference_product
+
+MAX_UPLOAD = 1 << 20
+
+
+@pytest.fixture(scope="module")
+def address(tmp_path_factory):
+    """Сервер в отдельном потоке со своим циклом asyncio на время тестов модуля"""
+    directory = tmp_path_factory.mktemp("jobs")
+    address = f"unix:{directory / 'server.sock'}"
+    server = JobServer(max_jobs=1, spool_directory=str(directory), log=lambda message: None,
+                       max_upload=MAX_UPLOAD)
+    loop = asyncio.new_event_loop()
+    started = asyncio.Event()
+    task = loop.create_task(server.serve(address, started))
+    ready = threading.Event()
+    loop.create_task(started.wait()).add_done_callback(lambda _: ready.set())
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert ready.wait(timeout=60)
+    yield address
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join(timeout=60)
+    loop.close()
+
+
+def exchange(address, raw):
+    """Отправка сырых байтов и чтение ответа сервера"""
+    async def request():
+        reader, writer = await asyncio.open_unix_connection(address[len("unix:"):])
+        try:
+            writer.write(raw)
+            await writer.drain()
+            return await JobServer.read_header(reader)
+        finally:
+            writer.close()
+    return asyncio.run(request())
+
+
+def frame(header):
+    encoded = json.dumps(header).encode('utf-8')
+    return JobServer.FRAME.pack(len(encoded)) + encoded
+
+
+def test_round_trip(address):
+    tensor_a, tensor_b = make_pair((4, 4), "coo")
+    messages = []
+    progress = []
+    result = JobClient(address).multiply(tensor_a, tensor_b, 5, monitor=ProgressMonitor(progress.append),
+                                         log=messages.append)
+    assert_matches(result, reference_product(tensor_a, tensor_b, 5), 5)
+    assert result.accumulation_dtype == 'float64'
+    assert any("выполняется" in message for message in messages)
+    assert any("расчёт занял" in message for message in messages)
+    status = JobClient(address).status()
+    assert status['type'] == 'status' and status['running'] == 0 and status['max_jobs'] == 1
+
+
+def test_result_to_file(address, tmp_path):
+    tensor_a, tensor_b = make_pair((3, 3), dtype='int64')
+    path = str(tmp_path / "result.munt")
+    result = JobClient(address).multiply(tensor_a, tensor_b, 2, path=path)
+    assert result.dtype == 'int64'
+    assert_matches(result, reference_product(tensor_a, tensor_b, 2), 4)
+
+
+def test_cancel(address):
+    # Миллионы пар - задание не успеет закончиться; отмена запрошена ещё до отправки
+    tensor_a = Tensor.random((12,) * 4, 1.0, 1)
+    tensor_b = Tensor.random((12,) * 4, 1.0, 2)
+    monitor = ProgressMonitor()
+    monitor.cancel()
+    with pytest.raises(MultiplicationCancelled):
+        JobClient(address).multiply(tensor_a, tensor_b, 5, monitor=monitor)
+    # После отмены сервер принимает следующие задания
+    tensor_a, tensor_b = make_pair((3, 3))
+    assert_matches(JobClient(address).multiply(tensor_a, tensor_b, 2), reference_product(tensor_a, tensor_b, 2), 4)
+
+
+def test_errors_are_reported(address):
+    client = JobClient(address)
+    tensor_a, tensor_b = make_pair((3, 3))
+    with pytest.raises(ValueError, match="Неизвестный метод"):
+        client.multiply(tensor_a, tensor_b, 9)
+    # Ошибка в процессе пула: методу 1 не хватает индексов у одномерного A
+    with pytest.raises(ValueError, match="Сервер заданий"):
+        client.multiply(Tensor(1, {(0,): 1.0}), tensor_b, 1)
+    assert exchange(address, frame({'type': 'unknown'}))['type'] == 'error'
+
+
+def test_oversized_frames_rejected(address):
+    reply = exchange(address, JobServer.FRAME.pack(JobServer.MAX_HEADER_BYTES + 1))
+    assert reply['type'] == 'error' and str(JobServer.MAX_HEADER_BYTES) in reply['message']
+    reply = exchange(address, frame({'type': 'multiply', 'method': 5, 'sizes': [MAX_UPLOAD + 1, 10]}))
+    assert reply['type'] == 'error' and "больше допустимых" in reply['message']
+    reply = exchange(address, frame({'type': 'multiply', 'method': 5, 'sizes': [-1, 10]}))
+    assert reply['type'] == 'error'
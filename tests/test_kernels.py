@@ -0,0 +1,48 @@
+"""Ядра MunermanTensorMultiplier с соединением по хэш-индексу B"""
+import pytest
+
+from multiplication_matrix import MunermanTensorMultiplier, Tensor
+from reference import DIMENSIONS, METHODS, assert_matches, make_pair, reference_product, result_dimension
+
+KERNEL_NAMES = {1: "method1_cayley", 2: "method2_cayley", 3: "method3_scott", 4: "method4_scott",
+                5: "method5_combined"}
+SUFFIXES = {(3, 3): "square", (4, 4): "4d", (3, 4): "3d_4d", (4, 3): "4d_3d"}
+
+
+def kernel(method, dimensions):
+    return getattr(MunermanTensorMultiplier, f"{KERNEL_NAMES[method]}_{SUFFIXES[dimensions]}")
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo"])
+@pytest.mark.parametrize("dimensions", DIMENSIONS)
+@pytest.mark.parametrize("method", METHODS)
+def test_kernel_matches_reference(method, dimensions, storage):
+    tensor_a, tensor_b = make_pair(dimensions, storage)
+    result = kernel(method, dimensions)(tensor_a, tensor_b)
+    assert_matches(result, reference_product(tensor_a, tensor_b, method), result_dimension(dimensions, method))
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_kernel_rejects_other_dimensions(method):
+    tensor_a, tensor_b = make_pair((4, 4))
+    with pytest.raises(ValueError):
+        kernel(method, (3, 3))(tensor_a, tensor_b)
+
+
+def test_leading_index_groups_b_by_joined_indices():
+    tensor_b = Tensor(3, {(0, 1, 2): 1.0, (0, 1, 0): 2.0, (1, 0, 0): 3.0})
+    index = tensor_b.get_leading_index(2)
+    assert sorted(index) == [(0, 1), (1, 0)]
+    assert sorted(index[0, 1]) == [((0,), 2.0), ((2,), 1.0)]
+    # Индекс строится один раз и сбрасывается при изменении тензора
+    assert tensor_b.get_leading_index(2) is index
+    tensor_b.add_value((1, 0, 1), 4.0)
+    assert sorted(tensor_b.get_leading_index(2)[1, 0]) == [((0,), 3.0), ((1,), 4.0)]
+
+
+def test_sparse_inputs_without_matches():
+    # Ни один ключ стыковки A не встречается в B - результат пуст
+    tensor_a = Tensor(3, {(0, 0, 0): 1.0})
+    tensor_b = Tensor(3, {(1, 1, 1): 1.0})
+    result = MunermanTensorMultiplier.method1_cayley_square(tensor_a, tensor_b)
+    assert result.nnz() == 0 and result.dimension == 2
@@ -0,0 +1,48 @@
+"""Отложенный результат методов без свёртки (LazyScottStorage)"""
+import pytest
+
+from multiplication_matrix import LazyScottStorage, MunermanTensorMultiplier, Tensor, TensorOperations
+from reference import assert_matches, make_pair, reference_product, result_dimension
+
+
+@pytest.mark.parametrize("method", [3, 4])
+def test_lazy_result(method):
+    tensor_a, tensor_b = make_pair((4, 3), "coo")
+    result = TensorOperations.multiply_tensors(tensor_a, tensor_b, method, "4d_3d", lazy=True)
+    assert result.storage == "lazy"
+    assert_matches(result.convert_storage("dict"), reference_product(tensor_a, tensor_b, method),
+                   result_dimension((4, 3), method))
+
+
+@pytest.mark.parametrize("method", [3, 4])
+def test_reads_without_counting(method):
+    tensor_a, tensor_b = make_pair((3, 3))
+    result = TensorOperations.multiply_tensors(tensor_a, tensor_b, method, "square", lazy=True)
+    expected = reference_product(tensor_a, tensor_b, method)
+    # Проверка пустоты, форма, отдельные элементы и срезы не считают все пары
+    assert result.data and not result.data.counted
+    assert result.get_shape() and not result.data.counted
+    key = next(iter(expected))
+    assert result.get_value(key) == expected[key] and key in result.data
+    assert sorted(result.get_slice({0: key[0]})) == sorted(item for item in expected.items() if item[0][0] == key[0])
+    assert not result.data.counted
+    # Число элементов считается один раз
+    assert len(result.data) == len(expected) and result.data.counted
+    assert result.nnz() == len(expected)
+
+
+def test_empty_and_errors():
+    tensor_a, tensor_b = make_pair((3, 3))
+    disjoint = Tensor(3, {(5, 5, 5): 1.0})
+    # Скоттовы индексы не совпали ни разу: результат пуст, хотя множители - нет
+    result = TensorOperations.multiply_tensors(tensor_a, disjoint, 3, "square", lazy=True)
+    assert not result.data and not result.data.counted
+    assert len(result.data) == 0 and not result.data
+    assert TensorOperations.multiply_tensors(Tensor(3), tensor_b, 4, "square", lazy=True).nnz() == 0
+
+    lazy = MunermanTensorMultiplier.lazy_product(tensor_a, tensor_b, 2)
+    assert isinstance(lazy.data, LazyScottStorage)
+    with pytest.raises(TypeError):
+        lazy.add_value((0,) * lazy.dimension, 1.0)
+    with pytest.raises(ValueError):
+        TensorOperations.multiply_tensors(tensor_a, tensor_b, 5, "square", lazy=True)
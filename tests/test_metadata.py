@@ -0,0 +1,33 @@
+"""Метаданные тензора: форма и индексы по осям, которые поддерживает add_value"""
+import pytest
+
+from multiplication_matrix import Tensor
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo"])
+def test_shape_grows_with_add_value(storage):
+    tensor = Tensor(3, storage=storage)
+    assert tensor.get_shape() == ()
+    tensor.add_value((1, 0, 2), 1.0)
+    assert tensor.get_shape() == (2, 1, 3)
+    tensor.add_value((0, 4, 0), 2.0)
+    assert tensor.get_shape() == (2, 5, 3)
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo"])
+def test_axis_index_follows_add_value(storage):
+    tensor = Tensor(2, {(0, 3): 1.0, (2, 1): 2.0}, storage=storage)
+    assert tensor.get_axis_values(1) == [1, 3]
+    tensor.add_value((5, 2), 3.0)
+    tensor.add_value((0, 3), 4.0)           # замена значения не дублирует ключ в индексе
+    coordinates, keys = tensor.get_axis_index(1)
+    assert coordinates == [1, 2, 3]
+    assert keys[3] == [(0, 3)]
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo"])
+def test_get_slice(storage):
+    tensor = Tensor.random((3, 3, 3), 0.7, 1, storage)
+    expected = sorted((key, value) for key, value in tensor.data.items() if key[0] == 1 and key[2] == 2)
+    assert sorted(tensor.get_slice({0: 1, 2: 2})) == expected
+    assert sorted(tensor.get_slice({})) == sorted(tensor.data.items())
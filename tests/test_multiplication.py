@@ -0,0 +1,56 @@
+"""Проверка свернутых произведений Мунермана по прямому определению
+
+Каждый метод на хранилищах dict, COO и плотном сравнивается с эталоном, который
+перебирает все пары элементов A и B. Отдельно проверяются пустые тензоры
+и полная свертка до скаляра.
+"""
+import pytest
+
+from multiplication_matrix import MunermanTensorMultiplier, Tensor, TensorOperations
+from reference import (
+    DIMENSIONS, METHODS, assert_matches, make_pair, needs_numpy, reference_product, result_dimension,
+)
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo", "dense"])
+@pytest.mark.parametrize("dimensions", DIMENSIONS)
+@pytest.mark.parametrize("method", METHODS)
+def test_sparse_backend(method, dimensions, storage):
+    tensor_a, tensor_b = make_pair(dimensions, storage)
+    result = TensorOperations.multiply_tensors(tensor_a, tensor_b, method, "x")
+    assert_matches(result, reference_product(tensor_a, tensor_b, method), result_dimension(dimensions, method))
+    assert result.pairs == MunermanTensorMultiplier.count_pairs(
+        tensor_a, tensor_b, *MunermanTensorMultiplier.METHOD_SIGNATURES[method])
+
+
+@pytest.mark.parametrize("backend", ["sparse", "blocked", pytest.param("dense", marks=needs_numpy)])
+@pytest.mark.parametrize("empty", ["a", "b", "both"])
+@pytest.mark.parametrize("method", METHODS)
+def test_empty_tensor(method, empty, backend):
+    tensor_a = Tensor(4) if empty in ("a", "both") else Tensor.random((3,) * 4, 0.6, 1)
+    tensor_b = Tensor(4) if empty in ("b", "both") else Tensor.random((3,) * 4, 0.6, 2)
+    result = TensorOperations.multiply_tensors(tensor_a, tensor_b, method, "4d", backend=backend)
+    assert result.dimension == result_dimension((4, 4), method)
+    assert all(value == 0 for value in result.data.values())
+
+
+@pytest.mark.parametrize("backend", ["sparse", pytest.param("dense", marks=needs_numpy)])
+def test_random_tensor_without_elements(backend):
+    # Плотность так мала, что не выпадает ни одного элемента
+    tensor_a = Tensor.random((3,) * 4, 0.001, 1)
+    assert tensor_a.nnz() == 0
+    result = TensorOperations.multiply_tensors(tensor_a, Tensor.random((3,) * 4, 0.6, 2), 5, "4d", backend=backend)
+    assert result.dimension == 5
+    assert all(value == 0 for value in result.data.values())
+
+
+@pytest.mark.parametrize("backend", ["sparse", pytest.param("dense", marks=needs_numpy)])
+@pytest.mark.parametrize("storage", ["dict", "coo"])
+def test_full_contraction_to_scalar(backend, storage):
+    tensor_a = Tensor.random((3, 3), 1.0, 1, storage)
+    tensor_b = Tensor.random((3, 3), 1.0, 2, storage)
+    result = TensorOperations.multiply_tensors(tensor_a, tensor_b, 1, "2d", backend=backend)
+    assert result.dimension == 0
+    assert list(result.data.keys()) == [()]
+    expected = sum(tensor_a.get_value(key) * tensor_b.get_value(key) for key in tensor_a.data.keys())
+    assert result.get_value(()) == pytest.approx(expected)
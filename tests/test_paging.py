@@ -0,0 +1,59 @@
+"""Постраничный вывод результата в формате Соколова (SokolovPager, SokolovFormatter)"""
+import math
+
+import pytest
+
+from multiplication_matrix import SokolovFormatter, SokolovPager, Tensor, TensorOperations
+
+
+def pages(shape, page_elements):
+    plan = SokolovPager.plan_pages(shape, page_elements)
+    return plan, [SokolovPager.locate_page(shape, plan, page) for page in range(plan[3])]
+
+
+def test_scalar_is_one_page_with_its_value():
+    tensor_a = Tensor(2, {(0, 0): 1.5, (1, 1): 2.0})
+    tensor_b = Tensor(2, {(0, 0): 2.0, (1, 1): 3.0})
+    scalar = TensorOperations.multiply_tensors(tensor_a, tensor_b, 1, "2d")
+    plan = SokolovPager.plan_pages(scalar.get_shape())
+    assert plan[3] == 1
+    assert "".join(SokolovPager.iter_page(scalar, plan, 0)) == "9.00"
+    assert SokolovFormatter.format_tensor(Tensor(0, {(): 7}, dtype='int64')) == "7"
+    assert SokolovFormatter.format_tensor(Tensor(0)) == "0.00"
+
+
+def test_empty_tensor_page():
+    assert "".join(SokolovPager.iter_page(Tensor(3), SokolovPager.plan_pages(()), 0)) == "[]"
+
+
+def test_one_dimensional_pages():
+    plan, locations = pages((45,), 20)
+    assert plan == (0, 20, 3, 3)
+    assert locations == [((), (0, 20)), ((), (20, 40)), ((), (40, 45))]
+
+
+def test_small_tensor_is_one_page_without_location():
+    tensor = Tensor.random((2, 3), 1.0, 1)
+    plan = SokolovPager.plan_pages(tensor.get_shape())
+    assert plan[3] == 1
+    assert "".join(SokolovPager.iter_page(tensor, plan, 0)) == SokolovFormatter.format_tensor(tensor)
+
+
+@pytest.mark.parametrize("page_elements", [7, 30, 200])
+def test_five_dimensional_pages_cover_every_row_once(page_elements):
+    shape = (2, 3, 4, 5, 3)
+    plan, locations = pages(shape, page_elements)
+    page_axis = plan[0]
+    assert math.prod(shape[page_axis + 1:]) <= page_elements or page_axis == len(shape) - 1
+    rows = [prefix + (row,) for prefix, (start, stop) in locations for row in range(start, stop)]
+    assert sorted(rows) == rows
+    assert len(rows) == len(set(rows)) == math.prod(shape[:page_axis + 1])
+
+
+def test_five_dimensional_page_text():
+    tensor = Tensor.random((2, 3, 2, 2, 2), 1.0, 1, dtype='int64')
+    plan = SokolovPager.plan_pages(tensor.get_shape(), 8)
+    assert plan[3] == 6
+    text = "".join(SokolovPager.iter_page(tensor, plan, 4))
+    assert text.startswith("Фрагмент: i1=1, i2=1..1 (индексы с 0)\n")
+    assert text.endswith(SokolovFormatter.format_tensor(tensor, (1,), (1, 2)))
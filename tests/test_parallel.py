@@ -0,0 +1,37 @@
+"""Параллельный расчёт свернутых произведений в пуле процессов"""
+import pytest
+
+from multiplication_matrix import (
+    MultiplicationCancelled, MunermanTensorMultiplier, ParallelTensorMultiplier, ProgressMonitor, Tensor,
+    TensorOperations,
+)
+from reference import METHODS, assert_matches, make_pair, reference_product, result_dimension
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo"])
+@pytest.mark.parametrize("method", METHODS)
+def test_parallel_backend(method, storage):
+    tensor_a, tensor_b = make_pair((4, 3), storage)
+    result = TensorOperations.multiply_tensors(tensor_a, tensor_b, method, "4d_3d", workers=2)
+    assert_matches(result, reference_product(tensor_a, tensor_b, method), result_dimension((4, 3), method))
+    assert result.pairs == MunermanTensorMultiplier.count_pairs(
+        tensor_a, tensor_b, *MunermanTensorMultiplier.METHOD_SIGNATURES[method])
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo"])
+def test_split_by_leading_index(storage):
+    tensor = Tensor.random((5, 3, 3), 0.8, 1, storage)
+    parts = ParallelTensorMultiplier.split_by_leading_index(tensor, 3)
+    assert 1 <= len(parts) <= 3
+    # Части не делят группы с одинаковым первым индексом и вместе дают весь тензор
+    firsts = [{key[0] for key in part.data.keys()} for part in parts]
+    assert all(not a & b for i, a in enumerate(firsts) for b in firsts[i + 1:])
+    assert sorted(item for part in parts for item in part.data.items()) == sorted(tensor.data.items())
+
+
+def test_cancelled_before_start():
+    tensor_a, tensor_b = make_pair((4, 4))
+    monitor = ProgressMonitor()
+    monitor.cancel()
+    with pytest.raises(MultiplicationCancelled):
+        ParallelTensorMultiplier.contracted_product(tensor_a, tensor_b, 1, 1, workers=2, monitor=monitor)
@@ -0,0 +1,74 @@
+"""Разбор текста в формате Соколова без eval (SokolovParser)"""
+import pytest
+
+from multiplication_matrix import SokolovFormatter, SokolovParser, Tensor
+
+SHAPES = [(4,), (3, 2), (2, 3, 2), (2, 2, 3, 2), (2, 1, 2, 2, 3)]
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo", "dense"])
+@pytest.mark.parametrize("shape", SHAPES)
+def test_formatter_output_round_trip(shape, storage):
+    tensor = Tensor.random(shape, 1.0, 1, low=-10.0)
+    parsed = SokolovParser.parse(SokolovFormatter.format_tensor(tensor), storage)
+    assert parsed.storage == storage
+    assert parsed.dimension == len(shape)
+    assert parsed.get_shape() == shape
+    assert dict(parsed.data.items()) == dict(tensor.data.items())
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_int64_round_trip(shape):
+    tensor = Tensor.random(shape, 1.0, 1, low=-100, high=100, dtype='int64')
+    parsed = SokolovParser.parse(SokolovFormatter.format_tensor(tensor), dtype='int64')
+    assert parsed.dtype == 'int64'
+    assert dict(parsed.data.items()) == dict(tensor.data.items())
+
+
+def test_decimal_comma():
+    # Запятая между цифрами без пробела - десятичная: [1,2] - одно число 1.2
+    tensor = SokolovParser.parse("[[1,2];[3]]")
+    assert tensor.get_shape() == (2, 1)
+    assert tensor.get_value((0, 0)) == 1.2
+    assert tensor.get_value((1, 0)) == 3
+    assert SokolovParser.parse("[1, 2]").get_shape() == (2,)
+
+
+def test_comments_and_whitespace():
+    tensor = SokolovParser.parse("# матрица 2x2\n[[1, 2];\n [3, 4]]  # конец\n")
+    assert dict(tensor.data.items()) == {(0, 0): 1, (0, 1): 2, (1, 0): 3, (1, 1): 4}
+
+
+@pytest.mark.parametrize("text", [
+    "[[1, 2]; [3]]",                       # строки разной длины
+    "[[[1, 2]; [3, 4]], [[5, 6]]]",        # грани разной высоты
+    "[[1, 2]; 3]",                         # число на уровне списков
+    "[[1, 2]; [3, 4]]]",                   # лишняя закрывающая скобка
+    "[[1, 2]; [3, 4]",                     # не закрыта скобка
+    "[[1, 2] [3, 4]]",                     # пропущен разделитель
+    "[1, , 2]",                            # двойной разделитель
+    "[[1, 2];; [3, 4]]",
+    "[1, 2,]",                             # разделитель перед скобкой
+    "[]",                                  # пустой список
+    "[[]]",
+    "",
+    "5",
+    "[1, 2] [3, 4]",                       # данные после матрицы
+    "__import__('os').system('echo')",
+    "[__import__('os')]",
+    "[1, 2 + 3]",
+])
+@pytest.mark.parametrize("storage", ["dict", "coo"])
+def test_rejected(text, storage):
+    with pytest.raises(ValueError):
+        SokolovParser.parse(text, storage)
+
+
+def test_fraction_rejected_for_int64():
+    with pytest.raises(ValueError):
+        SokolovParser.parse("[1, 2.5]", dtype='int64')
+
+
+def test_error_reports_position():
+    with pytest.raises(ValueError, match=r"строка 2, позиция 2"):
+        SokolovParser.parse("[[1, 2];\n [3]]")
@@ -0,0 +1,57 @@
+"""Случайные тензоры (Tensor.random): зерно, плотность, тип значений и форма"""
+import math
+
+import pytest
+
+from multiplication_matrix import Tensor
+
+STORAGES = ["dict", "coo", "dense"]
+
+
+def stored(tensor):
+    return {key: value for key, value in tensor.data.items() if value}
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_seed_is_reproducible(storage):
+    assert stored(Tensor.random((3, 4, 2), 0.5, 7, storage)) == stored(Tensor.random((3, 4, 2), 0.5, 7, storage))
+    assert stored(Tensor.random((3, 4, 2), 0.5, 7, storage)) != stored(Tensor.random((3, 4, 2), 0.5, 8, storage))
+
+
+def test_same_elements_in_every_storage():
+    tensors = [Tensor.random((3, 4, 2), 0.4, 3, storage) for storage in STORAGES]
+    assert stored(tensors[0]) == stored(tensors[1]) == stored(tensors[2])
+
+
+@pytest.mark.parametrize("density", [0.1, 0.5, 1.0])
+def test_density(density):
+    tensor = Tensor.random((5, 6, 7), density, 1)
+    assert tensor.nnz() == round(math.prod((5, 6, 7)) * density)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_value_range_and_dtype(storage):
+    tensor = Tensor.random((4, 4), 1.0, 1, storage, low=-3, high=3, dtype='int64')
+    assert tensor.dtype == 'int64'
+    assert all(isinstance(value, int) and -3 <= value < 3 for value in tensor.data.values())
+    floats = Tensor.random((4, 4), 1.0, 1, storage, low=1.0, high=2.0, decimals=1)
+    assert all(1.0 <= value <= 2.0 and round(value, 1) == value for value in floats.data.values())
+
+
+@pytest.mark.parametrize("source", STORAGES)
+def test_shape_kept_through_convert_storage(source):
+    # При такой плотности последние срезы по каждой оси пусты, но форма остаётся объявленной
+    tensor = Tensor.random((6, 6, 6), 0.01, 11, source)
+    assert tensor.nnz() and all(max(key[axis] for key, value in tensor.data.items() if value) < 5
+                                for axis in range(3))
+    assert tensor.get_shape() == (6, 6, 6)
+    for storage in STORAGES:
+        assert tensor.convert_storage(storage).get_shape() == (6, 6, 6)
+
+
+@pytest.mark.parametrize("arguments", [
+    dict(density=0), dict(density=1.5), dict(dtype='int8'), dict(low=0.2, high=0.8, dtype='int64'),
+])
+def test_invalid_arguments(arguments):
+    with pytest.raises(ValueError):
+        Tensor.random((2, 2), **dict(dict(density=1.0), **arguments))
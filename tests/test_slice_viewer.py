@@ -0,0 +1,37 @@
+"""Окна срезов в SliceViewer: скаляр, одномерный и пятимерный тензоры"""
+import pytest
+
+from multiplication_matrix import SliceViewer, Tensor, TensorOperations
+
+
+def test_scalar_window_is_its_value():
+    tensor_a = Tensor(2, {(0, 0): 1.5, (1, 1): 2.0})
+    tensor_b = Tensor(2, {(0, 0): 2.0, (1, 1): 3.0})
+    scalar = TensorOperations.multiply_tensors(tensor_a, tensor_b, 1, "2d")
+    assert scalar.dimension == 0
+    assert SliceViewer.format_window(scalar, ()) == (range(0), range(0), "9.00\n")
+    assert SliceViewer.format_window(Tensor(0, {(): 7}, dtype='int64'), ())[2] == "7\n"
+
+
+def test_one_dimensional_window():
+    tensor = Tensor(1, {(j,): j for j in range(45)}, dtype='int64')
+    rows, columns, text = SliceViewer.format_window(tensor, (), 0, 40, max_columns=30)
+    assert rows == range(0, 1) and columns == range(40, 45)
+    lines = text.splitlines()
+    assert lines[0].split() == ["|", "40", "41", "42", "43", "44"]
+    assert lines[2].split() == ["|", "40", "41", "42", "43", "44"]
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo"])
+def test_five_dimensional_window(storage):
+    tensor = Tensor.random((2, 3, 2, 5, 4), 1.0, 1, storage, dtype='int64')
+    prefix = (1, 2, 0)
+    rows, columns, text = SliceViewer.format_window(tensor, prefix, 3, 1, max_rows=3, max_columns=2)
+    # Окно обрезается по границам среза
+    assert rows == range(3, 5) and columns == range(1, 3)
+    lines = text.splitlines()
+    assert len(lines) == 2 + len(rows)
+    for i, line in zip(rows, lines[2:]):
+        label, values = line.split("|")
+        assert int(label) == i
+        assert [int(value) for value in values.split()] == [tensor.get_value(prefix + (i, j)) for j in columns]
@@ -0,0 +1,64 @@
+"""Компактные хранилища тензора: CooStorage и DenseStorage"""
+import pickle
+
+import pytest
+
+from multiplication_matrix import CooStorage, DenseStorage, Tensor
+
+
+def test_coo_sorts_and_keeps_last_duplicate():
+    storage = CooStorage(2)
+    for key, value in [((1, 0), 1.0), ((0, 2), 2.0), ((1, 0), 3.0), ((0, 1), 4.0)]:
+        storage.append(key, value)
+    assert list(storage.items()) == [((0, 1), 4.0), ((0, 2), 2.0), ((1, 0), 3.0)]
+    assert len(storage) == 3
+
+
+def test_coo_dict_operations():
+    storage = CooStorage.from_items(3, [((0, 0, 1), 1.5), ((2, 1, 0), 2.5)])
+    assert storage.get((2, 1, 0)) == 2.5
+    assert storage.get((1, 1, 1), 0) == 0
+    assert (0, 0, 1) in storage and (0, 0, 0) not in storage
+    with pytest.raises(KeyError):
+        storage[(1, 1, 1)]
+    storage[(0, 0, 1)] = 7.0            # замена существующего элемента
+    storage[(1, 0, 0)] = 8.0            # вставка в середину
+    assert list(storage.keys()) == [(0, 0, 1), (1, 0, 0), (2, 1, 0)]
+    assert list(storage.values()) == [7.0, 8.0, 2.5]
+
+
+def test_coo_items_between():
+    storage = CooStorage.from_items(2, [((i, j), i * 10 + j) for i in range(4) for j in range(3)])
+    assert list(storage.items_between((1,), (3,))) == [((i, j), i * 10 + j) for i in (1, 2) for j in range(3)]
+    assert list(storage.items_between((2, 1), (2, 3))) == [((2, 1), 21), ((2, 2), 22)]
+
+
+def test_coo_pickle_copies_read_only_buffers():
+    values = memoryview(bytes(8 * 2)).cast('d')
+    columns = [memoryview(bytes(8 * 2)).cast('q'), memoryview(bytes([0] * 8 + [1] + [0] * 7)).cast('q')]
+    storage = CooStorage(2, columns, values)
+    restored = pickle.loads(pickle.dumps(storage))
+    assert list(restored.items()) == [((0, 0), 0.0), ((0, 1), 0.0)]
+    restored[(0, 1)] = 5.0
+    assert restored.get((0, 1)) == 5.0
+
+
+@pytest.mark.parametrize("storage", ["dict", "coo", "dense"])
+def test_convert_storage_keeps_values(storage):
+    tensor = Tensor(3, {(0, 1, 2): 1.0, (2, 0, 0): 2.0, (1, 1, 1): 3.0})
+    converted = tensor.convert_storage(storage)
+    assert converted.storage == storage
+    back = converted.convert_storage("dict")
+    assert {key: value for key, value in back.data.items() if value} == tensor.data
+
+
+def test_dense_storage_bounds():
+    storage = DenseStorage((2, 3))
+    storage[(1, 2)] = 4.0
+    assert storage.get((1, 2)) == 4.0
+    assert storage.get((2, 0), -1) == -1
+    assert len(storage) == 6
+    with pytest.raises(IndexError):
+        storage[(2, 0)] = 1.0
+    with pytest.raises(ValueError):
+        DenseStorage((2, 2), value_array=[1.0])
@@ -0,0 +1,56 @@
+"""Двоичный файл тензора (TensorFile) и загрузка через отображение в память"""
+import pytest
+
+from multiplication_matrix import Tensor, TensorFile, TensorOperations
+from reference import assert_matches, make_pair, reference_product
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+@pytest.mark.parametrize("dtype", list(Tensor.DTYPES))
+@pytest.mark.parametrize("storage", ["dict", "coo", "dense"])
+def test_file_round_trip(tmp_path, dtype, storage, use_mmap):
+    tensor = Tensor.random((3, 4, 2), 0.5, 1, storage, dtype=dtype)
+    path = str(tmp_path / f"tensor{TensorFile.EXTENSION}")
+    TensorFile.save(tensor, path)
+    loaded = TensorFile.load(path, use_mmap=use_mmap)
+    assert loaded.dtype == dtype
+    assert loaded.get_shape() == tensor.get_shape()
+    assert {key: value for key, value in loaded.data.items() if value} == \
+           {key: value for key, value in tensor.data.items() if value}
+
+
+def test_layout_by_fill():
+    full = Tensor.random((2, 3), 1.0, 1)
+    sparse = Tensor.random((2, 3), 0.5, 1)
+    assert TensorFile.from_bytes(TensorFile.to_bytes(full)).storage == "dense"
+    assert TensorFile.from_bytes(TensorFile.to_bytes(sparse)).storage == "coo"
+
+
+def test_empty_tensor_round_trip():
+    loaded = TensorFile.from_bytes(TensorFile.to_bytes(Tensor(3)))
+    assert loaded.dimension == 3 and loaded.nnz() == 0
+
+
+def test_mapped_tensor_multiplies_and_copies_on_write(tmp_path):
+    tensor_a, tensor_b = make_pair((4, 4), "coo")
+    path = str(tmp_path / f"a{TensorFile.EXTENSION}")
+    TensorFile.save(tensor_a, path)
+    mapped = TensorFile.load(path)
+    assert isinstance(mapped.data.value_array, memoryview)
+    result = TensorOperations.multiply_tensors(mapped, tensor_b, 5, "4d")
+    assert_matches(result, reference_product(tensor_a, tensor_b, 5), 5)
+    mapped.add_value((0, 0, 0, 0), 99.0)
+    assert mapped.get_value((0, 0, 0, 0)) == 99.0
+    assert TensorFile.load(path).get_value((0, 0, 0, 0)) == tensor_a.get_value((0, 0, 0, 0))
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda data: b"XXXX" + data[4:],                   # сигнатура
+    lambda data: data[:4] + b"\x09" + data[5:],        # версия
+    lambda data: data[:10],                            # обрезанный заголовок
+    lambda data: data[:-8],                            # данных меньше, чем в заголовке
+])
+def test_corrupted_file_rejected(corrupt):
+    data = TensorFile.to_bytes(Tensor.random((3, 3), 0.5, 1))
+    with pytest.raises(ValueError):
+        TensorFile.from_bytes(corrupt(data))
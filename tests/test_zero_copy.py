@@ -0,0 +1,84 @@
+"""Тензоры поверх чужих буферов без копирования: from_buffer, as_buffer, numpy и SharedTensor"""
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from multiplication_matrix import SharedTensor, Tensor, np
+from reference import needs_numpy
+
+DTYPES = ["float64", "float32", "int64"]
+
+
+@needs_numpy
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_numpy_round_trip_shares_memory(dtype):
+    source = np.arange(24, dtype=dtype).reshape(2, 3, 4)
+    tensor = Tensor.from_buffer(source)
+    assert tensor.dtype == dtype and tensor.get_shape() == (2, 3, 4)
+    view = np.asarray(tensor)
+    assert np.shares_memory(source, view)
+    assert view.dtype == source.dtype and view.shape == source.shape
+    assert tensor.get_value((1, 2, 3)) == source[1, 2, 3]
+
+
+@needs_numpy
+def test_add_value_copies_buffer():
+    source = np.arange(6, dtype='float64').reshape(2, 3)
+    tensor = Tensor.from_buffer(source)
+    tensor.add_value((0, 0), 9.0)
+    # Запись идёт в собственную копию тензора, исходный массив не меняется
+    assert source[0, 0] == 0.0 and tensor.get_value((0, 0)) == 9.0
+    assert not np.shares_memory(source, np.asarray(tensor))
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_array_buffer_without_copy(dtype):
+    values = array(Tensor.DTYPES[dtype], range(6))
+    tensor = Tensor.from_buffer(values, (2, 3))
+    assert tensor.dtype == dtype
+    values[4] = 40
+    assert tensor.get_value((1, 1)) == 40
+    assert tensor.as_buffer().tolist() == [[0, 1, 2], [3, 40, 5]]
+
+
+def test_buffer_errors():
+    with pytest.raises(ValueError):
+        Tensor.from_buffer(array('d', range(5)), (2, 3))      # размер не совпадает с формой
+    with pytest.raises(ValueError):
+        Tensor.from_buffer(array('i', range(6)), (2, 3))      # 4-байтовые целые не поддерживаются
+    with pytest.raises(ValueError):
+        Tensor.from_buffer(memoryview(array('d', range(6)))[::2], (3,))   # не непрерывный
+    with pytest.raises(TypeError):
+        Tensor.random((2, 2), 1.0, 1).as_buffer()
+
+
+def attached_sum(descriptor):
+    """Тело дочернего процесса: сумма значений и запись прямо в общую память"""
+    shared = SharedTensor.attach(descriptor)
+    try:
+        total = sum(shared.tensor.data.values())
+        shared.tensor.as_buffer()[0, 0] = 42
+        return total
+    finally:
+        shared.close()
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_shared_tensor_across_processes(dtype):
+    tensor = Tensor.random((3, 4), 1.0, 1, "dict", dtype=dtype)
+    shared = SharedTensor.create(tensor)
+    name = shared.descriptor[0]
+    try:
+        assert shared.tensor.dtype == dtype and shared.tensor.get_shape() == (3, 4)
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            total = executor.submit(attached_sum, shared.descriptor).result(timeout=60)
+        assert total == pytest.approx(sum(tensor.data.values()))
+        # Дочерний процесс писал в тот же участок памяти
+        assert shared.tensor.get_value((0, 0)) == 42
+    finally:
+        shared.close()
+    assert shared.tensor is None
+    # Создавший процесс удалил участок из системы
+    with pytest.raises(FileNotFoundError):
+        SharedTensor.attach((name, (3, 4), dtype))